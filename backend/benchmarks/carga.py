@@ -0,0 +1,167 @@
+"""
+Gerador de carga com concorrência configurável. Reporta p50/p95/p99 e
+requisições por segundo por endpoint.
+
+Em processo (ASGI, sem rede), contra o banco populado:
+    python -m benchmarks.carga --db benchmark.db --concorrencia 50 --duracao 30
+
+Em processo o rate limit do login fica desligado: todos os usuários
+virtuais vêm do mesmo IP e logam juntos. Contra um servidor rodando (mesmo
+banco populado no servidor), suba-o com RATE_LIMIT_ENABLED=false:
+    python -m benchmarks.carga --url http://127.0.0.1:8000 --concorrencia 200 --duracao 60
+
+Mix de endpoints (pesos relativos):
+    --mix listar=70,criar=10,concluir=10,deletar=10,token=0
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks.comum import adicionar_argumentos_comuns, configurar_banco, finalizar, resumir
+from benchmarks.seed import SENHA
+
+ENDPOINTS = ("listar", "criar", "concluir", "deletar", "token")
+
+
+def parse_mix(texto: str) -> dict[str, int]:
+    mix = {}
+    for parte in texto.split(","):
+        nome, _, peso = parte.partition("=")
+        if nome not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"endpoint desconhecido: {nome}")
+        mix[nome] = int(peso)
+    return mix
+
+
+class UsuarioVirtual:
+    def __init__(self, client, username: str):
+        self.client = client
+        self.username = username
+        self.headers: dict = {}
+        self.criadas: list[int] = []
+
+    async def login(self) -> bool:
+        res = await self.client.post("/token", data={"username": self.username, "password": SENHA})
+        if res.status_code != 200:
+            return False
+        self.headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+        return True
+
+    async def executar(self, endpoint: str) -> bool:
+        if endpoint == "token":
+            return await self.login()
+        if endpoint == "listar":
+            res = await self.client.get("/tarefas", params={"limit": 50}, headers=self.headers)
+            return res.status_code == 200
+        if endpoint == "criar" or not self.criadas:
+            res = await self.client.post(
+                "/tarefas", json={"titulo": "carga", "prioridade": "Média"}, headers=self.headers
+            )
+            if res.status_code == 200:
+                self.criadas.append(res.json()["id"])
+            return res.status_code == 200
+        if endpoint == "concluir":
+            tarefa_id = random.choice(self.criadas)
+            res = await self.client.patch(f"/tarefas/{tarefa_id}/concluir", headers=self.headers)
+            return res.status_code == 200
+        # deletar
+        tarefa_id = self.criadas.pop()
+        res = await self.client.delete(f"/tarefas/{tarefa_id}", headers=self.headers)
+        return res.status_code == 200
+
+
+async def executar_carga(client, args) -> dict:
+    mix = {nome: peso for nome, peso in args.mix.items() if peso > 0}
+    nomes, pesos = list(mix), list(mix.values())
+    amostras: dict[str, list[float]] = defaultdict(list)
+    erros: dict[str, int] = defaultdict(int)
+
+    usuarios = [
+        UsuarioVirtual(client, f"bench_{i % args.usuarios}")
+        for i in range(args.concorrencia)
+    ]
+    logins = await asyncio.gather(*(usuario.login() for usuario in usuarios))
+    if not all(logins):
+        raise SystemExit("❌ Falha no login dos usuários virtuais (o banco foi populado com benchmarks.seed?)")
+
+    fim = time.perf_counter() + args.duracao
+
+    async def trabalhador(usuario: UsuarioVirtual):
+        while time.perf_counter() < fim:
+            endpoint = random.choices(nomes, pesos)[0]
+            t0 = time.perf_counter()
+            try:
+                ok = await usuario.executar(endpoint)
+            except Exception:
+                ok = False
+            amostras[endpoint].append(time.perf_counter() - t0)
+            if not ok:
+                erros[endpoint] += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador(usuario) for usuario in usuarios))
+    duracao = time.perf_counter() - inicio
+
+    resultados = {
+        nome: resumir(amostras[nome], duracao, erros[nome])
+        for nome in nomes
+    }
+    todas = [amostra for nome in nomes for amostra in amostras[nome]]
+    resultados["total"] = resumir(todas, duracao, sum(erros.values()))
+    return resultados
+
+
+def app_em_processo():
+    """
+    O app para a carga via ASGI. Sem o rate limit: os limites de login
+    (por IP e por usuário) barrariam os logins simultâneos e o mix "token".
+    """
+    from core.config import settings
+    from main import app
+
+    settings.RATE_LIMIT_ENABLED = False
+    return app
+
+
+async def rodar(args) -> dict:
+    import httpx
+
+    limites = httpx.Limits(max_connections=args.concorrencia, max_keepalive_connections=args.concorrencia)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, limits=limites, timeout=30) as client:
+            return await executar_carga(client, args)
+
+    transport = httpx.ASGITransport(app=app_em_processo())
+    async with httpx.AsyncClient(transport=transport, base_url="http://carga", timeout=30) as client:
+        return await executar_carga(client, args)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    adicionar_argumentos_comuns(parser)
+    parser.add_argument("--url", help="servidor alvo; sem ele a carga roda em processo (ASGI)")
+    parser.add_argument("--concorrencia", type=int, default=20)
+    parser.add_argument("--duracao", type=float, default=10, help="segundos")
+    parser.add_argument("--usuarios", type=int, default=100, help="quantos usuários bench_N usar")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("listar=70,criar=10,concluir=10,deletar=10"))
+    args = parser.parse_args(argv)
+
+    if not args.url:
+        configurar_banco(args.db)
+    resultados = asyncio.run(rodar(args))
+
+    parametros = {
+        "alvo": args.url or f"asgi:{args.db}",
+        "concorrencia": args.concorrencia,
+        "duracao": args.duracao,
+        "usuarios": args.usuarios,
+        "mix": args.mix,
+    }
+    return finalizar(args, "carga", parametros, resultados)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+def configurar_banco(caminho_db: str) -> None:
+    """
+    Aponta a aplicação para o banco de benchmark. Precisa rodar antes de
+    importar qualquer módulo do backend (as configurações são lidas no import).
+    """
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(caminho_db).resolve()}"
+
+
+def percentil(amostras: list[float], p: float) -> float:
+    if not amostras:
+        return 0.0
+    ordenadas = sorted(amostras)
+    posicao = (len(ordenadas) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenadas) - 1)
+    return ordenadas[inferior] + (ordenadas[superior] - ordenadas[inferior]) * (posicao - inferior)
+
+
+def resumir(amostras_s: list[float], duracao_s: float, erros: int = 0) -> dict:
+    """Resumo em milissegundos + vazão (operações por segundo)."""
+    ms = [amostra * 1000 for amostra in amostras_s]
+    return {
+        "n": len(ms),
+        "erros": erros,
+        "media_ms": statistics.fmean(ms) if ms else 0.0,
+        "p50_ms": percentil(ms, 50),
+        "p95_ms": percentil(ms, 95),
+        "p99_ms": percentil(ms, 99),
+        "rps": len(ms) / duracao_s if duracao_s > 0 else 0.0,
+    }
+
+
+def medir(funcao, repeticoes: int) -> dict:
+    """Roda uma função síncrona `repeticoes` vezes e resume as latências."""
+    amostras = []
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        funcao()
+        amostras.append(time.perf_counter() - t0)
+    return resumir(amostras, time.perf_counter() - inicio)
+
+
+def salvar_resultados(caminho: str, tipo: str, parametros: dict, resultados: dict) -> None:
+    dados = {
+        "tipo": tipo,
+        "data": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parametros": parametros,
+        "resultados": resultados,
+    }
+    Path(caminho).write_text(json.dumps(dados, indent=2, ensure_ascii=False))
+
+
+def comparar_com_baseline(resultados: dict, caminho_baseline: str, tolerancia: float) -> list[str]:
+    """
+    Compara p95 e vazão com o baseline salvo. Retorna as regressões
+    acima da tolerância (ex.: 0.2 = 20% pior).
+    """
+    baseline = json.loads(Path(caminho_baseline).read_text())["resultados"]
+    regressoes = []
+
+    for nome, atual in resultados.items():
+        anterior = baseline.get(nome)
+        if anterior is None:
+            continue
+        if anterior["p95_ms"] > 0 and atual["p95_ms"] > anterior["p95_ms"] * (1 + tolerancia):
+            regressoes.append(
+                f"{nome}: p95 {anterior['p95_ms']:.2f}ms -> {atual['p95_ms']:.2f}ms"
+            )
+        if anterior["rps"] > 0 and atual["rps"] < anterior["rps"] * (1 - tolerancia):
+            regressoes.append(
+                f"{nome}: vazão {anterior['rps']:.1f}/s -> {atual['rps']:.1f}/s"
+            )
+        if atual.get("erros", 0) > anterior.get("erros", 0):
+            regressoes.append(f"{nome}: erros {anterior.get('erros', 0)} -> {atual['erros']}")
+
+    return regressoes
+
+
+def imprimir_tabela(resultados: dict) -> None:
+    print(f"{'operação':<28}{'n':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}")
+    for nome, r in resultados.items():
+        print(
+            f"{nome:<28}{r['n']:>8}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+            f"{r['p99_ms']:>10.2f}{r['rps']:>12.1f}"
+        )
+
+
+def finalizar(args, tipo: str, parametros: dict, resultados: dict) -> int:
+    """Imprime, salva o JSON e falha (exit 1) se houver regressão."""
+    imprimir_tabela(resultados)
+
+    if args.saida:
+        salvar_resultados(args.saida, tipo, parametros, resultados)
+        print(f"\n💾 Resultados salvos em {args.saida}")
+
+    if args.baseline:
+        regressoes = comparar_com_baseline(resultados, args.baseline, args.tolerancia)
+        if regressoes:
+            print("\n❌ Regressões em relação ao baseline:")
+            for regressao in regressoes:
+                print(f"  - {regressao}")
+            return 1
+        print("\n✅ Sem regressões em relação ao baseline")
+
+    return 0
+
+
+def adicionar_argumentos_comuns(parser) -> None:
+    parser.add_argument("--db", default="benchmark.db", help="arquivo SQLite populado por benchmarks.seed")
+    parser.add_argument("--saida", help="salva os resultados neste arquivo JSON")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="piora aceita antes de falhar (0.2 = 20%%)")
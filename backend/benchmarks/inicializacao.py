@@ -0,0 +1,106 @@
+"""
+Partida a frio de um worker: quanto tempo do processo novo até a primeira
+resposta. Cada repetição sobe um uvicorn de um worker contra o banco
+populado (e já migrado) e mede:
+
+- importar_app: só o `import main` (no processo filho);
+- ate_primeira_resposta: do spawn até o primeiro GET /tarefas com 200;
+- primeira_requisicao: a duração dessa primeira requisição (inclui o que
+  é carregado sob demanda, como o python-jose).
+
+    python -m benchmarks.seed --db benchmark.db --usuarios 10 --tarefas 100
+    python -m benchmarks.inicializacao --db benchmark.db --saida inicializacao.json
+    python -m benchmarks.inicializacao --db benchmark.db --baseline inicializacao.json
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from benchmarks.comum import adicionar_argumentos_comuns, configurar_banco, finalizar, resumir
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def medir_importacao() -> float:
+    saida = subprocess.run(
+        [sys.executable, "-c", "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"],
+        cwd=BACKEND_DIR, env=os.environ, capture_output=True, text=True, check=True,
+    )
+    return float(saida.stdout.strip().splitlines()[-1])
+
+
+def medir_partida(token: str, timeout_s: float) -> tuple[float, float]:
+    """(spawn -> primeira resposta 200, duração dessa requisição), em segundos."""
+    porta = porta_livre()
+    url = f"http://127.0.0.1:{porta}/tarefas?limit=1"
+    requisicao = urllib.request.Request(url, headers={"Authorization": f"Bearer {token}"})
+
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(porta), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=os.environ,
+    )
+    try:
+        while time.perf_counter() - inicio < timeout_s:
+            t0 = time.perf_counter()
+            try:
+                with urllib.request.urlopen(requisicao, timeout=timeout_s) as resposta:
+                    if resposta.status == 200:
+                        agora = time.perf_counter()
+                        return agora - inicio, agora - t0
+            except (urllib.error.URLError, ConnectionError):
+                if processo.poll() is not None:
+                    raise RuntimeError("o servidor terminou antes de responder (banco migrado?)")
+                time.sleep(0.005)
+        raise TimeoutError(f"sem resposta em {timeout_s}s")
+    finally:
+        processo.terminate()
+        processo.wait()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    adicionar_argumentos_comuns(parser)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args(argv)
+
+    configurar_banco(args.db)
+
+    from core.security import create_access_token
+
+    # bench_0 (id 1) do benchmarks.seed, com a versão de token inicial
+    token = create_access_token({"sub": "bench_0", "uid": 1, "tv": 0})
+
+    importacao, ate_resposta, primeira = [], [], []
+    for _ in range(args.repeticoes):
+        importacao.append(medir_importacao())
+        total, requisicao = medir_partida(token, args.timeout)
+        ate_resposta.append(total)
+        primeira.append(requisicao)
+
+    duracao = sum(ate_resposta)
+    resultados = {
+        "importar_app": resumir(importacao, sum(importacao)),
+        "ate_primeira_resposta": resumir(ate_resposta, duracao),
+        "primeira_requisicao": resumir(primeira, sum(primeira)),
+    }
+
+    parametros = {"repeticoes": args.repeticoes}
+    return finalizar(args, "inicializacao", parametros, resultados)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Micro-benchmarks dos caminhos quentes da API, sem servidor HTTP:
+JWT (criação/validação), verificação de senha (bcrypt) e as rotas de
+tarefas chamadas em processo via ASGI, contra o banco populado.
+
+    python -m benchmarks.seed --db benchmark.db --usuarios 1000 --tarefas 10000
+    python -m benchmarks.micro --db benchmark.db --saida micro.json
+    python -m benchmarks.micro --db benchmark.db --baseline micro.json
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from benchmarks.comum import adicionar_argumentos_comuns, configurar_banco, finalizar, medir, resumir
+
+
+async def medir_async(funcao, repeticoes: int) -> dict:
+    amostras = []
+    erros = 0
+    inicio = time.perf_counter()
+    for i in range(repeticoes):
+        t0 = time.perf_counter()
+        if not await funcao(i):
+            erros += 1
+        amostras.append(time.perf_counter() - t0)
+    return resumir(amostras, time.perf_counter() - inicio, erros)
+
+
+def claims_bench(i: int) -> dict:
+    # bench_i do benchmarks.seed (id i + 1), com a versão de token inicial:
+    # as rotas de leitura autorizam só pelas claims, sem ler a tabela usuario
+    return {"sub": f"bench_{i}", "uid": i + 1, "tv": 0}
+
+
+def benchmarks_auth(repeticoes: int, repeticoes_bcrypt: int) -> dict:
+    from jose import jwt
+
+    from benchmarks.seed import SENHA
+    from core.config import settings
+    from core.hashing import pwd_context
+    from core.security import create_access_token
+
+    token = create_access_token(claims_bench(0))
+    senha_hash = pwd_context.hash(SENHA)
+
+    return {
+        "jwt_encode": medir(lambda: create_access_token(claims_bench(0)), repeticoes),
+        "jwt_decode": medir(
+            lambda: jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]),
+            repeticoes,
+        ),
+        "verify_password": medir(lambda: pwd_context.verify(SENHA, senha_hash), repeticoes_bcrypt),
+    }
+
+
+async def benchmarks_rotas(repeticoes: int, usuarios_ativos: int) -> dict:
+    import httpx
+
+    from core.security import create_access_token
+    from main import app
+
+    headers = [
+        {"Authorization": f"Bearer {create_access_token(claims_bench(i))}"}
+        for i in range(usuarios_ativos)
+    ]
+    criadas: list[tuple[int, dict]] = []
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def listar(i):
+            res = await client.get("/tarefas", params={"limit": 100}, headers=headers[i % usuarios_ativos])
+            return res.status_code == 200
+
+        async def listar_304(i):
+            h = condicionais[i % usuarios_ativos]
+            res = await client.get("/tarefas", params={"limit": 100}, headers=h)
+            return res.status_code == 304
+
+        async def criar(i):
+            h = headers[i % usuarios_ativos]
+            res = await client.post("/tarefas", json={"titulo": f"bench {i}", "prioridade": "Alta"}, headers=h)
+            if res.status_code == 200:
+                criadas.append((res.json()["id"], h))
+            return res.status_code == 200
+
+        async def concluir(i):
+            tarefa_id, h = criadas[i % len(criadas)]
+            res = await client.patch(f"/tarefas/{tarefa_id}/concluir", headers=h)
+            return res.status_code == 200
+
+        async def deletar(i):
+            tarefa_id, h = criadas[i]
+            res = await client.delete(f"/tarefas/{tarefa_id}", headers=h)
+            return res.status_code == 200
+
+        resultados = {"rota_listar": await medir_async(listar, repeticoes)}
+
+        # ETag atual de cada usuário, para medir só o GET condicional
+        condicionais = []
+        for h in headers:
+            res = await client.get("/tarefas", params={"limit": 100}, headers=h)
+            condicionais.append({**h, "If-None-Match": res.headers["ETag"]})
+        resultados["rota_listar_304"] = await medir_async(listar_304, repeticoes)
+
+        resultados["rota_criar"] = await medir_async(criar, repeticoes)
+        resultados["rota_concluir"] = await medir_async(concluir, repeticoes)
+        resultados["rota_deletar"] = await medir_async(deletar, len(criadas))
+
+    return resultados
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    adicionar_argumentos_comuns(parser)
+    parser.add_argument("--repeticoes", type=int, default=500)
+    parser.add_argument("--repeticoes-bcrypt", type=int, default=20)
+    parser.add_argument("--usuarios-ativos", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    configurar_banco(args.db)
+    resultados = benchmarks_auth(args.repeticoes, args.repeticoes_bcrypt)
+    resultados.update(asyncio.run(benchmarks_rotas(args.repeticoes, args.usuarios_ativos)))
+
+    parametros = {
+        "db": args.db,
+        "repeticoes": args.repeticoes,
+        "repeticoes_bcrypt": args.repeticoes_bcrypt,
+        "usuarios_ativos": args.usuarios_ativos,
+    }
+    return finalizar(args, "micro", parametros, resultados)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Popula um banco SQLite com volume realista para os benchmarks.
+
+    python -m benchmarks.seed --db benchmark.db --usuarios 1000 --tarefas 10000
+
+Usuários: bench_0 .. bench_{N-1}, todos com a senha "bench".
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.comum import configurar_banco
+
+PRIORIDADES = ["Baixa", "Média", "Alta"]
+SENHA = "bench"
+
+
+def popular(usuarios: int, tarefas_por_usuario: int, lote: int) -> None:
+    from sqlalchemy import insert
+    from sqlmodel import SQLModel
+
+    import core.busca  # noqa: F401 (o drop_all também remove o índice de busca)
+    from core.hashing import pwd_context
+    from database.connection import engine
+    from database.migracoes import migrar, schema_versao
+    from schemas.models import Tarefa, Usuario, VersaoTarefas
+
+    # Banco do zero, no mesmo esquema que as migrações criam em produção
+    SQLModel.metadata.drop_all(engine)
+    schema_versao.drop(engine, checkfirst=True)
+    migrar(engine)
+
+    # Um único hash para todos: o custo do bcrypt não importa aqui
+    senha_hash = pwd_context.hash(SENHA)
+    agora = datetime.now(timezone.utc)
+    aleatorio = random.Random(42)
+    inicio = time.perf_counter()
+
+    with engine.begin() as conn:
+        conn.execute(insert(Usuario), [
+            {
+                "id": i + 1,
+                "username": f"bench_{i}",
+                "email": f"bench_{i}@exemplo.com",
+                "password_hash": senha_hash,
+                "is_active": True,
+            }
+            for i in range(usuarios)
+        ])
+        conn.execute(insert(VersaoTarefas), [
+            {"usuario_id": i + 1, "versao": 1, "atualizado_em": agora}
+            for i in range(usuarios)
+        ])
+
+    buffer = []
+    total = 0
+    for usuario_id in range(1, usuarios + 1):
+        for n in range(tarefas_por_usuario):
+            buffer.append({
+                "titulo": f"Tarefa {n} do usuário {usuario_id}",
+                "prioridade": aleatorio.choice(PRIORIDADES),
+                "concluido": aleatorio.random() < 0.4,
+                "usuario_id": usuario_id,
+                "versao": 1,
+                "atualizado_em": agora,
+            })
+            if len(buffer) >= lote:
+                with engine.begin() as conn:
+                    conn.execute(insert(Tarefa), buffer)
+                total += len(buffer)
+                buffer.clear()
+                print(f"\r  {total:,} tarefas inseridas", end="", flush=True)
+
+    if buffer:
+        with engine.begin() as conn:
+            conn.execute(insert(Tarefa), buffer)
+        total += len(buffer)
+
+    print(f"\r✅ {usuarios:,} usuários e {total:,} tarefas em {time.perf_counter() - inicio:.1f}s")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="benchmark.db")
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--tarefas", type=int, default=10_000, help="tarefas por usuário")
+    parser.add_argument("--lote", type=int, default=20_000, help="linhas por executemany")
+    args = parser.parse_args(argv)
+
+    configurar_banco(args.db)
+    popular(args.usuarios, args.tarefas, args.lote)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Custo de serialização da listagem de tarefas, por lote de N tarefas
+(padrão: 10k), sem banco nem servidor HTTP:
+
+- antes: objetos Tarefa -> response_model List[Tarefa] -> json da stdlib
+  (o caminho do FastAPI com response_model e JSONResponse);
+- depois: tuplas de colunas -> dicts -> orjson (GET /tarefas atual),
+  em um único corpo e em streaming.
+
+    python -m benchmarks.serializacao --saida serializacao.json
+    python -m benchmarks.serializacao --baseline serializacao.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime, timezone
+from typing import List
+
+from benchmarks.comum import adicionar_argumentos_comuns, finalizar, medir
+
+
+def gerar_linhas(quantidade: int) -> list[tuple]:
+    agora = datetime.now(timezone.utc)
+    prioridades = ("Baixa", "Média", "Alta")
+    return [
+        (i, f"Tarefa número {i}", prioridades[i % 3], i % 2 == 0, 1, i, agora)
+        for i in range(1, quantidade + 1)
+    ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    adicionar_argumentos_comuns(parser)
+    parser.add_argument("--tarefas", type=int, default=10_000)
+    parser.add_argument("--repeticoes", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+
+    from core.crud import CAMPOS_TAREFA
+    from core.respostas import ORJSONResponse, _lista_em_partes
+    from schemas.models import Tarefa
+
+    linhas = gerar_linhas(args.tarefas)
+    objetos = [Tarefa(**dict(zip(CAMPOS_TAREFA, linha))) for linha in linhas]
+    adaptador = TypeAdapter(List[Tarefa])
+
+    def antes():
+        # Mesmo trabalho do FastAPI: dump de cada objeto, validação contra o
+        # response_model, serialização em modo JSON e json.dumps
+        conteudo = [objeto.model_dump() for objeto in objetos]
+        validado = adaptador.validate_python(conteudo)
+        return JSONResponse(adaptador.dump_python(validado, mode="json")).body
+
+    def depois():
+        return ORJSONResponse([dict(zip(CAMPOS_TAREFA, linha)) for linha in linhas]).body
+
+    async def blocos_do_banco():
+        # Como o session.stream(...).partitions() da listagem: blocos de 500
+        for inicio in range(0, len(linhas), 500):
+            yield [dict(zip(CAMPOS_TAREFA, linha)) for linha in linhas[inicio:inicio + 500]]
+
+    async def juntar_partes():
+        return b"".join([parte async for parte in _lista_em_partes(blocos_do_banco())])
+
+    loop = asyncio.new_event_loop()
+
+    def depois_streaming():
+        return loop.run_until_complete(juntar_partes())
+
+    # Os três caminhos precisam produzir o mesmo documento
+    assert json.loads(antes()) == json.loads(depois()) == json.loads(depois_streaming())
+
+    resultados = {
+        "serializar_antes": medir(antes, args.repeticoes),
+        "serializar_orjson": medir(depois, args.repeticoes),
+        "serializar_orjson_stream": medir(depois_streaming, args.repeticoes),
+    }
+
+    loop.close()
+
+    ganho = resultados["serializar_antes"]["p50_ms"] / max(resultados["serializar_orjson"]["p50_ms"], 1e-9)
+    print(f"🚀 {args.tarefas} tarefas: orjson {ganho:.1f}x mais rápido (p50)\n")
+
+    parametros = {"tarefas": args.tarefas, "repeticoes": args.repeticoes}
+    return finalizar(args, "serializacao", parametros, resultados)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
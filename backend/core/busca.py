@@ -0,0 +1,176 @@
+import re
+
+from sqlalchemy import event, text
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.crud import CAMPOS_TAREFA
+from schemas.models import Tarefa
+
+# =====================================================
+# ÍNDICE DE BUSCA TEXTUAL (títulos das tarefas)
+# =====================================================
+# SQLite: tabela virtual FTS5 "sem conteúdo" (só o índice), mantida por
+# triggers. O usuário também é indexado, para a busca de um usuário não
+# percorrer as tarefas de todos. unicode61 + remove_diacritics ignora
+# acentos ("cafe" encontra "café"); o índice de prefixos acelera "caf*".
+#
+# Postgres: configuração de texto portuguesa sem acentos (extensão
+# unaccent) e índice GIN sobre to_tsvector(titulo).
+
+DDL_SQLITE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS tarefa_fts USING fts5(
+        titulo, usuario,
+        content='',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tarefa_fts_ai AFTER INSERT ON tarefa BEGIN
+        INSERT INTO tarefa_fts(rowid, titulo, usuario)
+        VALUES (new.id, new.titulo, 'u' || new.usuario_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tarefa_fts_ad AFTER DELETE ON tarefa BEGIN
+        INSERT INTO tarefa_fts(tarefa_fts, rowid, titulo, usuario)
+        VALUES ('delete', old.id, old.titulo, 'u' || old.usuario_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tarefa_fts_au AFTER UPDATE OF titulo, usuario_id ON tarefa BEGIN
+        INSERT INTO tarefa_fts(tarefa_fts, rowid, titulo, usuario)
+        VALUES ('delete', old.id, old.titulo, 'u' || old.usuario_id);
+        INSERT INTO tarefa_fts(rowid, titulo, usuario)
+        VALUES (new.id, new.titulo, 'u' || new.usuario_id);
+    END
+    """,
+]
+
+DDL_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'pt_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION pt_unaccent (COPY = portuguese);
+            ALTER TEXT SEARCH CONFIGURATION pt_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+        END IF;
+    END $$
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_tarefa_titulo_fts
+        ON tarefa USING gin (to_tsvector('pt_unaccent', titulo))
+    """,
+]
+
+
+def _tabela_existe(connection, nome: str) -> bool:
+    return connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (nome,)
+    ).first() is not None
+
+
+def criar_indice_busca(connection) -> None:
+    """Cria o índice (idempotente) e o popula uma única vez. Usado pela migração."""
+    dialeto = connection.dialect.name
+    if dialeto == "sqlite":
+        novo = not _tabela_existe(connection, "tarefa_fts")
+        for ddl in DDL_SQLITE:
+            connection.exec_driver_sql(ddl)
+        if novo:
+            connection.exec_driver_sql(
+                "INSERT INTO tarefa_fts(rowid, titulo, usuario) "
+                "SELECT id, titulo, 'u' || usuario_id FROM tarefa"
+            )
+    elif dialeto == "postgresql":
+        for ddl in DDL_POSTGRES:
+            connection.exec_driver_sql(ddl)
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def _criar_com_as_tabelas(target, connection, **kw):
+    # create_all (testes e bancos descartáveis) também cria o índice
+    criar_indice_busca(connection)
+
+
+@event.listens_for(SQLModel.metadata, "before_drop")
+def remover_indice_busca(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS tarefa_fts")
+
+
+# =====================================================
+# CONSULTA
+# =====================================================
+
+def _termos(q: str) -> list[str]:
+    # Mesma noção de "palavra" do tokenizador; descarta a sintaxe de
+    # consulta (aspas, operadores) vinda do usuário.
+    return re.findall(r"\w+", q)
+
+
+_COLUNAS = ", ".join(f"t.{campo}" for campo in CAMPOS_TAREFA)
+# Tipos das colunas do resultado (bool/datetime convertidos como no ORM)
+_COLUNAS_TIPADAS = [Tarefa.__table__.c[campo] for campo in CAMPOS_TAREFA]
+
+CONSULTA_SQLITE = text(f"""
+    SELECT {_COLUNAS}
+    FROM tarefa_fts
+    JOIN tarefa AS t ON t.id = tarefa_fts.rowid
+    WHERE tarefa_fts MATCH :consulta
+    ORDER BY bm25(tarefa_fts, 1.0, 0.0), t.id
+    LIMIT :limite OFFSET :deslocamento
+""").columns(*_COLUNAS_TIPADAS)
+
+CONSULTA_POSTGRES = text(f"""
+    SELECT {_COLUNAS}
+    FROM tarefa AS t, to_tsquery('pt_unaccent', :consulta) AS consulta
+    WHERE t.usuario_id = :usuario_id
+      AND to_tsvector('pt_unaccent', t.titulo) @@ consulta
+    ORDER BY ts_rank(to_tsvector('pt_unaccent', t.titulo), consulta) DESC, t.id
+    LIMIT :limite OFFSET :deslocamento
+""").columns(*_COLUNAS_TIPADAS)
+
+
+async def buscar_tarefas(
+    session: AsyncSession,
+    usuario_id: int,
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+) -> tuple[list[dict], int | None]:
+    """
+    Busca textual nos títulos das tarefas do usuário, por relevância.
+    Cada palavra casa por prefixo, sem diferenciar acentos e maiúsculas.
+    Retorna (tarefas, proximo_offset); o offset é None na última página.
+    """
+
+    termos = _termos(q)
+    if not termos:
+        return [], None
+
+    dialeto = session.sync_session.get_bind().dialect.name
+    if dialeto == "postgresql":
+        consulta = CONSULTA_POSTGRES
+        expressao = " & ".join(f"{termo}:*" for termo in termos)
+    else:
+        consulta = CONSULTA_SQLITE
+        prefixos = " ".join(f'"{termo}"*' for termo in termos)
+        expressao = f'usuario : "u{usuario_id}" AND titulo : ({prefixos})'
+
+    linhas = (await session.exec(consulta, params={
+        "consulta": expressao,
+        "usuario_id": usuario_id,
+        "limite": limit + 1,
+        "deslocamento": offset,
+    })).all()
+
+    proximo_offset = None
+    if len(linhas) > limit:
+        linhas = linhas[:limit]
+        proximo_offset = offset + limit
+
+    return [dict(zip(CAMPOS_TAREFA, linha)) for linha in linhas], proximo_offset
@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Cache em memória limitado por tamanho (LRU) e por tempo de vida (TTL).
+    Seguro para uso concorrente pelas rotas síncronas do threadpool.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._dados: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, chave: Hashable) -> Optional[Any]:
+        agora = time.monotonic()
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                self.misses += 1
+                return None
+
+            expira_em, valor = item
+            if expira_em <= agora:
+                del self._dados[chave]
+                self.misses += 1
+                return None
+
+            self._dados.move_to_end(chave)
+            self.hits += 1
+            return valor
+
+    def set(self, chave: Hashable, valor: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + ttl, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_size:
+                self._dados.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, predicado: Callable[[Hashable], bool]) -> int:
+        """Remove todas as entradas cuja chave satisfaz o predicado."""
+        with self._lock:
+            chaves = [chave for chave in self._dados if predicado(chave)]
+            for chave in chaves:
+                del self._dados[chave]
+            return len(chaves)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._dados.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._dados),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
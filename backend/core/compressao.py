@@ -0,0 +1,154 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # opcional: sem o pacote, só gzip
+    brotli = None
+
+# Tipos que valem a compressão. text/event-stream fica de fora: cada evento
+# precisa sair na hora, e o ganho em mensagens pequenas é nulo.
+TIPOS_COMPRIMIVEIS = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "text/",
+)
+
+
+def escolher_codificacao(accept_encoding: str) -> str | None:
+    """Brotli quando o cliente aceita e o pacote existe; senão gzip; senão nada."""
+    aceitas = set()
+    for parte in accept_encoding.lower().split(","):
+        nome, _, parametros = parte.partition(";")
+        chave, _, valor = parametros.strip().partition("=")
+        try:
+            if chave.strip() == "q" and float(valor) <= 0:
+                continue  # "gzip;q=0" recusa explicitamente
+        except ValueError:
+            continue
+        aceitas.add(nome.strip())
+    if brotli is not None and "br" in aceitas:
+        return "br"
+    if "gzip" in aceitas or "*" in aceitas:
+        return "gzip"
+    return None
+
+
+def _comprimivel(status: int, headers: Headers) -> bool:
+    if status < 200 or status in (204, 304) or "content-encoding" in headers:
+        return False
+    tipo = headers.get("content-type", "")
+    return tipo.startswith(TIPOS_COMPRIMIVEIS) and not tipo.startswith("text/event-stream")
+
+
+class _Gzip:
+    def __init__(self, nivel: int):
+        self._compressor = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def comprimir(self, dados: bytes) -> bytes:
+        return self._compressor.compress(dados)
+
+    def descarregar(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finalizar(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, qualidade: int):
+        self._compressor = brotli.Compressor(quality=qualidade)
+
+    def comprimir(self, dados: bytes) -> bytes:
+        return self._compressor.process(dados)
+
+    def descarregar(self) -> bytes:
+        return self._compressor.flush()
+
+    def finalizar(self) -> bytes:
+        return self._compressor.finish()
+
+
+class CompressaoMiddleware:
+    """
+    Comprime as respostas com brotli ou gzip, conforme o Accept-Encoding.
+    Respostas de uma só parte menores que `minimo` bytes saem como estão.
+    Em streaming (export, listas grandes), cada parte é comprimida e
+    descarregada na hora, sem segurar o corpo inteiro na memória.
+    """
+
+    def __init__(self, app, minimo: int = 1024, nivel_gzip: int = 6, qualidade_brotli: int = 4):
+        self.app = app
+        self.minimo = minimo
+        self.nivel_gzip = nivel_gzip
+        self.qualidade_brotli = qualidade_brotli
+
+    def _criar_compressor(self, codificacao: str):
+        if codificacao == "br":
+            return _Brotli(self.qualidade_brotli)
+        return _Gzip(self.nivel_gzip)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codificacao = escolher_codificacao(Headers(scope=scope).get("accept-encoding", ""))
+        if codificacao is None:
+            await self.app(scope, receive, send)
+            return
+
+        # O início da resposta fica retido até a primeira parte do corpo:
+        # só então se sabe o tamanho (e se vale comprimir)
+        inicio = None
+        compressor = None
+        direto = False
+
+        async def send_comprimido(message):
+            nonlocal inicio, compressor, direto
+            tipo = message["type"]
+
+            if tipo == "http.response.start":
+                inicio = message
+                return
+            if direto or tipo != "http.response.body":
+                if inicio is not None:
+                    await send(inicio)
+                    inicio = None
+                await send(message)
+                return
+
+            corpo = message.get("body", b"")
+            mais = message.get("more_body", False)
+
+            if inicio is not None:
+                headers = MutableHeaders(raw=list(inicio.get("headers", [])))
+                if not _comprimivel(inicio["status"], headers) or (not mais and len(corpo) < self.minimo):
+                    direto = True
+                    await send(inicio)
+                    inicio = None
+                    await send(message)
+                    return
+
+                compressor = self._criar_compressor(codificacao)
+                headers["Content-Encoding"] = codificacao
+                headers.add_vary_header("Accept-Encoding")
+                if mais:
+                    del headers["Content-Length"]
+                    corpo = compressor.comprimir(corpo) + compressor.descarregar()
+                else:
+                    corpo = compressor.comprimir(corpo) + compressor.finalizar()
+                    headers["Content-Length"] = str(len(corpo))
+                await send({**inicio, "headers": headers.raw})
+                inicio = None
+                await send({"type": tipo, "body": corpo, "more_body": mais})
+                return
+
+            corpo = compressor.comprimir(corpo)
+            corpo += compressor.descarregar() if mais else compressor.finalizar()
+            await send({"type": tipo, "body": corpo, "more_body": mais})
+
+        await self.app(scope, receive, send_comprimido)
@@ -7,11 +7,111 @@ class Settings(BaseSettings):
     # Segurança
     SECRET_KEY: str = "chave-super-secreta-dev"
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15  # curto: o cliente renova com o refresh token
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+
+    # Hash de senhas (bcrypt em pool de processos)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int | None = None  # None = nº de CPUs; 0 = threadpool
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    PASSWORD_HASH_RETRY_AFTER: int = 1
+
+    # Cache de usuários autenticados (get_current_user)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10_000
+
+    # Versão dos tokens (revogação): quanto tempo cada worker confia na
+    # versão em cache antes de reler do banco
+    TOKEN_VERSION_CACHE_TTL_SECONDS: int = 30
+
+    # Rate limit (token bucket) de login e cadastro: "fichas/segundos"
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "core.ratelimit:MemoriaBackend"  # ou core.ratelimit:BancoBackend
+    RATE_LIMIT_LOGIN_IP: str = "20/60"
+    RATE_LIMIT_LOGIN_USUARIO: str = "5/60"
+    RATE_LIMIT_CADASTRO_IP: str = "5/300"
 
     # Banco de dados
     DATABASE_URL: str = "sqlite:///database.db"
 
+    # Pool de conexões (ignorado para SQLite em memória)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # PRAGMAs aplicados a cada nova conexão SQLite
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+
+    # Paginação da listagem de tarefas
+    TAREFAS_PAGE_SIZE: int = 100
+    TAREFAS_PAGE_MAX: int = 1000
+    # Páginas maiores que isto saem em streaming, lidas do banco em blocos
+    TAREFAS_STREAM_MIN: int = 250
+    TAREFAS_STREAM_YIELD_PER: int = 200
+
+    # Busca textual (/tarefas/search): páginas por relevância
+    BUSCA_OFFSET_MAX: int = 10_000
+
+    # Operações em lote (/tarefas/batch)
+    TAREFAS_BATCH_MAX: int = 1000
+
+    # Exportação/importação (/tarefas/export, /tarefas/import)
+    EXPORT_YIELD_PER: int = 1000
+    IMPORT_BATCH_SIZE: int = 500
+    IMPORT_MAX_ERROS: int = 100  # erros detalhados na resposta
+
+    # Sincronização incremental (/tarefas/changes)
+    TAREFAS_SYNC_MAX: int = 1000
+    TOMBSTONE_RETENCAO_DIAS: int = 30
+    TOMBSTONE_COMPACTACAO_INTERVALO_MIN: int = 360  # 0 desliga a compactação automática
+
+    # Eventos em tempo real (/tarefas/stream)
+    EVENTS_BROKER: str = "core.events:InMemoryBroker"  # ou core.events:BancoBroker (vários workers)
+    EVENTS_POLL_SECONDS: float = 0.5  # BancoBroker: intervalo entre leituras da tabela
+    EVENTS_RETENCAO_SECONDS: int = 60  # BancoBroker: eventos mais velhos são apagados
+    EVENTS_QUEUE_SIZE: int = 100
+    EVENTS_HEARTBEAT_SECONDS: float = 15
+    # Token só de stream (vai na URL do EventSource, que aparece em logs de
+    # acesso e proxies): vale só para abrir o /tarefas/stream, por pouco tempo
+    STREAM_TOKEN_EXPIRE_SECONDS: int = 60
+
+    # Observabilidade (/metrics e header Server-Timing)
+    METRICS_ENABLED: bool = True
+
+    # Profiler por amostragem das requisições lentas (opt-in)
+    PROFILER_ENABLED: bool = False
+    PROFILER_THRESHOLD_MS: float = 500
+    PROFILER_SAMPLE_RATE: float = 0.01  # fração das requisições perfiladas
+    PROFILER_DIR: str = "profiles"
+    PROFILER_MAX_ARQUIVOS: int = 50
+
+    # Compressão das respostas: brotli (se o pacote estiver instalado) ou gzip
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # bytes; respostas menores saem como estão
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    # Servidor de produção (python -m servidor)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_BACKEND: str = "uvicorn"  # ou "gunicorn" (só Unix)
+    SERVER_WORKERS: int | None = None  # None = nº de CPUs
+    SERVER_LOOP: str = "auto"  # auto = uvloop, se instalado
+    SERVER_HTTP: str = "auto"  # auto = httptools, se instalado
+    SERVER_KEEPALIVE_SECONDS: int = 75  # acima do timeout ocioso do proxy à frente
+    SERVER_BACKLOG: int = 2048
+    SERVER_LIMIT_CONCURRENCY: int | None = None  # acima disso, 503
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+    SERVER_MAX_REQUESTS: int = 0  # gunicorn: recicla o worker após N requisições
+    SERVER_FORWARDED_ALLOW_IPS: str = "127.0.0.1"  # proxies confiáveis (X-Forwarded-For)
+    SERVER_ACCESS_LOG: bool = False
+    SERVER_MIGRAR: bool = True  # aplica as migrações pendentes antes de subir os workers
+
     # API (opcional, se você usa no frontend/deploy)
     API_URL: str | None = None
 
@@ -1,64 +1,166 @@
-from sqlmodel import Session, select
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import AsyncIterator
+
+from sqlalchemy import Integer, bindparam, delete, func, insert, not_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import HTTPException, status
 
-from database.models import Usuario, UsuarioCreate, Tarefa, TarefaCreate
+from schemas.models import (
+    Usuario,
+    UsuarioCreate,
+    Tarefa,
+    TarefaCreate,
+    TarefaRemovida,
+    VersaoTarefas,
+    VersaoToken,
+    RefreshToken,
+    MudancasTarefas,
+    EstatisticasTarefas,
+    ResultadoLote,
+    ResultadoLoteItem,
+)
+from core.cache import TTLCache
+from core.config import settings
+
+# Camada única de acesso a dados: rotas, autenticação e scripts passam
+# por aqui, então cada otimização de consulta é feita num lugar só.
+
+# =====================================================
+# CONSULTAS PRÉ-COMPILADAS
+# =====================================================
+# Montadas uma vez no import, com bindparam no lugar dos valores: cada
+# requisição não reconstrói o SELECT e a chave do cache de compilação fica
+# memorizada no próprio objeto, então o SQL compilado sai direto do cache
+# do engine.
+#
+# Carregamento: os relacionamentos dos modelos são lazy="raise". Nenhuma
+# consulta traz tarefas junto com o usuário sem pedir; quem precisar usa
+# selectinload na própria consulta.
+
+_USUARIO_POR_USERNAME = select(Usuario).where(Usuario.username == bindparam("username"))
+_ID_POR_USERNAME = select(Usuario.id).where(Usuario.username == bindparam("username"))
+_VERSAO_TOKEN = select(VersaoToken.versao).where(
+    VersaoToken.usuario_id == bindparam("usuario_id")
+)
+_VERSAO_TAREFAS = select(VersaoTarefas.versao, VersaoTarefas.atualizado_em).where(
+    VersaoTarefas.usuario_id == bindparam("usuario_id")
+)
+_ESTATISTICAS_TAREFAS = (
+    select(Tarefa.concluido, Tarefa.prioridade, func.count())
+    .where(Tarefa.usuario_id == bindparam("usuario_id"))
+    .group_by(Tarefa.concluido, Tarefa.prioridade)
+)
+
+
+# =====================================================
+# CACHES DE LEITURA
+# =====================================================
+
+# Usuários já autenticados, chaveados pelo token (sub + jti/exp).
+# Evita uma consulta à tabela Usuario em toda requisição autenticada.
+principal_cache = TTLCache(
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+# Versão atual dos tokens de cada usuário (claim "tv"), por usuario_id.
+# Uma revogação em outro worker é percebida em até TTL segundos.
+versao_token_cache = TTLCache(
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_VERSION_CACHE_TTL_SECONDS,
+)
+
+
+def invalidar_usuario_cache(username: str) -> None:
+    """Descarta o usuário do cache; chamar sempre que ele for alterado ou desativado."""
+    principal_cache.invalidate(lambda chave: chave[0] == username)
+
+
+def invalidar_versao_token(usuario_id: int) -> None:
+    versao_token_cache.invalidate(lambda chave: chave == usuario_id)
+
 
 # =====================================================
 # USUÁRIOS
 # =====================================================
 
-def criar_usuario(
-    session: Session,
+async def criar_usuario(
+    session: AsyncSession,
     usuario_data: UsuarioCreate,
     senha_hash: str
 ) -> Usuario:
     """
     Cria um novo usuário no sistema.
-    A senha já deve vir hasheada.
+    A senha já deve vir hasheada: quem chama confere o username antes
+    do bcrypt (buscar_id_por_username), então aqui não há outro SELECT.
     """
 
-    # Verifica se username já existe
-    usuario_existente = session.exec(
-        select(Usuario).where(Usuario.username == usuario_data.username)
-    ).first()
-
-    if usuario_existente:
+    # INSERT ... RETURNING: a linha volta no próprio INSERT, sem refresh.
+    # A constraint UNIQUE cobre a corrida entre a verificação e o INSERT.
+    try:
+        novo_usuario = (await session.exec(
+            insert(Usuario)
+            .values(
+                username=usuario_data.username,
+                email=usuario_data.email,
+                password_hash=senha_hash,
+                is_active=True
+            )
+            .returning(Usuario)
+        )).scalars().one()
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Usuário já existe"
         )
 
-    novo_usuario = Usuario(
-        username=usuario_data.username,
-        email=usuario_data.email,
-        password_hash=senha_hash,
-        is_active=True,
-        is_admin=False
-    )
-
-    session.add(novo_usuario)
-    session.commit()
-    session.refresh(novo_usuario)
-
     return novo_usuario
 
 
-def listar_usuarios(session: Session) -> list[Usuario]:
-    return session.exec(select(Usuario)).all()
+async def listar_usuarios(session: AsyncSession) -> list[Usuario]:
+    return (await session.exec(select(Usuario))).all()
 
 
-def buscar_usuario_por_id(
-    session: Session,
+async def buscar_usuario_por_id(
+    session: AsyncSession,
     usuario_id: int
 ) -> Usuario | None:
-    return session.get(Usuario, usuario_id)
+    return await session.get(Usuario, usuario_id)
+
+
+async def buscar_usuario_por_username(
+    session: AsyncSession,
+    username: str
+) -> Usuario | None:
+    return (await session.exec(
+        _USUARIO_POR_USERNAME, params={"username": username}
+    )).first()
 
 
-def deletar_usuario(
-    session: Session,
+async def buscar_id_por_username(
+    session: AsyncSession,
+    username: str
+) -> int | None:
+    """Só o id: confere se o username existe sem carregar a linha."""
+    return (await session.exec(
+        _ID_POR_USERNAME, params={"username": username}
+    )).first()
+
+
+async def deletar_usuario(
+    session: AsyncSession,
     usuario_id: int
 ) -> None:
-    usuario = session.get(Usuario, usuario_id)
+    usuario = await session.get(Usuario, usuario_id)
 
     if not usuario:
         raise HTTPException(
@@ -66,16 +168,415 @@ def deletar_usuario(
             detail="Usuário não encontrado"
         )
 
-    session.delete(usuario)
-    session.commit()
+    username = usuario.username
+    # DELETEs em massa, sem carregar as tarefas na sessão. A ordem respeita
+    # as FKs: no SQLite elas não são garantidas pelo banco.
+    # A versão dos tokens fica: continua invalidando os tokens já emitidos.
+    for modelo in (Tarefa, TarefaRemovida, VersaoTarefas):
+        await session.exec(
+            delete(modelo)
+            .where(modelo.usuario_id == usuario_id)
+            .execution_options(synchronize_session=False)
+        )
+    await session.exec(
+        delete(Usuario)
+        .where(Usuario.id == usuario_id)
+        .execution_options(synchronize_session=False)
+    )
+    await incrementar_versao_token(session, usuario_id)
+    await revogar_refresh_tokens(session, usuario_id)
+    await session.commit()
+    invalidar_usuario_cache(username)
+    invalidar_versao_token(usuario_id)
+
+
+async def desativar_usuario(
+    session: AsyncSession,
+    usuario_id: int
+) -> Usuario:
+    usuario = await session.get(Usuario, usuario_id)
+
+    if not usuario:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Usuário não encontrado"
+        )
+
+    usuario.is_active = False
+    session.add(usuario)
+    await incrementar_versao_token(session, usuario_id)
+    await revogar_refresh_tokens(session, usuario_id)
+    await session.commit()
+    invalidar_usuario_cache(usuario.username)
+    invalidar_versao_token(usuario_id)
+
+    return usuario
+
+
+# =====================================================
+# VERSÃO DOS TOKENS (revogação)
+# =====================================================
+
+_INSERTS_COM_UPSERT = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+async def incrementar_versao_token(
+    session: AsyncSession,
+    usuario_id: int
+) -> int:
+    """
+    Revoga os tokens já emitidos para o usuário (claim tv) incrementando
+    a versão. Chamar invalidar_versao_token após o commit.
+    """
+
+    dialeto = session.sync_session.get_bind().dialect.name
+    upsert = _INSERTS_COM_UPSERT[dialeto](VersaoToken).values(
+        usuario_id=usuario_id,
+        versao=1,
+        atualizado_em=datetime.now(timezone.utc)
+    )
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[VersaoToken.usuario_id],
+        set_={
+            "versao": VersaoToken.versao + 1,
+            "atualizado_em": upsert.excluded.atualizado_em,
+        }
+    ).returning(VersaoToken.versao)
+
+    return (await session.exec(upsert)).scalar_one()
+
+
+async def obter_versao_token(session: AsyncSession, usuario_id: int) -> int:
+    """Versão atual dos tokens do usuário (0 se nunca foram revogados)."""
+    versao = versao_token_cache.get(usuario_id)
+    if versao is None:
+        versao = (await session.exec(
+            _VERSAO_TOKEN, params={"usuario_id": usuario_id}
+        )).first() or 0
+        versao_token_cache.set(usuario_id, versao)
+    return versao
+
+
+async def revogar_tokens_usuario(
+    session: AsyncSession,
+    usuario: Usuario
+) -> int:
+    """Invalida todos os tokens do usuário ("sair de todos os dispositivos")."""
+
+    versao = await incrementar_versao_token(session, usuario.id)
+    await revogar_refresh_tokens(session, usuario.id)
+    await session.commit()
+    invalidar_usuario_cache(usuario.username)
+    invalidar_versao_token(usuario.id)
+    return versao
+
+
+# =====================================================
+# REFRESH TOKENS (rotação com detecção de reuso)
+# =====================================================
+
+def gerar_refresh_token() -> tuple[str, str]:
+    """Retorna (token para o cliente, SHA-256 para o banco)."""
+    token = secrets.token_urlsafe(32)
+    return token, hash_refresh_token(token)
+
+
+def hash_refresh_token(token: str) -> str:
+    # Token aleatório de 256 bits: SHA-256 basta (não precisa de bcrypt)
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _refresh_invalido() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Refresh token inválido ou expirado",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def emitir_refresh_token(
+    session: AsyncSession,
+    usuario_id: int,
+    familia: str | None = None
+) -> str:
+    """
+    Cria um refresh token (nova família no login, a mesma na rotação) e
+    retorna o valor em claro, que só o cliente guarda.
+    """
+
+    token, token_hash = gerar_refresh_token()
+    agora = datetime.now(timezone.utc)
+    await session.exec(insert(RefreshToken).values(
+        token_hash=token_hash,
+        familia=familia or uuid.uuid4().hex,
+        usuario_id=usuario_id,
+        criado_em=agora,
+        expira_em=agora + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    await session.commit()
+    return token
+
+
+async def girar_refresh_token(
+    session: AsyncSession,
+    token: str
+) -> tuple[Usuario, str]:
+    """
+    Consome o refresh token e emite o próximo da mesma família.
+    Retorna (usuario, novo_refresh_token). Um token já usado que volta a
+    ser apresentado indica vazamento: a família inteira é revogada.
+    """
+
+    agora = datetime.now(timezone.utc)
+    token_hash = hash_refresh_token(token)
+
+    # Marca como usado só se ainda for válido: duas rotações concorrentes
+    # do mesmo token não conseguem ambas passar.
+    consumido = (await session.exec(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.usado_em.is_(None),
+            RefreshToken.revogado == False,  # noqa: E712
+            RefreshToken.expira_em > agora,
+        )
+        .values(usado_em=agora)
+        .returning(RefreshToken.familia, RefreshToken.usuario_id)
+    )).first()
+
+    if consumido is None:
+        registro = (await session.exec(
+            select(RefreshToken.familia, RefreshToken.usado_em)
+            .where(RefreshToken.token_hash == token_hash)
+        )).first()
+        if registro is not None and registro.usado_em is not None:
+            await session.exec(
+                update(RefreshToken)
+                .where(RefreshToken.familia == registro.familia)
+                .values(revogado=True)
+            )
+            await session.commit()
+        else:
+            await session.rollback()
+        raise _refresh_invalido()
+
+    familia, usuario_id = consumido
+    usuario = await session.get(Usuario, usuario_id)
+    if usuario is None or not usuario.is_active:
+        await session.commit()
+        raise _refresh_invalido()
+
+    novo = await emitir_refresh_token(session, usuario_id, familia)
+    return usuario, novo
+
+
+async def revogar_refresh_tokens(
+    session: AsyncSession,
+    usuario_id: int
+) -> None:
+    """Revoga os refresh tokens do usuário (na transação de quem chama)."""
+
+    await session.exec(
+        update(RefreshToken)
+        .where(RefreshToken.usuario_id == usuario_id, RefreshToken.revogado == False)  # noqa: E712
+        .values(revogado=True)
+    )
+
+
+async def limpar_refresh_tokens(
+    session: AsyncSession,
+    expirados_antes_de: datetime
+) -> int:
+    """Apaga refresh tokens expirados; retorna quantos foram removidos."""
+
+    removidos = (await session.exec(
+        delete(RefreshToken)
+        .where(RefreshToken.expira_em < expirados_antes_de)
+        .returning(RefreshToken.id)
+    )).all()
+    await session.commit()
+    return len(removidos)
+
+
+# =====================================================
+# VERSÃO DAS TAREFAS (ETag / sincronização)
+# =====================================================
+
+
+async def incrementar_versao_tarefas(
+    session: AsyncSession,
+    usuario_id: int
+) -> int:
+    """
+    Incrementa a versão das tarefas do usuário com um único UPSERT e
+    retorna o novo valor. Deve rodar na mesma transação da escrita.
+    """
+
+    agora = datetime.now(timezone.utc)
+    dialeto = session.sync_session.get_bind().dialect.name
+    upsert = _INSERTS_COM_UPSERT[dialeto](VersaoTarefas).values(
+        usuario_id=usuario_id,
+        versao=1,
+        atualizado_em=agora
+    )
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[VersaoTarefas.usuario_id],
+        set_={
+            "versao": VersaoTarefas.versao + 1,
+            "atualizado_em": agora,
+        }
+    ).returning(VersaoTarefas.versao)
+
+    return (await session.exec(upsert)).scalar_one()
+
+
+async def obter_versao_tarefas(
+    session: AsyncSession,
+    usuario_id: int
+) -> tuple[int, datetime | None]:
+    """Retorna (versao, atualizado_em); (0, None) se o usuário nunca escreveu."""
+
+    versao = (await session.exec(
+        _VERSAO_TAREFAS, params={"usuario_id": usuario_id}
+    )).first()
+
+    if versao is None:
+        return 0, None
+
+    return versao[0], versao[1]
+
+
+async def _registrar_remocoes(
+    session: AsyncSession,
+    usuario_id: int,
+    tarefa_ids: list[int],
+    versao: int
+) -> None:
+    """Grava os tombstones das tarefas removidas (um executemany)."""
+
+    agora = datetime.now(timezone.utc)
+    await session.exec(
+        insert(TarefaRemovida),
+        params=[
+            {
+                "tarefa_id": tarefa_id,
+                "usuario_id": usuario_id,
+                "versao": versao,
+                "removido_em": agora,
+            }
+            for tarefa_id in tarefa_ids
+        ]
+    )
+
+
+async def listar_mudancas_tarefas(
+    session: AsyncSession,
+    usuario_id: int,
+    desde: int,
+    limite: int
+) -> MudancasTarefas:
+    """
+    Sincronização incremental: tarefas criadas/alteradas e ids removidos
+    depois da versão `desde`. Com reset=True o cliente deve baixar a lista
+    completa (tombstones já compactados ou mudanças demais). `desde=0` é
+    sempre um reset: tarefas anteriores à versão por usuário têm versao=0 e
+    não apareceriam num delta.
+    """
+
+    estado = (await session.exec(
+        select(VersaoTarefas.versao, VersaoTarefas.versao_compactada)
+        .where(VersaoTarefas.usuario_id == usuario_id)
+    )).first()
+    versao_atual, versao_compactada = estado if estado else (0, 0)
+
+    # Primeira sincronização: a cópia completa vem do GET /tarefas paginado
+    if desde == 0:
+        return MudancasTarefas(versao=versao_atual, reset=True)
+    if desde == versao_atual:
+        return MudancasTarefas(versao=versao_atual)
+    # Versão do futuro (banco recriado) ou anterior à compactação
+    if desde > versao_atual or desde < versao_compactada:
+        return MudancasTarefas(versao=versao_atual, reset=True)
+
+    alteradas = (await session.exec(
+        select(Tarefa)
+        .where(Tarefa.usuario_id == usuario_id, Tarefa.versao > desde)
+        .order_by(Tarefa.versao, Tarefa.id)
+        .limit(limite + 1)
+    )).all()
+    removidas = (await session.exec(
+        select(TarefaRemovida.tarefa_id)
+        .where(
+            TarefaRemovida.usuario_id == usuario_id,
+            TarefaRemovida.versao > desde
+        )
+        .order_by(TarefaRemovida.versao)
+        .limit(limite + 1)
+    )).all()
+
+    # Mais mudanças do que cabe numa resposta: sai mais barato baixar tudo
+    if len(alteradas) > limite or len(removidas) > limite:
+        return MudancasTarefas(versao=versao_atual, reset=True)
+
+    # Um id reaproveitado pelo banco após a remoção vale como alteração
+    ids_alterados = {tarefa.id for tarefa in alteradas}
+    return MudancasTarefas(
+        versao=versao_atual,
+        alteradas=alteradas,
+        removidas=list(dict.fromkeys(
+            tarefa_id for tarefa_id in removidas
+            if tarefa_id not in ids_alterados
+        ))
+    )
+
+
+async def compactar_tombstones(
+    session: AsyncSession,
+    removidos_antes_de: datetime
+) -> int:
+    """
+    Apaga tombstones antigos. Para cada usuário afetado, guarda em
+    versao_compactada a maior versão apagada: clientes sincronizados antes
+    dela recebem reset=True em vez de um delta incompleto.
+    Retorna o número de tombstones apagados.
+    """
+
+    maximos = (await session.exec(
+        select(TarefaRemovida.usuario_id, func.max(TarefaRemovida.versao))
+        .where(TarefaRemovida.removido_em < removidos_antes_de)
+        .group_by(TarefaRemovida.usuario_id)
+    )).all()
+    if not maximos:
+        return 0
+
+    for usuario_id, versao in maximos:
+        await session.exec(
+            update(VersaoTarefas)
+            .where(
+                VersaoTarefas.usuario_id == usuario_id,
+                VersaoTarefas.versao_compactada < versao
+            )
+            .values(versao_compactada=versao)
+        )
+
+    apagados = (await session.exec(
+        delete(TarefaRemovida)
+        .where(TarefaRemovida.removido_em < removidos_antes_de)
+    )).rowcount
+    await session.commit()
+
+    return apagados
 
 
 # =====================================================
 # TAREFAS
 # =====================================================
 
-def criar_tarefa(
-    session: Session,
+async def criar_tarefa(
+    session: AsyncSession,
     tarefa_data: TarefaCreate,
     usuario_id: int
 ) -> Tarefa:
@@ -83,80 +584,446 @@ def criar_tarefa(
     Cria uma tarefa vinculada ao usuário autenticado.
     """
 
-    tarefa = Tarefa(
-        titulo=tarefa_data.titulo,
-        prioridade=tarefa_data.prioridade,
-        usuario_id=usuario_id
+    versao = await incrementar_versao_tarefas(session, usuario_id)
+    tarefa = (await session.exec(
+        insert(Tarefa)
+        .values(
+            titulo=tarefa_data.titulo,
+            prioridade=tarefa_data.prioridade,
+            usuario_id=usuario_id,
+            versao=versao,
+            atualizado_em=datetime.now(timezone.utc)
+        )
+        .returning(Tarefa)
+    )).scalars().one()
+    await session.commit()
+
+    return tarefa
+
+
+# Colunas devolvidas pela listagem, na mesma forma do modelo Tarefa
+CAMPOS_TAREFA = ("id", "titulo", "prioridade", "concluido", "usuario_id", "versao", "atualizado_em")
+
+
+@lru_cache(maxsize=None)
+def _query_tarefas_usuario(
+    forma: str,
+    com_cursor: bool,
+    por_status: bool,
+    por_prioridade: bool,
+    ordem: str,
+):
+    """
+    SELECT da listagem, um por forma ("modelo", "linhas" ou "ids") e
+    combinação de filtros, montado no primeiro uso e reaproveitado: os
+    valores entram por parâmetro (_parametros_listagem).
+    """
+    if forma == "linhas":
+        colunas = tuple(getattr(Tarefa, campo) for campo in CAMPOS_TAREFA)
+    elif forma == "ids":
+        colunas = (Tarefa.id,)
+    else:
+        colunas = (Tarefa,)
+    query = select(*colunas).where(Tarefa.usuario_id == bindparam("usuario_id"))
+
+    if por_status:
+        query = query.where(Tarefa.concluido == bindparam("concluido"))
+    if por_prioridade:
+        query = query.where(Tarefa.prioridade == bindparam("prioridade"))
+
+    if ordem == "desc":
+        if com_cursor:
+            query = query.where(Tarefa.id < bindparam("after"))
+        query = query.order_by(Tarefa.id.desc())
+    else:
+        if com_cursor:
+            query = query.where(Tarefa.id > bindparam("after"))
+        query = query.order_by(Tarefa.id.asc())
+
+    if forma == "ids":
+        query = query.offset(bindparam("pular", type_=Integer))
+    return query.limit(bindparam("limite", type_=Integer))
+
+
+def _parametros_listagem(
+    forma: str,
+    usuario_id: int,
+    limit: int,
+    after: int | None,
+    concluido: bool | None,
+    prioridade: str | None,
+    ordem: str,
+):
+    query = _query_tarefas_usuario(
+        forma, after is not None, concluido is not None, prioridade is not None, ordem
     )
+    if forma == "ids":
+        # Só a última tarefa da página e a seguinte (cursor_da_pagina)
+        params = {"usuario_id": usuario_id, "pular": limit - 1, "limite": 2}
+    else:
+        # Busca um item a mais só para saber se existe próxima página
+        params = {"usuario_id": usuario_id, "limite": limit + 1}
+    if after is not None:
+        params["after"] = after
+    if concluido is not None:
+        params["concluido"] = concluido
+    if prioridade is not None:
+        params["prioridade"] = prioridade
+    return query, params
 
-    session.add(tarefa)
-    session.commit()
-    session.refresh(tarefa)
 
-    return tarefa
+async def listar_tarefas_usuario(
+    session: AsyncSession,
+    usuario_id: int,
+    limit: int = 100,
+    after: int | None = None,
+    concluido: bool | None = None,
+    prioridade: str | None = None,
+    ordem: str = "asc"
+) -> tuple[list[Tarefa], int | None]:
+    """
+    Lista uma página de tarefas do usuário usando paginação por cursor.
+    Retorna (tarefas, proximo_cursor); o cursor é None na última página.
+    """
+
+    query, params = _parametros_listagem(
+        "modelo", usuario_id, limit, after, concluido, prioridade, ordem
+    )
+    tarefas = (await session.exec(query, params=params)).all()
 
+    if len(tarefas) > limit:
+        tarefas = tarefas[:limit]
+        return tarefas, tarefas[-1].id
 
-def listar_tarefas_usuario(
-    session: Session,
-    usuario_id: int
-) -> list[Tarefa]:
-    return session.exec(
-        select(Tarefa).where(Tarefa.usuario_id == usuario_id)
-    ).all()
+    return tarefas, None
+
+
+async def listar_linhas_tarefas_usuario(
+    session: AsyncSession,
+    usuario_id: int,
+    limit: int = 100,
+    after: int | None = None,
+    concluido: bool | None = None,
+    prioridade: str | None = None,
+    ordem: str = "asc"
+) -> tuple[list[dict], int | None]:
+    """
+    Mesma página de listar_tarefas_usuario, mas como dicts montados direto
+    das tuplas do banco: sem objetos ORM nem validação Pydantic por linha.
+    """
+
+    query, params = _parametros_listagem(
+        "linhas", usuario_id, limit, after, concluido, prioridade, ordem
+    )
+    linhas = (await session.exec(query, params=params)).all()
+
+    proximo_cursor = None
+    if len(linhas) > limit:
+        linhas = linhas[:limit]
+        proximo_cursor = linhas[-1][0]
+
+    return [dict(zip(CAMPOS_TAREFA, linha)) for linha in linhas], proximo_cursor
+
+
+async def cursor_da_pagina(
+    session: AsyncSession,
+    usuario_id: int,
+    limit: int,
+    after: int | None = None,
+    concluido: bool | None = None,
+    prioridade: str | None = None,
+    ordem: str = "asc"
+) -> int | None:
+    """
+    Cursor da próxima página sem ler a página: só os ids nas posições
+    limit e limit+1, que o índice (usuario_id, ..., id) entrega sem tocar
+    nas linhas. None se a página é a última.
+    """
+
+    query, params = _parametros_listagem(
+        "ids", usuario_id, limit, after, concluido, prioridade, ordem
+    )
+    ids = (await session.exec(query, params=params)).all()
+    return ids[0] if len(ids) == 2 else None
+
+
+async def stream_linhas_tarefas_usuario(
+    session: AsyncSession,
+    usuario_id: int,
+    limit: int,
+    after: int | None = None,
+    concluido: bool | None = None,
+    prioridade: str | None = None,
+    ordem: str = "asc",
+    yield_per: int = 200
+) -> AsyncIterator[list[dict]]:
+    """
+    A mesma página de listar_linhas_tarefas_usuario, lida do banco em
+    blocos de yield_per linhas: a memória fica em um bloco, não na página.
+    """
+
+    query, params = _parametros_listagem(
+        "linhas", usuario_id, limit, after, concluido, prioridade, ordem
+    )
+    params["limite"] = limit
+    resultado = await session.stream(
+        query, params=params, execution_options={"yield_per": yield_per}
+    )
+    async for linhas in resultado.partitions():
+        yield [dict(zip(CAMPOS_TAREFA, linha)) for linha in linhas]
+
+
+async def estatisticas_tarefas(
+    session: AsyncSession,
+    usuario_id: int,
+    versao: int = 0
+) -> EstatisticasTarefas:
+    """
+    Totais do usuário (geral, concluídas e por prioridade) com um único
+    COUNT agrupado. O índice (usuario_id, concluido, prioridade, id) cobre
+    a consulta: o banco conta pelo índice, sem ler as linhas da tabela.
+    """
+
+    grupos = (await session.exec(
+        _ESTATISTICAS_TAREFAS, params={"usuario_id": usuario_id}
+    )).all()
 
+    estatisticas = EstatisticasTarefas(versao=versao)
+    for concluido, prioridade, quantidade in grupos:
+        estatisticas.total += quantidade
+        if concluido:
+            estatisticas.concluidas += quantidade
+        estatisticas.por_prioridade[prioridade] = (
+            estatisticas.por_prioridade.get(prioridade, 0) + quantidade
+        )
+    estatisticas.pendentes = estatisticas.total - estatisticas.concluidas
+
+    return estatisticas
 
-def buscar_tarefa_por_id(
-    session: Session,
+
+async def buscar_tarefa_por_id(
+    session: AsyncSession,
     tarefa_id: int
 ) -> Tarefa | None:
-    return session.get(Tarefa, tarefa_id)
+    return await session.get(Tarefa, tarefa_id)
 
 
-def concluir_tarefa(
-    session: Session,
+async def concluir_tarefa(
+    session: AsyncSession,
     tarefa_id: int,
     usuario_id: int
 ) -> Tarefa:
-    tarefa = session.get(Tarefa, tarefa_id)
+    """
+    Marca a tarefa como concluída com um único UPDATE ... RETURNING.
+    Tarefas de outros usuários são tratadas como inexistentes.
+    """
+
+    return await _atualizar_tarefa(session, tarefa_id, usuario_id, True)
+
+
+async def alternar_conclusao_tarefa(
+    session: AsyncSession,
+    tarefa_id: int,
+    usuario_id: int
+) -> Tarefa:
+    """
+    Inverte o status de conclusão de forma atômica no banco
+    (SET concluido = NOT concluido), sem ler a tarefa antes.
+    Dois clientes alternando ao mesmo tempo não perdem atualização.
+    """
+
+    return await _atualizar_tarefa(
+        session, tarefa_id, usuario_id, not_(Tarefa.concluido)
+    )
+
+
+async def _atualizar_tarefa(
+    session: AsyncSession,
+    tarefa_id: int,
+    usuario_id: int,
+    concluido
+) -> Tarefa:
+    versao = await incrementar_versao_tarefas(session, usuario_id)
+    tarefa = (await session.exec(
+        update(Tarefa)
+        .where(Tarefa.id == tarefa_id, Tarefa.usuario_id == usuario_id)
+        .values(
+            concluido=concluido,
+            versao=versao,
+            atualizado_em=datetime.now(timezone.utc)
+        )
+        .returning(Tarefa)
+        .execution_options(synchronize_session=False)
+    )).scalars().first()
 
     if not tarefa:
+        # Desfaz o incremento de versão: nada mudou
+        await session.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Tarefa não encontrada"
         )
 
-    if tarefa.usuario_id != usuario_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Acesso negado"
-        )
-
-    tarefa.concluido = True
-    session.add(tarefa)
-    session.commit()
-    session.refresh(tarefa)
+    await session.commit()
 
     return tarefa
 
 
-def deletar_tarefa(
-    session: Session,
+async def deletar_tarefa(
+    session: AsyncSession,
     tarefa_id: int,
     usuario_id: int
-) -> None:
-    tarefa = session.get(Tarefa, tarefa_id)
+) -> int:
+    """
+    Remove a tarefa e grava o tombstone. Retorna a versão da remoção.
+    """
 
-    if not tarefa:
+    versao = await incrementar_versao_tarefas(session, usuario_id)
+    removida = (await session.exec(
+        delete(Tarefa)
+        .where(Tarefa.id == tarefa_id, Tarefa.usuario_id == usuario_id)
+        .returning(Tarefa.id)
+        .execution_options(synchronize_session=False)
+    )).first()
+
+    if not removida:
+        await session.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Tarefa não encontrada"
         )
 
-    if tarefa.usuario_id != usuario_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Acesso negado"
+    await _registrar_remocoes(session, usuario_id, [tarefa_id], versao)
+    await session.commit()
+
+    return versao
+
+
+# =====================================================
+# TAREFAS EM LOTE
+# =====================================================
+
+async def criar_tarefas_lote(
+    session: AsyncSession,
+    tarefas_data: list[TarefaCreate],
+    usuario_id: int
+) -> ResultadoLote:
+    """
+    Cria várias tarefas com um único INSERT ... RETURNING.
+    Ou todas são criadas, ou nenhuma (mesma transação).
+    """
+
+    if not tarefas_data:
+        return ResultadoLote(resultados=[])
+
+    versao = await incrementar_versao_tarefas(session, usuario_id)
+    agora = datetime.now(timezone.utc)
+    valores = [
+        {
+            **tarefa.model_dump(),
+            "usuario_id": usuario_id,
+            "versao": versao,
+            "atualizado_em": agora,
+        }
+        for tarefa in tarefas_data
+    ]
+
+    tarefas = (await session.exec(
+        insert(Tarefa).returning(Tarefa, sort_by_parameter_order=True),
+        params=valores
+    )).scalars().all()
+    await session.commit()
+
+    return ResultadoLote(
+        resultados=[
+            ResultadoLoteItem(id=tarefa.id, status="criada")
+            for tarefa in tarefas
+        ],
+        tarefas=tarefas,
+        versao=versao
+    )
+
+
+async def concluir_tarefas_lote(
+    session: AsyncSession,
+    tarefa_ids: list[int],
+    usuario_id: int
+) -> ResultadoLote:
+    """
+    Marca como concluídas, em um único UPDATE, as tarefas do usuário
+    cujos ids foram informados. Ids de outros usuários contam como
+    não encontrados.
+    """
+
+    ids = list(dict.fromkeys(tarefa_ids))
+    if not ids:
+        return ResultadoLote(resultados=[])
+
+    versao = await incrementar_versao_tarefas(session, usuario_id)
+    tarefas = (await session.exec(
+        update(Tarefa)
+        .where(Tarefa.usuario_id == usuario_id, Tarefa.id.in_(ids))
+        .values(
+            concluido=True,
+            versao=versao,
+            atualizado_em=datetime.now(timezone.utc)
         )
+        .returning(Tarefa)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+    if tarefas:
+        await session.commit()
+    else:
+        await session.rollback()
+
+    concluidas = {tarefa.id for tarefa in tarefas}
+    return ResultadoLote(
+        resultados=[
+            ResultadoLoteItem(
+                id=tarefa_id,
+                status="concluida" if tarefa_id in concluidas else "nao_encontrada"
+            )
+            for tarefa_id in ids
+        ],
+        tarefas=sorted(tarefas, key=lambda tarefa: tarefa.id),
+        versao=versao if tarefas else None
+    )
+
 
-    session.delete(tarefa)
-    session.commit()
+async def deletar_tarefas_lote(
+    session: AsyncSession,
+    tarefa_ids: list[int],
+    usuario_id: int
+) -> ResultadoLote:
+    """
+    Remove, em um único DELETE, as tarefas do usuário cujos ids foram
+    informados.
+    """
+
+    ids = list(dict.fromkeys(tarefa_ids))
+    if not ids:
+        return ResultadoLote(resultados=[])
+
+    versao = await incrementar_versao_tarefas(session, usuario_id)
+    removidas = set((await session.exec(
+        delete(Tarefa)
+        .where(Tarefa.usuario_id == usuario_id, Tarefa.id.in_(ids))
+        .returning(Tarefa.id)
+        .execution_options(synchronize_session=False)
+    )).scalars())
+    if removidas:
+        await _registrar_remocoes(session, usuario_id, sorted(removidas), versao)
+        await session.commit()
+    else:
+        await session.rollback()
+
+    return ResultadoLote(
+        resultados=[
+            ResultadoLoteItem(
+                id=tarefa_id,
+                status="removida" if tarefa_id in removidas else "nao_encontrada"
+            )
+            for tarefa_id in ids
+        ],
+        versao=versao if removidas else None
+    )
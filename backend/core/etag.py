@@ -0,0 +1,55 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request
+
+
+def gerar_etag(*partes) -> str:
+    """ETag fraco derivado das partes informadas (ex.: usuário, versão, query)."""
+    digest = hashlib.blake2b(
+        "|".join(str(parte) for parte in partes).encode("utf-8"),
+        digest_size=12,
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def formatar_last_modified(momento: datetime) -> str:
+    if momento.tzinfo is None:
+        momento = momento.replace(tzinfo=timezone.utc)
+    return format_datetime(momento.astimezone(timezone.utc), usegmt=True)
+
+
+def nao_modificado(
+    request: Request,
+    etag: str,
+    ultima_modificacao: Optional[datetime] = None,
+) -> bool:
+    """
+    Avalia If-None-Match / If-Modified-Since (RFC 9110).
+    If-None-Match tem precedência; If-Modified-Since só é usado sem ele.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidatos = [valor.strip() for valor in if_none_match.split(",")]
+        # Comparação fraca: ignora o prefixo W/
+        alvo = etag.removeprefix("W/")
+        return "*" in candidatos or any(
+            candidato.removeprefix("W/") == alvo for candidato in candidatos
+        )
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and ultima_modificacao is not None:
+        try:
+            desde = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if desde.tzinfo is None:
+            desde = desde.replace(tzinfo=timezone.utc)
+        if ultima_modificacao.tzinfo is None:
+            ultima_modificacao = ultima_modificacao.replace(tzinfo=timezone.utc)
+        # O header tem resolução de segundos
+        return ultima_modificacao.replace(microsecond=0) <= desde
+
+    return False
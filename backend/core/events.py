@@ -0,0 +1,211 @@
+import asyncio
+import contextlib
+import importlib
+import json
+import logging
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Optional, Protocol
+
+from sqlalchemy import delete, func, insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from schemas.models import EventoTarefa
+
+logger = logging.getLogger(__name__)
+
+Entrega = Callable[[int, dict], Awaitable[None]]
+
+
+class Broker(Protocol):
+    """
+    Transporte dos eventos entre processos. Cada worker publica no broker
+    e recebe de volta (via `entregar`) todos os eventos, inclusive os seus.
+    """
+
+    async def start(self, entregar: Entrega) -> None: ...
+
+    async def publish(self, usuario_id: int, evento: dict) -> None: ...
+
+    async def stop(self) -> None: ...
+
+
+class InMemoryBroker:
+    """Broker de um único processo (dev/testes): entrega direto ao hub local."""
+
+    def __init__(self):
+        self._entregar: Optional[Entrega] = None
+
+    async def start(self, entregar: Entrega) -> None:
+        self._entregar = entregar
+
+    async def publish(self, usuario_id: int, evento: dict) -> None:
+        if self._entregar is not None:
+            await self._entregar(usuario_id, evento)
+
+    async def stop(self) -> None:
+        self._entregar = None
+
+
+class BancoBroker:
+    """
+    Eventos numa tabela do banco, compartilhados entre workers/instâncias.
+    Publicar é um INSERT; cada worker lê periodicamente os ids acima do
+    último que entregou. Substituto local de um broker como o Redis: a
+    latência é a do intervalo de leitura. Um evento perdido (ex.: id
+    gravado fora de ordem por transações concorrentes) não corrompe nada,
+    o cliente ressincroniza por /tarefas/changes.
+    """
+
+    def __init__(
+        self,
+        engine=None,
+        intervalo: Optional[float] = None,
+        retencao: Optional[float] = None,
+        relogio: Callable[[], float] = time.time,
+    ):
+        if engine is None:
+            from database.connection import async_engine as engine
+        self.engine = engine
+        self.intervalo = settings.EVENTS_POLL_SECONDS if intervalo is None else intervalo
+        self.retencao = settings.EVENTS_RETENCAO_SECONDS if retencao is None else retencao
+        self.relogio = relogio
+        self._ultimo = 0
+        self._leitura: Optional[asyncio.Task] = None
+
+    async def start(self, entregar: Entrega) -> None:
+        # Só os eventos publicados daqui em diante
+        async with AsyncSession(self.engine) as session:
+            self._ultimo = (await session.exec(select(func.max(EventoTarefa.id)))).first() or 0
+        self._leitura = asyncio.create_task(self._ler_periodicamente(entregar))
+
+    async def publish(self, usuario_id: int, evento: dict) -> None:
+        async with AsyncSession(self.engine) as session:
+            await session.exec(insert(EventoTarefa).values(
+                usuario_id=usuario_id,
+                dados=json.dumps(evento, ensure_ascii=False),
+                criado_em=self.relogio(),
+            ))
+            await session.commit()
+
+    async def ler(self, entregar: Entrega, limite: int = 500) -> int:
+        """Entrega os eventos novos, em ordem; retorna quantos foram lidos."""
+        async with AsyncSession(self.engine) as session:
+            eventos = (await session.exec(
+                select(EventoTarefa.id, EventoTarefa.usuario_id, EventoTarefa.dados)
+                .where(EventoTarefa.id > self._ultimo)
+                .order_by(EventoTarefa.id)
+                .limit(limite)
+            )).all()
+        for evento_id, usuario_id, dados in eventos:
+            self._ultimo = evento_id
+            await entregar(usuario_id, json.loads(dados))
+        return len(eventos)
+
+    async def limpar(self, antes_de: float) -> None:
+        """Apaga eventos que todos os workers já tiveram tempo de ler."""
+        async with AsyncSession(self.engine) as session:
+            await session.exec(delete(EventoTarefa).where(EventoTarefa.criado_em < antes_de))
+            await session.commit()
+
+    async def _ler_periodicamente(self, entregar: Entrega) -> None:
+        limpo_em = self.relogio()
+        while True:
+            try:
+                await self.ler(entregar)
+                agora = self.relogio()
+                if agora - limpo_em >= self.retencao:
+                    await self.limpar(agora - self.retencao)
+                    limpo_em = agora
+            except Exception:
+                logger.exception("Falha ao ler eventos do banco")
+            await asyncio.sleep(self.intervalo)
+
+    async def stop(self) -> None:
+        if self._leitura is not None:
+            self._leitura.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._leitura
+            self._leitura = None
+
+
+class Subscription:
+    def __init__(self, usuario_id: int, max_size: int):
+        self.usuario_id = usuario_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.evicted = False
+
+
+class EventHub:
+    """
+    Pub/sub em processo para os eventos de tarefas.
+
+    Cada conexão tem uma fila limitada; um consumidor lento que deixa a
+    fila encher é desconectado (evicted) em vez de atrasar os demais ou
+    acumular memória. Ao reconectar, o cliente recupera o que perdeu em
+    /tarefas/changes a partir da última versão recebida.
+    """
+
+    def __init__(self, broker: Broker, queue_size: int):
+        self.broker = broker
+        self.queue_size = queue_size
+        self._inscricoes: dict[int, set[Subscription]] = defaultdict(set)
+        self.evictions = 0
+
+    async def start(self) -> None:
+        await self.broker.start(self._entregar)
+
+    async def stop(self) -> None:
+        await self.broker.stop()
+        for inscricoes in self._inscricoes.values():
+            for inscricao in inscricoes:
+                inscricao.evicted = True
+        self._inscricoes.clear()
+
+    def subscribe(self, usuario_id: int) -> Subscription:
+        inscricao = Subscription(usuario_id, self.queue_size)
+        self._inscricoes[usuario_id].add(inscricao)
+        return inscricao
+
+    def unsubscribe(self, inscricao: Subscription) -> None:
+        inscricoes = self._inscricoes.get(inscricao.usuario_id)
+        if inscricoes is not None:
+            inscricoes.discard(inscricao)
+            if not inscricoes:
+                del self._inscricoes[inscricao.usuario_id]
+
+    async def publish(self, usuario_id: int, evento: dict) -> None:
+        try:
+            await self.broker.publish(usuario_id, evento)
+        except Exception:
+            # Evento perdido não quebra a escrita: o cliente ressincroniza
+            logger.exception("Falha ao publicar evento de tarefa")
+
+    async def _entregar(self, usuario_id: int, evento: dict) -> None:
+        for inscricao in list(self._inscricoes.get(usuario_id, ())):
+            try:
+                inscricao.queue.put_nowait(evento)
+            except asyncio.QueueFull:
+                inscricao.evicted = True
+                self.evictions += 1
+                self.unsubscribe(inscricao)
+
+    def stats(self) -> dict:
+        return {
+            "subscriptions": sum(len(i) for i in self._inscricoes.values()),
+            "evictions": self.evictions,
+        }
+
+
+def _criar_broker(caminho: str) -> Broker:
+    # Formato "modulo:Classe", ex.: "core.events:BancoBroker"
+    modulo, _, nome = caminho.partition(":")
+    return getattr(importlib.import_module(modulo), nome)()
+
+
+event_hub = EventHub(
+    broker=_criar_broker(settings.EVENTS_BROKER),
+    queue_size=settings.EVENTS_QUEUE_SIZE,
+)
@@ -0,0 +1,111 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from core.config import settings
+from core.metrics import registrar_etapa
+
+_contexto = None
+
+
+def contexto_senhas():
+    """
+    CryptContext do bcrypt, criado no primeiro uso: o passlib só é
+    importado nos processos que de fato calculam hashes (o pool), e não a
+    cada worker que sobe.
+    """
+    global _contexto
+    if _contexto is None:
+        from passlib.context import CryptContext
+
+        _contexto = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__rounds=settings.BCRYPT_ROUNDS,
+        )
+    return _contexto
+
+
+def __getattr__(nome):
+    # `from core.hashing import pwd_context` continua funcionando (scripts,
+    # benchmarks), sem carregar o passlib no import do módulo
+    if nome == "pwd_context":
+        return contexto_senhas()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+
+# Funções de módulo (e não métodos) para poderem ser enviadas ao pool de processos
+def _hash(password: str) -> str:
+    return contexto_senhas().hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return contexto_senhas().verify(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Executa o bcrypt fora do event loop, em um pool de processos.
+
+    O número de operações pendentes é limitado: quando a fila enche, a
+    requisição é recusada com 503 + Retry-After em vez de acumular latência.
+    Com workers=0 usa o threadpool padrão (útil em testes e dev).
+    """
+
+    def __init__(self, workers: Optional[int], max_pending: int, retry_after: int):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self._executor is None and self.workers > 0:
+            # "spawn": o pool nasce com o servidor já rodando (threads do
+            # aiosqlite/asyncpg e do threadpool); um fork copiaria locks
+            # seguros por essas threads e poderia travar os filhos
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def _submit(self, operacao: str, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado, tente novamente em instantes",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        self.pending += 1
+        inicio = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+            registrar_etapa("bcrypt", operacao, time.perf_counter() - inicio)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", _hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit("verify", _verify, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    retry_after=settings.PASSWORD_HASH_RETRY_AFTER,
+)
@@ -0,0 +1,258 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional
+
+# =========================
+# PRIMITIVAS (formato texto do Prometheus)
+# =========================
+
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_TAMANHO = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+BUCKETS_QUERIES = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_labels(nomes: tuple, valores: tuple, extra: str = "") -> str:
+    partes = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, labels: Iterable[str] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def cabecalho(self) -> list[str]:
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+
+
+class Counter(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, nome, ajuda, labels=()):
+        super().__init__(nome, ajuda, labels)
+        self._valores: dict[tuple, float] = {}
+
+    def inc(self, *labels, valor: float = 1) -> None:
+        with self._lock:
+            self._valores[labels] = self._valores.get(labels, 0) + valor
+
+    def render(self) -> list[str]:
+        with self._lock:
+            itens = list(self._valores.items())
+        return self.cabecalho() + [
+            f"{self.nome}{_formatar_labels(self.labels, chave)} {valor}"
+            for chave, valor in itens
+        ]
+
+
+class Gauge(Counter):
+    tipo = "gauge"
+
+    def dec(self, *labels, valor: float = 1) -> None:
+        self.inc(*labels, valor=-valor)
+
+
+class Histogram(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, labels=(), buckets=BUCKETS_LATENCIA):
+        super().__init__(nome, ajuda, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [contagem por bucket..., soma, total]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, valor: float, *labels) -> None:
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(labels)
+            if serie is None:
+                serie = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            if indice < len(self.buckets):
+                serie[indice] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            itens = [(chave, list(serie)) for chave, serie in self._series.items()]
+        linhas = self.cabecalho()
+        for chave, serie in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, serie):
+                acumulado += contagem
+                rotulos = _formatar_labels(self.labels, chave, f'le="{limite}"')
+                linhas.append(f"{self.nome}_bucket{rotulos} {acumulado}")
+            rotulos = _formatar_labels(self.labels, chave, 'le="+Inf"')
+            linhas.append(f"{self.nome}_bucket{rotulos} {serie[-1]}")
+            linhas.append(f"{self.nome}_sum{_formatar_labels(self.labels, chave)} {serie[-2]}")
+            linhas.append(f"{self.nome}_count{_formatar_labels(self.labels, chave)} {serie[-1]}")
+        return linhas
+
+
+class Registry:
+    def __init__(self):
+        self._metricas: list[_Metrica] = []
+        # Coletores chamados na hora do scrape: nome -> função que retorna {chave: valor}
+        self._coletores: list[tuple[str, str, Callable[[], dict]]] = []
+
+    def registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def coletor(self, prefixo: str, ajuda: str, funcao: Callable[[], dict]) -> None:
+        self._coletores.append((prefixo, ajuda, funcao))
+
+    def render(self) -> str:
+        linhas = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.render())
+        for prefixo, ajuda, funcao in self._coletores:
+            for chave, valor in funcao().items():
+                if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+                    continue
+                nome = f"{prefixo}_{chave}"
+                linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} gauge", f"{nome} {valor}"]
+        return "\n".join(linhas) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.registrar(Counter(
+    "http_requests_total", "Requisições HTTP atendidas", ("method", "route", "status")
+))
+http_latencia = registry.registrar(Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP", ("method", "route")
+))
+http_em_andamento = registry.registrar(Gauge(
+    "http_requests_in_flight", "Requisições HTTP em andamento"
+))
+http_tamanho_resposta = registry.registrar(Histogram(
+    "http_response_size_bytes", "Tamanho do corpo das respostas", ("method", "route"), BUCKETS_TAMANHO
+))
+db_queries_por_requisicao = registry.registrar(Histogram(
+    "db_queries_per_request", "Statements SQL por requisição", ("route",), BUCKETS_QUERIES
+))
+db_latencia = registry.registrar(Histogram(
+    "db_query_duration_seconds", "Tempo de execução de cada statement SQL"
+))
+etapa_latencia = registry.registrar(Histogram(
+    "app_stage_duration_seconds", "Tempo gasto por etapa (bcrypt, jwt)", ("stage", "op")
+))
+
+
+# =========================
+# CONTEXTO DA REQUISIÇÃO
+# =========================
+
+class ContextoRequisicao:
+    __slots__ = ("db_queries", "db_segundos", "etapas")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_segundos = 0.0
+        self.etapas: dict[str, float] = {}
+
+
+contexto_requisicao: ContextVar[Optional[ContextoRequisicao]] = ContextVar(
+    "contexto_requisicao", default=None
+)
+
+
+def registrar_etapa(etapa: str, operacao: str, segundos: float) -> None:
+    """Registra o tempo de uma etapa (ex.: bcrypt/verify) no histograma e na requisição atual."""
+    etapa_latencia.observe(segundos, etapa, operacao)
+    contexto = contexto_requisicao.get()
+    if contexto is not None:
+        contexto.etapas[etapa] = contexto.etapas.get(etapa, 0.0) + segundos
+
+
+def registrar_query(segundos: float) -> None:
+    db_latencia.observe(segundos)
+    contexto = contexto_requisicao.get()
+    if contexto is not None:
+        contexto.db_queries += 1
+        contexto.db_segundos += segundos
+
+
+# Hooks para o engine do SQLAlchemy (before/after_cursor_execute)
+def antes_de_executar(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_metricas_inicio", []).append(time.perf_counter())
+
+
+def depois_de_executar(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get("_metricas_inicio")
+    if inicios:
+        registrar_query(time.perf_counter() - inicios.pop())
+
+
+# =========================
+# MIDDLEWARE (ASGI puro, sem BaseHTTPMiddleware)
+# =========================
+
+class MetricsMiddleware:
+    """
+    Mede latência, requisições em andamento e tamanho das respostas por
+    rota, e adiciona o header Server-Timing (app, db, bcrypt, jwt).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        contexto = ContextoRequisicao()
+        token = contexto_requisicao.set(contexto)
+        estado = {"status": 500, "bytes": 0}
+        http_em_andamento.inc()
+
+        async def send_com_metricas(message):
+            if message["type"] == "http.response.start":
+                estado["status"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(contexto, inicio).encode("latin-1")))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                estado["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_com_metricas)
+        finally:
+            duracao = time.perf_counter() - inicio
+            rota = scope.get("route")
+            caminho = getattr(rota, "path", "desconhecida")
+            metodo = scope["method"]
+
+            http_em_andamento.dec()
+            http_requests.inc(metodo, caminho, estado["status"])
+            http_latencia.observe(duracao, metodo, caminho)
+            http_tamanho_resposta.observe(estado["bytes"], metodo, caminho)
+            db_queries_por_requisicao.observe(contexto.db_queries, caminho)
+            contexto_requisicao.reset(token)
+
+
+def _server_timing(contexto: ContextoRequisicao, inicio: float) -> str:
+    partes = [f"app;dur={(time.perf_counter() - inicio) * 1000:.2f}"]
+    if contexto.db_queries:
+        partes.append(
+            f'db;dur={contexto.db_segundos * 1000:.2f};desc="{contexto.db_queries} queries"'
+        )
+    for etapa, segundos in contexto.etapas.items():
+        partes.append(f"{etapa};dur={segundos * 1000:.2f}")
+    return ", ".join(partes)
@@ -0,0 +1,132 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from core.config import settings
+
+# Nome dos arquivos: <epoch_ms>_<METODO>_<rota>_<duracao_ms>ms.prof
+_PADRAO_ARQUIVO = re.compile(r"^(\d+)_([A-Z]+)_([\w.-]*)_(\d+)ms\.prof$")
+
+
+class ProfileStore:
+    """
+    Buffer circular de perfis no disco: guarda no máximo `max_arquivos`,
+    apagando os mais antigos ao salvar um novo.
+    """
+
+    def __init__(self, diretorio: str, max_arquivos: int):
+        self.diretorio = diretorio
+        self.max_arquivos = max_arquivos
+        self._lock = threading.Lock()
+
+    def salvar(self, perfil: cProfile.Profile, metodo: str, rota: str, duracao: float) -> str:
+        os.makedirs(self.diretorio, exist_ok=True)
+        rota_arquivo = re.sub(r"[^\w.-]+", "-", rota).strip("-")
+        nome = f"{int(time.time() * 1000)}_{metodo}_{rota_arquivo}_{int(duracao * 1000)}ms.prof"
+        with self._lock:
+            perfil.dump_stats(os.path.join(self.diretorio, nome))
+            for antigo in self.listar()[self.max_arquivos:]:
+                try:
+                    os.remove(os.path.join(self.diretorio, antigo["nome"]))
+                except FileNotFoundError:
+                    pass
+        return nome
+
+    def listar(self) -> list[dict]:
+        """Perfis guardados, do mais recente para o mais antigo."""
+        if not os.path.isdir(self.diretorio):
+            return []
+        perfis = []
+        for nome in os.listdir(self.diretorio):
+            encontrado = _PADRAO_ARQUIVO.match(nome)
+            if encontrado is None:
+                continue
+            epoch_ms, metodo, rota, duracao_ms = encontrado.groups()
+            perfis.append({
+                "nome": nome,
+                "metodo": metodo,
+                "rota": rota,
+                "duracao_ms": int(duracao_ms),
+                "capturado_em": datetime.fromtimestamp(int(epoch_ms) / 1000, tz=timezone.utc),
+            })
+        perfis.sort(key=lambda p: p["nome"], reverse=True)
+        return perfis
+
+    def caminho(self, nome: str) -> Optional[str]:
+        # Só aceita nomes gerados por salvar(): evita path traversal
+        if _PADRAO_ARQUIVO.match(nome) is None:
+            return None
+        caminho = os.path.join(self.diretorio, nome)
+        return caminho if os.path.isfile(caminho) else None
+
+    def resumo(self, nome: str, linhas: int = 40) -> Optional[str]:
+        caminho = self.caminho(nome)
+        if caminho is None:
+            return None
+        saida = io.StringIO()
+        pstats.Stats(caminho, stream=saida).sort_stats("cumulative").print_stats(linhas)
+        return saida.getvalue()
+
+
+def _eh_stream(scope) -> bool:
+    # Conexões SSE ficam abertas indefinidamente: não faz sentido perfilar
+    for nome, valor in scope.get("headers", ()):
+        if nome == b"accept" and b"text/event-stream" in valor:
+            return True
+    return False
+
+
+class ProfilerMiddleware:
+    """
+    Perfila por amostragem (cProfile) uma fração das requisições e guarda
+    o perfil das que passarem do limite de latência.
+
+    Só um perfil roda por vez: enquanto uma requisição está sendo
+    perfilada, as demais seguem sem overhead. Como o event loop é
+    compartilhado, o perfil também inclui o que outras requisições
+    executaram no mesmo intervalo.
+    """
+
+    def __init__(self, app, store: ProfileStore, limite_ms: float, taxa_amostragem: float):
+        self.app = app
+        self.store = store
+        self.limite = limite_ms / 1000
+        self.taxa_amostragem = taxa_amostragem
+        self._ocupado = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or _eh_stream(scope)
+            or random.random() >= self.taxa_amostragem
+            or not self._ocupado.acquire(blocking=False)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        perfil = cProfile.Profile()
+        inicio = time.perf_counter()
+        try:
+            perfil.enable()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                perfil.disable()
+
+            duracao = time.perf_counter() - inicio
+            if duracao >= self.limite:
+                rota = getattr(scope.get("route"), "path", scope["path"])
+                await asyncio.to_thread(self.store.salvar, perfil, scope["method"], rota, duracao)
+        finally:
+            self._ocupado.release()
+
+
+profile_store = ProfileStore(settings.PROFILER_DIR, settings.PROFILER_MAX_ARQUIVOS)
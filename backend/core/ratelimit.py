@@ -0,0 +1,147 @@
+import importlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Protocol
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from schemas.models import RateLimitBucket
+
+
+def interpretar_regra(regra: str) -> tuple[float, float]:
+    """
+    "20/60" -> capacidade 20, reposição de 20 fichas a cada 60 s.
+    Retorna (capacidade, fichas por segundo).
+    """
+    capacidade, _, segundos = regra.partition("/")
+    return float(capacidade), float(capacidade) / float(segundos)
+
+
+class RateLimitBackend(Protocol):
+    """
+    Guarda os baldes (token bucket). `consumir` tira uma ficha do balde da
+    chave e retorna (permitido, segundos até haver ficha de novo).
+    """
+
+    async def consumir(self, chave: str, capacidade: float, taxa: float) -> tuple[bool, float]: ...
+
+
+class MemoriaBackend:
+    """Baldes em memória (um processo). Limitado por tamanho (LRU)."""
+
+    def __init__(self, max_chaves: int = 100_000, relogio: Callable[[], float] = time.monotonic):
+        self.max_chaves = max_chaves
+        self.relogio = relogio
+        self._baldes: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def consumir(self, chave: str, capacidade: float, taxa: float) -> tuple[bool, float]:
+        agora = self.relogio()
+        with self._lock:
+            fichas, ultimo = self._baldes.pop(chave, (capacidade, agora))
+            fichas = min(capacidade, fichas + (agora - ultimo) * taxa)
+            permitido = fichas >= 1
+            if permitido:
+                fichas -= 1
+            self._baldes[chave] = (fichas, agora)
+            if len(self._baldes) > self.max_chaves:
+                self._baldes.popitem(last=False)
+        return permitido, 0.0 if permitido else (1 - fichas) / taxa
+
+
+class BancoBackend:
+    """
+    Baldes numa tabela do banco, compartilhados entre workers/instâncias.
+    Cada consumo é um único UPSERT atômico (sem ler antes de escrever).
+    Substituto local de um backend como o Redis.
+    """
+
+    _INSERTS_COM_UPSERT = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+    def __init__(self, engine=None, relogio: Callable[[], float] = time.time):
+        if engine is None:
+            from database.connection import async_engine as engine
+        self.engine = engine
+        self.relogio = relogio
+
+    async def consumir(self, chave: str, capacidade: float, taxa: float) -> tuple[bool, float]:
+        agora = self.relogio()
+        dialeto = self.engine.dialect.name
+        menor = func.least if dialeto == "postgresql" else func.min
+
+        # Saldo gravado negativo marca um consumo negado: o saldo real é
+        # ele + 1 (a ficha não foi tirada). Repõe as fichas pelo tempo
+        # decorrido e tira uma; ficar negativo significa "negado".
+        saldo = case((RateLimitBucket.fichas < 0, RateLimitBucket.fichas + 1), else_=RateLimitBucket.fichas)
+        repostas = menor(capacidade, saldo + (agora - RateLimitBucket.atualizado_em) * taxa)
+        upsert = self._INSERTS_COM_UPSERT[dialeto](RateLimitBucket).values(
+            chave=chave, fichas=capacidade - 1, atualizado_em=agora
+        )
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[RateLimitBucket.chave],
+            set_={"fichas": repostas - 1, "atualizado_em": agora},
+        ).returning(RateLimitBucket.fichas)
+
+        async with AsyncSession(self.engine) as session:
+            fichas = (await session.exec(upsert)).scalar_one()
+            await session.commit()
+
+        if fichas >= 0:
+            return True, 0.0
+        return False, -fichas / taxa
+
+    async def limpar(self, ociosos_antes_de: float) -> None:
+        """Remove baldes sem uso recente (já estariam cheios de novo)."""
+        async with AsyncSession(self.engine) as session:
+            await session.exec(
+                delete(RateLimitBucket).where(RateLimitBucket.atualizado_em < ociosos_antes_de)
+            )
+            await session.commit()
+
+
+class RateLimiter:
+    def __init__(self, backend: RateLimitBackend):
+        self.backend = backend
+        self.negados = 0
+
+    async def verificar(self, *limites: tuple[str, str]) -> None:
+        """
+        Consome uma ficha de cada (chave, regra), em ordem; na primeira
+        negada responde 429 com Retry-After, sem consumir as seguintes.
+        """
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        for chave, regra in limites:
+            capacidade, taxa = interpretar_regra(regra)
+            permitido, espera = await self.backend.consumir(chave, capacidade, taxa)
+            if not permitido:
+                self.negados += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Muitas tentativas, aguarde antes de tentar novamente",
+                    headers={"Retry-After": str(max(1, math.ceil(espera)))},
+                )
+
+    def stats(self) -> dict:
+        return {"negados": self.negados}
+
+
+def _criar_backend(caminho: str) -> RateLimitBackend:
+    # Formato "modulo:Classe", ex.: "core.ratelimit:BancoBackend"
+    modulo, _, nome = caminho.partition(":")
+    return getattr(importlib.import_module(modulo), nome)()
+
+
+rate_limiter = RateLimiter(_criar_backend(settings.RATE_LIMIT_BACKEND))
+
+
+def ip_do_cliente(request) -> str:
+    # Atrás de proxy, rode o uvicorn com --proxy-headers para request.client
+    # refletir o X-Forwarded-For
+    return request.client.host if request.client else "desconhecido"
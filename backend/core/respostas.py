@@ -0,0 +1,58 @@
+from typing import Any, AsyncIterator, Optional
+
+import orjson
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Datas sem fuso (o SQLite não guarda fuso) são UTC, serializadas com "Z"
+# como o Pydantic faz nas rotas com response_model.
+OPCOES_ORJSON = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSONResponse com orjson: serializa datetime/UUID nativamente e gasta uma
+    fração do CPU do json da biblioteca padrão. Usada como resposta padrão
+    da aplicação.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=OPCOES_ORJSON)
+
+
+async def _lista_em_partes(partes: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    # Um array JSON emitido em pedaços, à medida que chegam do banco
+    yield b"["
+    primeira = True
+    async for itens in partes:
+        if not itens:
+            continue
+        parte = orjson.dumps(itens, option=OPCOES_ORJSON)
+        # Remove os colchetes de cada pedaço e separa os pedaços por vírgula
+        yield (b"" if primeira else b",") + parte[1:-1]
+        primeira = False
+    yield b"]"
+
+
+def resposta_lista_json(itens: list, headers: Optional[dict] = None) -> ORJSONResponse:
+    """
+    Resposta para listas de linhas vindas do banco (dicts já confiáveis),
+    sem validação por item.
+    """
+    return ORJSONResponse(itens, headers=headers)
+
+
+def resposta_lista_json_em_partes(
+    partes: AsyncIterator[list],
+    headers: Optional[dict] = None,
+) -> StreamingResponse:
+    """
+    Mesma lista em streaming, a partir dos blocos lidos do banco (ex.:
+    crud.stream_linhas_tarefas_usuario): o corpo nunca fica inteiro na memória.
+    """
+    return StreamingResponse(
+        _lista_em_partes(partes),
+        media_type="application/json",
+        headers=headers,
+    )
@@ -1,47 +1,65 @@
+import secrets
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
-from jose import jwt, JWTError
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
-from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from core import crud
 from core.config import settings
-from database.connection import get_session
-from schemas.models import Usuario
+from core.crud import obter_versao_token, principal_cache
+from core.hashing import password_hasher
+from core.metrics import registrar_etapa
+from database.connection import async_engine, get_async_session, liberar_conexao
+from schemas.models import Principal, Usuario
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-# 🔐 Hash de senha
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
 
 # 👤 Autenticação
-def authenticate_user(
-    session: Session,
+async def authenticate_user(
+    session: AsyncSession,
     username: str,
     password: str
 ) -> Optional[Usuario]:
-    statement = select(Usuario).where(Usuario.username == username)
-    user = session.exec(statement).first()
+    user = await crud.buscar_usuario_por_username(session, username)
+    await liberar_conexao(session)
 
     if not user:
+        # Verifica contra um hash fictício: usuário inexistente custa o mesmo
+        # bcrypt que senha errada e não vaza pelo tempo de resposta
+        await password_hasher.verify(password, await _hash_ficticio())
         return None
-    if not verify_password(password, user.password_hash):
+    # O bcrypt roda no pool de hashing, sem bloquear o servidor
+    if not await password_hasher.verify(password, user.password_hash):
         return None
 
     return user
 
 
+_HASH_FICTICIO: Optional[str] = None
+
+
+async def preparar_hash_ficticio() -> None:
+    """
+    Gera o hash fictício, com o mesmo custo (BCRYPT_ROUNDS) dos hashes
+    reais. Chamado no startup (lifespan): se ficasse para o primeiro login
+    de usuário inexistente, esse login pagaria dois bcrypt e o tempo de
+    resposta revelaria que o usuário não existe.
+    """
+    global _HASH_FICTICIO
+    if _HASH_FICTICIO is None:
+        _HASH_FICTICIO = await password_hasher.hash(secrets.token_urlsafe(16))
+
+
+async def _hash_ficticio() -> str:
+    # Sem o lifespan (scripts, testes) é gerado aqui, no primeiro uso
+    await preparar_hash_ficticio()
+    return _HASH_FICTICIO
+
+
 # 🔑 Criar token JWT
 def create_access_token(
     data: dict,
@@ -57,41 +75,157 @@ def create_access_token(
 
     to_encode.update({"exp": expire})
 
+    # python-jose (e os backends de criptografia) só carrega no primeiro
+    # token, fora do import do app
+    from jose import jwt
+
+    inicio = time.perf_counter()
     encoded_jwt = jwt.encode(
         to_encode,
         settings.SECRET_KEY,
         algorithm=settings.ALGORITHM
     )
+    registrar_etapa("jwt", "encode", time.perf_counter() - inicio)
     return encoded_jwt
 
 
-# 👮 Usuário logado
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session)
-) -> Usuario:
-    credentials_exception = HTTPException(
+def claims_do_usuario(user: Usuario, versao_token: int) -> dict:
+    # uid/tv permitem autorizar leituras sem consultar a tabela usuario
+    return {"sub": user.username, "uid": user.id, "tv": versao_token}
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Não foi possível validar as credenciais",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+# Claim "escopo" dos tokens de uso restrito: um token de stream não vale
+# nas outras rotas, e um access token não vale na URL do stream
+ESCOPO_STREAM = "stream"
+
+
+def create_stream_token(user: Principal, versao_token: int) -> str:
+    return create_access_token(
+        data={"sub": user.username, "uid": user.id, "tv": versao_token, "escopo": ESCOPO_STREAM},
+        expires_delta=timedelta(seconds=settings.STREAM_TOKEN_EXPIRE_SECONDS),
+    )
+
+
+def _decodificar_token(token: str, escopo: Optional[str] = None) -> dict:
+    """Valida assinatura e expiração; exige a claim sub e o escopo esperado."""
+    from jose import JWTError, jwt
+
+    inicio = time.perf_counter()
     try:
         payload = jwt.decode(
             token,
             settings.SECRET_KEY,
             algorithms=[settings.ALGORITHM]
         )
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    finally:
+        registrar_etapa("jwt", "decode", time.perf_counter() - inicio)
+
+    if payload.get("sub") is None or payload.get("escopo") != escopo:
+        raise _credentials_exception()
+    return payload
+
+
+async def _verificar_revogacao(session: AsyncSession, payload: dict) -> None:
+    # Tokens antigos (sem uid/tv) não passam por aqui: dependem do is_active
+    if "uid" in payload and "tv" in payload:
+        if payload["tv"] != await obter_versao_token(session, payload["uid"]):
+            raise _credentials_exception()
+
+
+# 👮 Usuário logado
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    session: AsyncSession = Depends(get_async_session)
+) -> Usuario:
+    payload = _decodificar_token(token)
+    username: str = payload["sub"]
+    await _verificar_revogacao(session, payload)
+
+    # O JWT já foi validado acima (assinatura e expiração)
+    chave = (username, payload.get("jti"), payload.get("exp"))
+    user = principal_cache.get(chave)
+    if user is not None:
+        return user
+
+    user = await crud.buscar_usuario_por_username(session, username)
+
+    if user is None or not user.is_active:
+        raise _credentials_exception()
+
+    # Desanexa da sessão para poder ser reutilizado entre requisições
+    session.expunge(user)
+    ttl = None
+    if payload.get("exp") is not None:
+        ttl = payload["exp"] - time.time()
+    principal_cache.set(chave, user, ttl=ttl)
 
-    statement = select(Usuario).where(Usuario.username == username)
-    user = session.exec(statement).first()
+    return user
 
-    if user is None:
-        raise credentials_exception
 
+# ⚡ Usuário logado, só pelas claims (rotas de leitura)
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    session: AsyncSession = Depends(get_async_session)
+) -> Principal:
+    """
+    Autoriza a partir do JWT: verificação do HMAC + versão do token em
+    cache, sem ler a linha do usuário. Desativar ou excluir o usuário
+    incrementa a versão e revoga os tokens.
+    """
+    return await _principal_do_token(token, session)
+
+
+async def _principal_do_token(
+    token: str, session: AsyncSession, escopo: Optional[str] = None
+) -> Principal:
+    payload = _decodificar_token(token, escopo)
+    if "uid" not in payload or "tv" not in payload:
+        # Token emitido antes das claims uid/tv: caminho completo
+        user = await get_current_user(token=token, session=session)
+        return Principal(id=user.id, username=user.username)
+
+    await _verificar_revogacao(session, payload)
+    return Principal(id=payload["uid"], username=payload["sub"])
+
+
+# 🛡️ Apenas administradores
+async def get_current_admin(user: Usuario = Depends(get_current_user)) -> Usuario:
+    if not user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso restrito a administradores",
+        )
     return user
+
+
+# 📡 Usuário logado em conexões longas (SSE)
+async def get_current_user_stream(
+    request: Request,
+    token: Optional[str] = Query(
+        None, description="Token de stream (POST /tarefas/stream/token): o EventSource não envia headers"
+    ),
+) -> Principal:
+    """
+    Pelo header Authorization, o access token normal. Na query string (que
+    fica em logs de acesso e proxies), só um token de stream: curto e sem
+    valor nas outras rotas.
+    """
+    escopo = ESCOPO_STREAM
+    if token is None:
+        token = await oauth2_scheme(request)
+        escopo = None
+
+    # Sessão própria e curta: o stream fica aberto por muito tempo e não
+    # deve segurar uma conexão do pool enquanto isso.
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        return await _principal_do_token(token, session, escopo)
@@ -0,0 +1,154 @@
+import asyncio
+import csv
+import io
+from datetime import datetime, timezone
+from itertools import islice
+from typing import AsyncIterator, BinaryIO, Iterator
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.crud import CAMPOS_TAREFA, incrementar_versao_tarefas
+from core.respostas import OPCOES_ORJSON
+from schemas.models import ErroImportacao, ResultadoImportacao, Tarefa, TarefaImportada
+
+# =====================================================
+# EXPORTAÇÃO (NDJSON / CSV)
+# =====================================================
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _linha_csv(valores) -> bytes:
+    saida = io.StringIO()
+    csv.writer(saida).writerow(valores)
+    return saida.getvalue().encode("utf-8")
+
+
+async def exportar_tarefas(
+    session: AsyncSession,
+    usuario_id: int,
+    formato: str = "ndjson",
+    yield_per: int = 1000,
+) -> AsyncIterator[bytes]:
+    """
+    Gera as tarefas do usuário em NDJSON ou CSV, lendo do banco por um
+    cursor no servidor (yield_per): a memória não cresce com o total.
+    """
+
+    query = (
+        select(*(getattr(Tarefa, campo) for campo in CAMPOS_TAREFA))
+        .where(Tarefa.usuario_id == usuario_id)
+        .order_by(Tarefa.id)
+        .execution_options(yield_per=yield_per)
+    )
+
+    if formato == "csv":
+        yield _linha_csv(CAMPOS_TAREFA)
+
+    resultado = await session.stream(query)
+    async for linhas in resultado.partitions():
+        if formato == "csv":
+            saida = io.StringIO()
+            escritor = csv.writer(saida)
+            for linha in linhas:
+                escritor.writerow(
+                    valor.isoformat() if isinstance(valor, datetime) else valor
+                    for valor in linha
+                )
+            yield saida.getvalue().encode("utf-8")
+        else:
+            yield b"".join(
+                orjson.dumps(dict(zip(CAMPOS_TAREFA, linha)), option=OPCOES_ORJSON) + b"\n"
+                for linha in linhas
+            )
+
+
+# =====================================================
+# IMPORTAÇÃO (NDJSON / CSV)
+# =====================================================
+
+def _ler_registros(arquivo: BinaryIO, formato: str) -> Iterator[tuple[int, object]]:
+    """Lê o arquivo registro a registro: (número da linha, dict ou erro)."""
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+    try:
+        if formato == "csv":
+            leitor = csv.DictReader(texto)
+            for registro in leitor:
+                yield leitor.line_num, registro
+        else:
+            for numero, linha in enumerate(texto, start=1):
+                if not linha.strip():
+                    continue
+                try:
+                    yield numero, orjson.loads(linha)
+                except orjson.JSONDecodeError as erro:
+                    yield numero, erro
+    finally:
+        # Não fecha o arquivo de quem chamou
+        texto.detach()
+
+
+def _validar(registro) -> TarefaImportada:
+    if isinstance(registro, Exception):
+        raise ValueError(f"JSON inválido: {registro}")
+    if not isinstance(registro, dict):
+        raise ValueError("Cada registro deve ser um objeto")
+    # Campos vazios no CSV valem o padrão do modelo; id/usuario_id são ignorados
+    dados = {chave: valor for chave, valor in registro.items() if valor not in ("", None)}
+    return TarefaImportada.model_validate(dados)
+
+
+async def importar_tarefas(
+    session: AsyncSession,
+    usuario_id: int,
+    arquivo: BinaryIO,
+    formato: str = "ndjson",
+    tamanho_lote: int = 500,
+    max_erros: int = 100,
+) -> ResultadoImportacao:
+    """
+    Importa tarefas de um arquivo NDJSON/CSV em lotes de `tamanho_lote`:
+    cada lote é um INSERT executemany na sua própria transação, com uma
+    única incrementação de versão. Registros inválidos são pulados e
+    relatados (até `max_erros`).
+    """
+
+    registros = _ler_registros(arquivo, formato)
+    resultado = ResultadoImportacao()
+
+    while True:
+        # A leitura/parse do lote roda fora do event loop
+        lote = await asyncio.to_thread(lambda: list(islice(registros, tamanho_lote)))
+        if not lote:
+            break
+
+        valores = []
+        for numero, registro in lote:
+            try:
+                valores.append(_validar(registro).model_dump())
+            except (ValueError, ValidationError) as erro:
+                resultado.com_erro += 1
+                if len(resultado.erros) < max_erros:
+                    resultado.erros.append(ErroImportacao(linha=numero, detalhe=str(erro)))
+
+        if not valores:
+            continue
+
+        versao = await incrementar_versao_tarefas(session, usuario_id)
+        agora = datetime.now(timezone.utc)
+        for valor in valores:
+            valor.update(usuario_id=usuario_id, versao=versao, atualizado_em=agora)
+        await session.exec(insert(Tarefa), params=valores)
+        await session.commit()
+
+        resultado.importadas += len(valores)
+        resultado.versao = versao
+
+    return resultado
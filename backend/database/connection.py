@@ -1,31 +1,214 @@
+import threading
+import time
+
+from fastapi import HTTPException, status
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
-import os
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from core.metrics import antes_de_executar, depois_de_executar
 
 # Importamos os modelos para que o SQLModel "saiba" que as tabelas existem
 # antes de tentar criá-las
-from schemas.models import Usuario, Tarefa 
+from schemas.models import Usuario, Tarefa
 
 # -------------------------
 # URL do banco
 # -------------------------
-DATABASE_URL = os.getenv(
-    "DATABASE_URL",
-    "sqlite:///database.db"  # padrão local
-)
+# O driver é escolhido a partir de DATABASE_URL: a mesma URL serve para o
+# engine síncrono (scripts/criação de tabelas) e para o assíncrono (rotas).
+DRIVERS_ASYNC = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+DRIVERS_SYNC = {
+    "sqlite+aiosqlite": "sqlite",
+    "postgres": "postgresql",
+    "postgresql+asyncpg": "postgresql",
+}
+
+
+def _com_driver(url: str, drivers: dict) -> str:
+    url_obj = make_url(url)
+    driver = drivers.get(url_obj.drivername)
+    if driver is None:
+        return url
+    return url_obj.set(drivername=driver).render_as_string(hide_password=False)
+
+
+DATABASE_URL = _com_driver(settings.DATABASE_URL, DRIVERS_SYNC)
+ASYNC_DATABASE_URL = _com_driver(settings.DATABASE_URL, DRIVERS_ASYNC)
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+
+def _pool_kwargs(url: str) -> dict:
+    # SQLite em memória usa um pool de conexão única; não aceita tamanho de pool
+    database = make_url(url).database
+    if IS_SQLITE and (not database or database == ":memory:"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
 
 # -------------------------
-# Engine
+# Engines
 # -------------------------
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False}
-    if DATABASE_URL.startswith("sqlite")
-    else {},
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    **_pool_kwargs(DATABASE_URL),
+)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **_pool_kwargs(ASYNC_DATABASE_URL),
 )
 
+
+# -------------------------
+# SQLite: PRAGMAs por conexão
+# -------------------------
+# WAL deixa leitores e escritores trabalharem em paralelo; busy_timeout
+# faz o escritor esperar o lock em vez de falhar com "database is locked".
+def _aplicar_pragmas_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.close()
+
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _aplicar_pragmas_sqlite)
+    event.listen(async_engine.sync_engine, "connect", _aplicar_pragmas_sqlite)
+
+
+# -------------------------
+# Métricas do pool
+# -------------------------
+class PoolMetrics:
+    """Contadores de uso do pool do engine assíncrono, para dimensioná-lo."""
+
+    def __init__(self, engine):
+        self._pool = engine.pool
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, *args):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, *args):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def _on_checkin(self, *args):
+        with self._lock:
+            self.checkins += 1
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def _on_invalidate(self, *args):
+        with self._lock:
+            self.invalidations += 1
+
+    def record_wait(self, segundos: float, timeout: bool = False) -> None:
+        with self._lock:
+            self.wait_seconds_total += segundos
+            self.wait_seconds_max = max(self.wait_seconds_max, segundos)
+            if timeout:
+                self.timeouts += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            dados = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "checked_out": self.checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+        for nome in ("size", "overflow"):
+            metodo = getattr(self._pool, nome, None)
+            if metodo is not None:
+                dados[f"pool_{nome}"] = metodo()
+        return dados
+
+
+pool_metrics = PoolMetrics(async_engine.sync_engine)
+
+# Conta e cronometra os statements de cada requisição (Server-Timing e /metrics)
+event.listen(async_engine.sync_engine, "before_cursor_execute", antes_de_executar)
+event.listen(async_engine.sync_engine, "after_cursor_execute", depois_de_executar)
+
 # -------------------------
 # Sessão (Dependency Injection)
 # -------------------------
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+async def get_async_session():
+    # expire_on_commit=False: os objetos continuam legíveis após o commit
+    # sem disparar um novo SELECT implícito (proibido em contexto async)
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        # Pega a conexão já aqui para medir a espera no pool; se o pool
+        # esgotar, responde 503 em vez de deixar a requisição falhar com 500.
+        inicio = time.perf_counter()
+        try:
+            await session.connection()
+        except PoolTimeoutError:
+            pool_metrics.record_wait(time.perf_counter() - inicio, timeout=True)
+            raise banco_ocupado()
+        pool_metrics.record_wait(time.perf_counter() - inicio)
+        yield session
+
+
+def banco_ocupado() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Banco de dados ocupado, tente novamente em instantes",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def liberar_conexao(session: AsyncSession) -> None:
+    """
+    Encerra a transação (só de leitura) e devolve a conexão ao pool antes
+    de uma espera longa, como o bcrypt: a fila de hashing é maior que o
+    pool e não pode segurar conexões. Os objetos seguem legíveis
+    (expire_on_commit=False); a próxima consulta pega outra conexão.
+    """
+    await session.commit()
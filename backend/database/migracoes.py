@@ -0,0 +1,338 @@
+"""
+Migrações versionadas do esquema, aplicadas como um passo separado do
+boot (python -m scripts.migrar, ou o servidor.py antes de subir os
+workers). O app só confere, no startup, se o banco está na versão
+esperada: nada de create_all nem reflexão do esquema a cada worker.
+
+Cada migração descreve o esquema da sua época (tabelas "congeladas", não
+os modelos atuais) e é idempotente: cria só o que falta. Assim um banco
+criado pelo antigo create_all é adotado sem perder dados.
+"""
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    false,
+    func,
+    insert,
+    inspect,
+    literal,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn
+
+
+class Migracao(NamedTuple):
+    versao: int
+    descricao: str
+    aplicar: Callable[[Connection], None]
+
+
+MIGRACOES: list[Migracao] = []
+
+
+def migracao(versao: int, descricao: str):
+    def registrar(aplicar):
+        MIGRACOES.append(Migracao(versao, descricao, aplicar))
+        return aplicar
+    return registrar
+
+
+# As datas são sempre "com fuso" (timestamptz no PostgreSQL), como os
+# campos datetime dos modelos: o SQLModel grava datetimes com tzinfo, que o
+# asyncpg recusa em colunas "timestamp without time zone"
+
+# Tabela de controle: uma linha por migração aplicada
+_controle = MetaData()
+schema_versao = Table(
+    "schema_versao", _controle,
+    Column("versao", Integer, primary_key=True),
+    Column("descricao", String, nullable=False),
+    Column("aplicada_em", DateTime(timezone=True), nullable=False),
+)
+
+
+# =====================================================
+# OPERAÇÕES IDEMPOTENTES
+# =====================================================
+
+def _criar_tabela(conn: Connection, tabela: Table) -> None:
+    # Cria também os índices declarados na tabela
+    tabela.create(conn, checkfirst=True)
+
+
+def _criar_indice(conn: Connection, indice: Index) -> None:
+    indice.create(conn, checkfirst=True)
+
+
+def _adicionar_coluna(conn: Connection, coluna: Column) -> bool:
+    """ALTER TABLE ... ADD COLUMN, se a coluna ainda não existe."""
+    tabela = coluna.table.name
+    if coluna.name in {c["name"] for c in inspect(conn).get_columns(tabela)}:
+        return False
+    definicao = CreateColumn(coluna).compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN {definicao}"))
+    return True
+
+
+# =====================================================
+# MIGRAÇÕES
+# =====================================================
+
+@migracao(1, "esquema inicial: usuario e tarefa")
+def _esquema_inicial(conn: Connection) -> None:
+    m = MetaData()
+    _criar_tabela(conn, Table(
+        "usuario", m,
+        Column("id", Integer, primary_key=True),
+        Column("username", String, nullable=False),
+        Column("email", String, nullable=False, unique=True),
+        Column("password_hash", String, nullable=False),
+        Column("is_active", Boolean, nullable=False),
+        Index("ix_usuario_username", "username", unique=True),
+    ))
+    _criar_tabela(conn, Table(
+        "tarefa", m,
+        Column("id", Integer, primary_key=True),
+        Column("titulo", String, nullable=False),
+        Column("prioridade", String, nullable=False),
+        Column("concluido", Boolean, nullable=False),
+        Column("usuario_id", Integer, ForeignKey("usuario.id"), nullable=False),
+    ))
+
+
+@migracao(2, "índices da listagem por cursor")
+def _indices_keyset(conn: Connection) -> None:
+    tarefa = Table(
+        "tarefa", MetaData(),
+        Column("id", Integer), Column("usuario_id", Integer),
+        Column("concluido", Boolean), Column("prioridade", String),
+    )
+    _criar_indice(conn, Index("ix_tarefa_usuario_id_id", tarefa.c.usuario_id, tarefa.c.id))
+    _criar_indice(conn, Index(
+        "ix_tarefa_usuario_concluido_prioridade_id",
+        tarefa.c.usuario_id, tarefa.c.concluido, tarefa.c.prioridade, tarefa.c.id,
+    ))
+
+
+@migracao(3, "versão por usuário para o GET condicional")
+def _versao_tarefas(conn: Connection) -> None:
+    m = MetaData()
+    Table("usuario", m, Column("id", Integer, primary_key=True))
+    tarefa = Table(
+        "tarefa", m,
+        Column("usuario_id", Integer),
+        Column("versao", Integer, nullable=False, server_default="0"),
+        # SQLite não aceita default não constante no ADD COLUMN: as linhas
+        # existentes recebem o horário da migração
+        Column("atualizado_em", DateTime(timezone=True)),
+    )
+    agora = datetime.now(timezone.utc)
+    _adicionar_coluna(conn, tarefa.c.versao)
+    if _adicionar_coluna(conn, tarefa.c.atualizado_em):
+        conn.execute(update(tarefa).values(atualizado_em=agora))
+
+    versao_tarefas = Table(
+        "versao_tarefas", m,
+        Column("usuario_id", Integer, ForeignKey("usuario.id"), primary_key=True, autoincrement=False),
+        Column("versao", Integer, nullable=False),
+        Column("atualizado_em", DateTime(timezone=True), nullable=False),
+    )
+    _criar_tabela(conn, versao_tarefas)
+
+    # Tarefas que já existiam entram na versão 1 do dono, para que o
+    # GET condicional e a sincronização as enxerguem como mudança
+    conn.execute(update(tarefa).where(tarefa.c.versao == 0).values(versao=1))
+    sem_versao = (
+        select(tarefa.c.usuario_id, func.max(tarefa.c.versao), literal(agora, DateTime(timezone=True)))
+        .where(tarefa.c.usuario_id.not_in(select(versao_tarefas.c.usuario_id)))
+        .group_by(tarefa.c.usuario_id)
+    )
+    conn.execute(insert(versao_tarefas).from_select(
+        ["usuario_id", "versao", "atualizado_em"], sem_versao
+    ))
+
+
+@migracao(4, "tombstones da sincronização incremental")
+def _tombstones(conn: Connection) -> None:
+    m = MetaData()
+    Table("usuario", m, Column("id", Integer, primary_key=True))
+    _criar_tabela(conn, Table(
+        "tarefa_removida", m,
+        Column("id", Integer, primary_key=True),
+        Column("tarefa_id", Integer, nullable=False),
+        Column("usuario_id", Integer, ForeignKey("usuario.id"), nullable=False),
+        Column("versao", Integer, nullable=False),
+        Column("removido_em", DateTime(timezone=True), nullable=False),
+        Index("ix_tarefa_removida_usuario_versao", "usuario_id", "versao"),
+        Index("ix_tarefa_removida_removido_em", "removido_em"),
+    ))
+    versao_tarefas = Table(
+        "versao_tarefas", m,
+        Column("versao_compactada", Integer, nullable=False, server_default="0"),
+    )
+    _adicionar_coluna(conn, versao_tarefas.c.versao_compactada)
+
+    tarefa = Table("tarefa", m, Column("usuario_id", Integer), Column("versao", Integer))
+    _criar_indice(conn, Index("ix_tarefa_usuario_versao", tarefa.c.usuario_id, tarefa.c.versao))
+
+
+@migracao(5, "usuario.is_admin")
+def _is_admin(conn: Connection) -> None:
+    usuario = Table(
+        "usuario", MetaData(),
+        Column("is_admin", Boolean, nullable=False, server_default=false()),
+    )
+    _adicionar_coluna(conn, usuario.c.is_admin)
+
+
+@migracao(6, "índice de busca textual nos títulos")
+def _busca_textual(conn: Connection) -> None:
+    from core.busca import criar_indice_busca
+
+    criar_indice_busca(conn)
+
+
+@migracao(7, "versão dos tokens e refresh tokens")
+def _tokens(conn: Connection) -> None:
+    m = MetaData()
+    _criar_tabela(conn, Table(
+        "versao_token", m,
+        Column("usuario_id", Integer, primary_key=True, autoincrement=False),
+        Column("versao", Integer, nullable=False),
+        Column("atualizado_em", DateTime(timezone=True), nullable=False),
+    ))
+    _criar_tabela(conn, Table(
+        "refresh_token", m,
+        Column("id", Integer, primary_key=True),
+        Column("token_hash", String, nullable=False),
+        Column("familia", String, nullable=False),
+        Column("usuario_id", Integer, nullable=False),
+        Column("criado_em", DateTime(timezone=True), nullable=False),
+        Column("expira_em", DateTime(timezone=True), nullable=False),
+        Column("usado_em", DateTime(timezone=True)),
+        Column("revogado", Boolean, nullable=False),
+        Index("ix_refresh_token_token_hash", "token_hash", unique=True),
+        Index("ix_refresh_token_familia", "familia"),
+        Index("ix_refresh_token_usuario_id", "usuario_id"),
+    ))
+
+
+@migracao(8, "baldes do rate limit compartilhado")
+def _rate_limit(conn: Connection) -> None:
+    _criar_tabela(conn, Table(
+        "rate_limit_bucket", MetaData(),
+        Column("chave", String, primary_key=True),
+        Column("fichas", Float, nullable=False),
+        Column("atualizado_em", Float, nullable=False),
+        Index("ix_rate_limit_bucket_atualizado_em", "atualizado_em"),
+    ))
+
+
+@migracao(9, "tarefa.usuario_id com ON DELETE CASCADE")
+def _cascade_tarefas(conn: Connection) -> None:
+    # O SQLite não altera FKs (e não as aplica sem PRAGMA foreign_keys):
+    # lá a exclusão do usuário apaga as tarefas pelo crud.deletar_usuario
+    if conn.dialect.name != "postgresql":
+        return
+    for fk in inspect(conn).get_foreign_keys("tarefa"):
+        if fk["referred_table"] == "usuario" and fk["options"].get("ondelete") != "CASCADE":
+            conn.execute(text(f'ALTER TABLE tarefa DROP CONSTRAINT "{fk["name"]}"'))
+    if not any(
+        fk["referred_table"] == "usuario" for fk in inspect(conn).get_foreign_keys("tarefa")
+    ):
+        conn.execute(text(
+            "ALTER TABLE tarefa ADD CONSTRAINT tarefa_usuario_id_fkey "
+            "FOREIGN KEY (usuario_id) REFERENCES usuario (id) ON DELETE CASCADE"
+        ))
+
+
+# Colunas criadas sem fuso pelas migrações anteriores a esta correção
+_COLUNAS_DE_DATA = {
+    "schema_versao": ["aplicada_em"],
+    "tarefa": ["atualizado_em"],
+    "versao_tarefas": ["atualizado_em"],
+    "tarefa_removida": ["removido_em"],
+    "versao_token": ["atualizado_em"],
+    "refresh_token": ["criado_em", "expira_em", "usado_em"],
+}
+
+
+@migracao(10, "colunas de data com fuso")
+def _datas_com_fuso(conn: Connection) -> None:
+    # O SQLite guarda datas como texto, sem tipo com ou sem fuso
+    if conn.dialect.name != "postgresql":
+        return
+    inspetor = inspect(conn)
+    for tabela, colunas in _COLUNAS_DE_DATA.items():
+        sem_fuso = {
+            c["name"] for c in inspetor.get_columns(tabela)
+            if isinstance(c["type"], DateTime) and not c["type"].timezone
+        }
+        for coluna in colunas:
+            if coluna in sem_fuso:
+                # Os valores antigos já estão em UTC
+                conn.execute(text(
+                    f"ALTER TABLE {tabela} ALTER COLUMN {coluna} "
+                    f"TYPE TIMESTAMP WITH TIME ZONE USING {coluna} AT TIME ZONE 'UTC'"
+                ))
+
+
+@migracao(11, "eventos do broker compartilhado")
+def _eventos(conn: Connection) -> None:
+    _criar_tabela(conn, Table(
+        "evento_tarefa", MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("usuario_id", Integer, nullable=False),
+        Column("dados", String, nullable=False),
+        Column("criado_em", Float, nullable=False),
+        Index("ix_evento_tarefa_criado_em", "criado_em"),
+    ))
+
+
+VERSAO_MAIS_RECENTE = MIGRACOES[-1].versao
+
+
+# =====================================================
+# EXECUÇÃO
+# =====================================================
+
+def versao_atual(conn: Connection) -> int:
+    """Última migração aplicada (0 num banco vazio). Uma consulta barata."""
+    if not inspect(conn).has_table("schema_versao"):
+        return 0
+    return conn.execute(select(func.max(schema_versao.c.versao))).scalar() or 0
+
+
+def migrar(engine: Engine, ate: int | None = None) -> list[Migracao]:
+    """Aplica as migrações pendentes em ordem, cada uma na sua transação."""
+    with engine.begin() as conn:
+        schema_versao.create(conn, checkfirst=True)
+        atual = versao_atual(conn)
+
+    aplicadas = []
+    for m in MIGRACOES:
+        if m.versao <= atual or (ate is not None and m.versao > ate):
+            continue
+        with engine.begin() as conn:
+            m.aplicar(conn)
+            conn.execute(insert(schema_versao).values(
+                versao=m.versao,
+                descricao=m.descricao,
+                aplicada_em=datetime.now(timezone.utc),
+            ))
+        aplicadas.append(m)
+    return aplicadas
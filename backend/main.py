@@ -1,47 +1,123 @@
-import sys
-import os
-
-# 1. Configuração de Caminho (Sempre no topo!)
-BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
-if BACKEND_DIR not in sys.path:
-    sys.path.append(BACKEND_DIR)
-
-# 2. Imports de Bibliotecas Externas
-from fastapi import FastAPI, Depends, HTTPException, status
+# Imports de Bibliotecas Externas
+from fastapi import FastAPI, Body, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import SQLModel, select, Session
-from datetime import timedelta
-from typing import List
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlmodel.ext.asyncio.session import AsyncSession
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Literal, Optional
 from contextlib import asynccontextmanager
 
-# 3. Imports Internos do Projeto (Agora o Python acha eles!)
-from database.connection import get_session, engine
-from schemas.models import Usuario, Tarefa, UsuarioCreate, TarefaCreate, Token
+# Imports Internos do Projeto
+from database import migracoes
+from database.connection import banco_ocupado, get_async_session, async_engine, liberar_conexao, pool_metrics
+from schemas.models import (
+    Principal,
+    RefreshTokenRequest,
+    Usuario,
+    Tarefa,
+    UsuarioCreate,
+    TarefaCreate,
+    TarefaIds,
+    ResultadoLote,
+    MudancasTarefas,
+    EstatisticasTarefas,
+    ResultadoImportacao,
+    Token,
+)
+from core import busca, crud, transferencia
+from core.etag import formatar_last_modified, gerar_etag, nao_modificado
+from core.respostas import ORJSONResponse, resposta_lista_json, resposta_lista_json_em_partes
 from core.security import (
     get_current_user,
+    get_current_principal,
+    get_current_user_stream,
     authenticate_user,
+    claims_do_usuario,
     create_access_token,
-    get_password_hash,
+    create_stream_token,
+    get_current_admin,
+    preparar_hash_ficticio,
 )
 from core.config import settings
+from core.hashing import password_hasher
+from core.events import event_hub
+from core.ratelimit import ip_do_cliente, rate_limiter
+from core.compressao import CompressaoMiddleware
+from core.metrics import MetricsMiddleware, registry
+from core.profiler import ProfilerMiddleware, profile_store
+
+logger = logging.getLogger(__name__)
 
 # =========================
 # CICLO DE VIDA (Lifespan)
 # =========================
+async def compactar_tombstones_periodicamente(intervalo_min: int):
+    while True:
+        await asyncio.sleep(intervalo_min * 60)
+        agora = datetime.now(timezone.utc)
+        limite = agora - timedelta(days=settings.TOMBSTONE_RETENCAO_DIAS)
+        try:
+            async with AsyncSession(async_engine) as session:
+                await crud.compactar_tombstones(session, limite)
+                # Mesma faxina periódica: refresh tokens vencidos e baldes
+                # ociosos do rate limit (quando guardados no banco)
+                await crud.limpar_refresh_tokens(session, agora)
+            if hasattr(rate_limiter.backend, "limpar"):
+                await rate_limiter.backend.limpar(agora.timestamp() - 3600)
+        except Exception:
+            logger.exception("Falha ao compactar tombstones")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Isso cria as tabelas no arquivo .db automaticamente
-    SQLModel.metadata.create_all(engine)
+    # O esquema é criado/atualizado pelas migrações (python -m scripts.migrar),
+    # fora do boot; aqui só uma consulta confere se o banco está em dia
+    async with async_engine.connect() as conn:
+        versao = await conn.run_sync(migracoes.versao_atual)
+    if versao < migracoes.VERSAO_MAIS_RECENTE:
+        raise RuntimeError(
+            f"Banco na versão {versao}, o app espera a {migracoes.VERSAO_MAIS_RECENTE}: "
+            "rode `python -m scripts.migrar` antes de subir o servidor"
+        )
+
+    # Antes da primeira requisição: o login de usuário inexistente custa um
+    # bcrypt desde o início (também sobe o pool de hashing)
+    await preparar_hash_ficticio()
+
+    compactacao = None
+    if settings.TOMBSTONE_COMPACTACAO_INTERVALO_MIN > 0:
+        compactacao = asyncio.create_task(
+            compactar_tombstones_periodicamente(settings.TOMBSTONE_COMPACTACAO_INTERVALO_MIN)
+        )
+    await event_hub.start()
     yield
+    await event_hub.stop()
+    if compactacao is not None:
+        compactacao.cancel()
+    password_hasher.shutdown()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="Gerenciador de Tarefas API",
     description="API robusta para gerenciamento de tarefas pessoais",
     version="2.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+# Conexão pedida de novo no meio da rota (após liberar_conexao) com o pool
+# esgotado: 503, como no checkout do get_async_session
+@app.exception_handler(PoolTimeoutError)
+async def pool_esgotado(request: Request, exc: PoolTimeoutError):
+    # Só estoura depois de esperar o pool_timeout inteiro
+    pool_metrics.record_wait(settings.DB_POOL_TIMEOUT, timeout=True)
+    erro = banco_ocupado()
+    return ORJSONResponse({"detail": erro.detail}, status_code=erro.status_code, headers=erro.headers)
+
 # =========================
 # MIDDLEWARE (CORS)
 # =========================
@@ -53,16 +129,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# =========================
+# COMPRESSÃO (gzip/brotli acima de um tamanho mínimo)
+# =========================
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressaoMiddleware,
+        minimo=settings.COMPRESSION_MIN_SIZE,
+        nivel_gzip=settings.COMPRESSION_GZIP_LEVEL,
+        qualidade_brotli=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+
+# =========================
+# MÉTRICAS (latência por rota, queries, Server-Timing)
+# =========================
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+    registry.coletor("principal_cache", "Cache de usuários autenticados", crud.principal_cache.stats)
+    registry.coletor("db_pool", "Pool de conexões do banco", pool_metrics.stats)
+    registry.coletor("events", "Assinaturas de eventos em tempo real", event_hub.stats)
+    registry.coletor("rate_limit", "Requisições recusadas pelo rate limit", rate_limiter.stats)
+    registry.coletor(
+        "password_hash", "Pool de hashing de senhas",
+        lambda: {"pending": password_hasher.pending, "max_pending": password_hasher.max_pending},
+    )
+
+    # Só administradores, como /admin/profiles: expõe o tráfego por rota e o
+    # estado do pool (o scraper se autentica com o token de um admin)
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def metrics(admin: Usuario = Depends(get_current_admin)):
+        return PlainTextResponse(
+            registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+# =========================
+# PROFILER (requisições lentas, por amostragem)
+# =========================
+if settings.PROFILER_ENABLED:
+    app.add_middleware(
+        ProfilerMiddleware,
+        store=profile_store,
+        limite_ms=settings.PROFILER_THRESHOLD_MS,
+        taxa_amostragem=settings.PROFILER_SAMPLE_RATE,
+    )
+
 # =========================
 # ROTAS (Endpoints)
 # =========================
 
-@app.post("/token", response_model=Token, tags=["Auth"])
-def login_for_access_token(
+async def limitar_login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    # Barra rajadas (por IP e por usuário) antes de qualquer bcrypt
+    await rate_limiter.verificar(
+        (f"login:ip:{ip_do_cliente(request)}", settings.RATE_LIMIT_LOGIN_IP),
+        (f"login:usuario:{form_data.username.lower()}", settings.RATE_LIMIT_LOGIN_USUARIO),
+    )
+
+async def limitar_cadastro(request: Request):
+    await rate_limiter.verificar(
+        (f"cadastro:ip:{ip_do_cliente(request)}", settings.RATE_LIMIT_CADASTRO_IP),
+    )
+
+@app.post("/token", response_model=Token, tags=["Auth"], dependencies=[Depends(limitar_login)])
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    user = authenticate_user(session, form_data.username, form_data.password)
+    user = await authenticate_user(session, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -70,93 +203,374 @@ def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Só o login paga o bcrypt; as renovações usam o refresh token
+    refresh_token = await crud.emitir_refresh_token(session, user.id)
+    return await _emitir_tokens(session, user, refresh_token)
+
+@app.post("/token/refresh", response_model=Token, tags=["Auth"])
+async def renovar_token(
+    dados: RefreshTokenRequest,
+    session: AsyncSession = Depends(get_async_session),
+):
+    user, refresh_token = await crud.girar_refresh_token(session, dados.refresh_token)
+    return await _emitir_tokens(session, user, refresh_token)
+
+async def _emitir_tokens(session: AsyncSession, user: Usuario, refresh_token: str) -> dict:
     expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     token = create_access_token(
-        data={"sub": user.username},
+        data=claims_do_usuario(user, await crud.obter_versao_token(session, user.id)),
         expires_delta=expires,
     )
-    return {"access_token": token, "token_type": "bearer"}
+    return {
+        "access_token": token,
+        "token_type": "bearer",
+        "expires_in": int(expires.total_seconds()),
+        "refresh_token": refresh_token,
+    }
 
-@app.post("/usuarios", status_code=status.HTTP_201_CREATED, tags=["Usuários"])
-def criar_usuario(
+@app.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT, tags=["Auth"])
+async def revogar_tokens(
+    session: AsyncSession = Depends(get_async_session),
+    user: Principal = Depends(get_current_principal),
+):
+    # Invalida todos os tokens do usuário, inclusive o usado nesta chamada
+    await crud.revogar_tokens_usuario(session, user)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@app.post(
+    "/usuarios",
+    status_code=status.HTTP_201_CREATED,
+    tags=["Usuários"],
+    dependencies=[Depends(limitar_cadastro)],
+)
+async def criar_usuario(
     usuario: UsuarioCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    existe = session.exec(
-        select(Usuario).where(Usuario.username == usuario.username)
-    ).first()
-    if existe:
+    # A verificação prévia evita gastar bcrypt com usernames já usados
+    if await crud.buscar_id_por_username(session, usuario.username) is not None:
         raise HTTPException(status_code=400, detail="Usuário já cadastrado")
+    await liberar_conexao(session)
 
-    novo = Usuario(
-        username=usuario.username,
-        email=usuario.email,
-        password_hash=get_password_hash(usuario.password),
+    await crud.criar_usuario(
+        session,
+        usuario,
+        await password_hasher.hash(usuario.password),
     )
-    session.add(novo)
-    session.commit()
-    session.refresh(novo)
     return {"message": "Usuário criado com sucesso"}
 
+async def _versao_condicional(
+    request: Request, session: AsyncSession, usuario_id: int, variante: str
+) -> tuple[int, dict, Optional[Response]]:
+    """
+    GET condicional das leituras de tarefas: a versão do usuário muda a
+    cada escrita em Tarefa, então dá para responder 304 sem tocar na tabela
+    tarefa. Retorna (versao, cabeçalhos, resposta 304 ou None).
+    """
+    versao, atualizado_em = await crud.obter_versao_tarefas(session, usuario_id)
+    etag = gerar_etag(usuario_id, versao, variante)
+    cabecalhos = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if atualizado_em is not None:
+        cabecalhos["Last-Modified"] = formatar_last_modified(atualizado_em)
+
+    if nao_modificado(request, etag, atualizado_em):
+        return versao, cabecalhos, Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=cabecalhos
+        )
+    return versao, cabecalhos, None
+
 @app.get("/tarefas", response_model=List[Tarefa], tags=["Tarefas"])
-def listar_tarefas(
-    session: Session = Depends(get_session),
-    user: Usuario = Depends(get_current_user),
+async def listar_tarefas(
+    request: Request,
+    limit: int = Query(settings.TAREFAS_PAGE_SIZE, ge=1, le=settings.TAREFAS_PAGE_MAX),
+    after: Optional[int] = Query(None, description="Cursor: id da última tarefa recebida"),
+    concluido: Optional[bool] = None,
+    prioridade: Optional[str] = None,
+    ordem: Literal["asc", "desc"] = "asc",
+    session: AsyncSession = Depends(get_async_session),
+    user: Principal = Depends(get_current_principal),
+):
+    _, cabecalhos, nao_modificada = await _versao_condicional(
+        request, session, user.id, request.url.query
+    )
+    if nao_modificada is not None:
+        return nao_modificada
+
+    filtros = (after, concluido, prioridade, ordem)
+    if limit > settings.TAREFAS_STREAM_MIN:
+        # Página grande: o cursor sai antes (vai no cabeçalho) e as linhas
+        # seguem do banco para o corpo em blocos
+        proximo_cursor = await crud.cursor_da_pagina(session, user.id, limit, *filtros)
+        if proximo_cursor is not None:
+            cabecalhos["X-Next-Cursor"] = str(proximo_cursor)
+        return resposta_lista_json_em_partes(
+            crud.stream_linhas_tarefas_usuario(
+                session, user.id, limit, *filtros,
+                yield_per=settings.TAREFAS_STREAM_YIELD_PER,
+            ),
+            headers=cabecalhos,
+        )
+
+    # Paginação por cursor (keyset): o custo não cresce com o número de
+    # tarefas do usuário, ao contrário de OFFSET.
+    tarefas, proximo_cursor = await crud.listar_linhas_tarefas_usuario(
+        session, user.id, limit, *filtros
+    )
+    if proximo_cursor is not None:
+        cabecalhos["X-Next-Cursor"] = str(proximo_cursor)
+
+    # Linhas do próprio banco: dispensa a validação do response_model
+    # (que fica só para a documentação) e vai direto para o orjson.
+    return resposta_lista_json(tarefas, headers=cabecalhos)
+
+@app.get("/tarefas/changes", response_model=MudancasTarefas, tags=["Tarefas"])
+async def listar_mudancas_tarefas(
+    since: int = Query(0, ge=0, description="Última versão já sincronizada pelo cliente"),
+    limit: int = Query(settings.TAREFAS_SYNC_MAX, ge=1, le=settings.TAREFAS_SYNC_MAX),
+    session: AsyncSession = Depends(get_async_session),
+    user: Principal = Depends(get_current_principal),
+):
+    # Devolve só o que mudou desde `since`; o campo `versao` da resposta
+    # é o próximo `since`. Com reset=true o cliente refaz o GET /tarefas.
+    return await crud.listar_mudancas_tarefas(session, user.id, since, limit)
+
+@app.get("/tarefas/stats", response_model=EstatisticasTarefas, tags=["Tarefas"])
+async def estatisticas_tarefas(
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
+    user: Principal = Depends(get_current_principal),
+):
+    # Painel do frontend: com a versão inalterada responde 304 sem contar nada
+    versao, cabecalhos, nao_modificada = await _versao_condicional(
+        request, session, user.id, "stats"
+    )
+    if nao_modificada is not None:
+        return nao_modificada
+
+    estatisticas = await crud.estatisticas_tarefas(session, user.id, versao)
+    return ORJSONResponse(estatisticas.model_dump(), headers=cabecalhos)
+
+@app.get("/tarefas/search", response_model=List[Tarefa], tags=["Tarefas"])
+async def buscar_tarefas(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="Palavras do título (prefixo, sem acentos)"),
+    limit: int = Query(20, ge=1, le=settings.TAREFAS_PAGE_MAX),
+    offset: int = Query(0, ge=0, le=settings.BUSCA_OFFSET_MAX),
+    session: AsyncSession = Depends(get_async_session),
+    user: Principal = Depends(get_current_principal),
+):
+    # Mesmo GET condicional da listagem: sem escrita, o resultado não muda
+    _, cabecalhos, nao_modificada = await _versao_condicional(
+        request, session, user.id, request.url.query
+    )
+    if nao_modificada is not None:
+        return nao_modificada
+
+    # Resultados por relevância; a próxima página vem em X-Next-Offset
+    tarefas, proximo_offset = await busca.buscar_tarefas(session, user.id, q, limit, offset)
+    if proximo_offset is not None:
+        cabecalhos["X-Next-Offset"] = str(proximo_offset)
+    return resposta_lista_json(tarefas, headers=cabecalhos)
+
+@app.post("/tarefas/stream/token", response_model=Token, tags=["Tarefas"])
+async def emitir_token_stream(
+    session: AsyncSession = Depends(get_async_session),
+    user: Principal = Depends(get_current_principal),
 ):
-    return session.exec(
-        select(Tarefa).where(Tarefa.usuario_id == user.id)
-    ).all()
+    # Para a URL do EventSource: pedir um novo a cada (re)conexão
+    token = create_stream_token(user, await crud.obter_versao_token(session, user.id))
+    return {
+        "access_token": token,
+        "token_type": "bearer",
+        "expires_in": settings.STREAM_TOKEN_EXPIRE_SECONDS,
+    }
+
+@app.get("/tarefas/stream", tags=["Tarefas"])
+async def stream_tarefas(
+    request: Request,
+    user: Principal = Depends(get_current_user_stream),
+):
+    # Server-Sent Events: o `id` de cada evento é a versão do usuário, que
+    # serve de `since` para /tarefas/changes após uma reconexão.
+    inscricao = event_hub.subscribe(user.id)
+
+    async def eventos():
+        try:
+            yield "retry: 3000\n\n"
+            while not inscricao.evicted:
+                try:
+                    evento = await asyncio.wait_for(
+                        inscricao.queue.get(), timeout=settings.EVENTS_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                dados = json.dumps(evento, ensure_ascii=False)
+                yield f"id: {evento['versao']}\nevent: {evento['tipo']}\ndata: {dados}\n\n"
+        finally:
+            event_hub.unsubscribe(inscricao)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/tarefas", response_model=Tarefa, tags=["Tarefas"])
-def criar_tarefa(
+async def criar_tarefa(
     tarefa: TarefaCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: Usuario = Depends(get_current_user),
 ):
-    nova = Tarefa(
-        **tarefa.model_dump(),
-        usuario_id=user.id,
-    )
-    session.add(nova)
-    session.commit()
-    session.refresh(nova)
+    nova = await crud.criar_tarefa(session, tarefa, user.id)
+    await event_hub.publish(user.id, {
+        "tipo": "tarefa_criada",
+        "versao": nova.versao,
+        "tarefa": nova.model_dump(mode="json"),
+    })
     return nova
 
+async def _publicar_lote(usuario_id: int, tipo: str, resultado: ResultadoLote):
+    # Um evento por lote (não por item) para não estourar a fila dos clientes
+    if resultado.versao is None:
+        return
+    evento = {"tipo": tipo, "versao": resultado.versao}
+    if tipo == "tarefas_removidas":
+        evento["ids"] = [r.id for r in resultado.resultados if r.status == "removida"]
+    else:
+        evento["tarefas"] = [t.model_dump(mode="json") for t in resultado.tarefas]
+    await event_hub.publish(usuario_id, evento)
+
+# Rotas em lote: declaradas antes de /tarefas/{tarefa_id} para que
+# "batch" não seja interpretado como id.
+def _validar_tamanho_lote(quantidade: int):
+    if quantidade > settings.TAREFAS_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Máximo de {settings.TAREFAS_BATCH_MAX} tarefas por lote",
+        )
+
+@app.post("/tarefas/batch", response_model=ResultadoLote, tags=["Tarefas"])
+async def criar_tarefas_lote(
+    tarefas: List[TarefaCreate] = Body(...),
+    session: AsyncSession = Depends(get_async_session),
+    user: Usuario = Depends(get_current_user),
+):
+    _validar_tamanho_lote(len(tarefas))
+    resultado = await crud.criar_tarefas_lote(session, tarefas, user.id)
+    await _publicar_lote(user.id, "tarefas_criadas", resultado)
+    return resultado
+
+@app.patch("/tarefas/batch/concluir", response_model=ResultadoLote, tags=["Tarefas"])
+async def concluir_tarefas_lote(
+    lote: TarefaIds,
+    session: AsyncSession = Depends(get_async_session),
+    user: Usuario = Depends(get_current_user),
+):
+    _validar_tamanho_lote(len(lote.ids))
+    resultado = await crud.concluir_tarefas_lote(session, lote.ids, user.id)
+    await _publicar_lote(user.id, "tarefas_atualizadas", resultado)
+    return resultado
+
+@app.delete("/tarefas/batch", response_model=ResultadoLote, tags=["Tarefas"])
+async def deletar_tarefas_lote(
+    lote: TarefaIds,
+    session: AsyncSession = Depends(get_async_session),
+    user: Usuario = Depends(get_current_user),
+):
+    _validar_tamanho_lote(len(lote.ids))
+    resultado = await crud.deletar_tarefas_lote(session, lote.ids, user.id)
+    await _publicar_lote(user.id, "tarefas_removidas", resultado)
+    return resultado
+
+# Exportação / importação: backup, migração e carga de ambientes de teste
+@app.get("/tarefas/export", tags=["Tarefas"])
+async def exportar_tarefas(
+    formato: Literal["ndjson", "csv"] = "ndjson",
+    session: AsyncSession = Depends(get_async_session),
+    user: Principal = Depends(get_current_principal),
+):
+    return StreamingResponse(
+        transferencia.exportar_tarefas(session, user.id, formato, settings.EXPORT_YIELD_PER),
+        media_type=transferencia.MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="tarefas.{formato}"'},
+    )
+
+@app.post("/tarefas/import", response_model=ResultadoImportacao, tags=["Tarefas"])
+async def importar_tarefas(
+    arquivo: UploadFile = File(..., description="NDJSON (um objeto por linha) ou CSV com cabeçalho"),
+    formato: Optional[Literal["ndjson", "csv"]] = Query(None, description="Padrão: pela extensão do arquivo"),
+    session: AsyncSession = Depends(get_async_session),
+    user: Usuario = Depends(get_current_user),
+):
+    if formato is None:
+        formato = "csv" if (arquivo.filename or "").lower().endswith(".csv") else "ndjson"
+
+    resultado = await transferencia.importar_tarefas(
+        session,
+        user.id,
+        arquivo.file,
+        formato,
+        tamanho_lote=settings.IMPORT_BATCH_SIZE,
+        max_erros=settings.IMPORT_MAX_ERROS,
+    )
+    if resultado.versao is not None:
+        # Um único evento: os clientes buscam o resto em /tarefas/changes
+        await event_hub.publish(user.id, {"tipo": "tarefas_importadas", "versao": resultado.versao})
+    return resultado
+
 @app.patch("/tarefas/{tarefa_id}/concluir", response_model=Tarefa, tags=["Tarefas"])
-def concluir_tarefa(
+async def concluir_tarefa(
     tarefa_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: Usuario = Depends(get_current_user),
 ):
-    tarefa = session.exec(
-        select(Tarefa).where(
-            Tarefa.id == tarefa_id,
-            Tarefa.usuario_id == user.id,
-        )
-    ).first()
-    if not tarefa:
-        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
-
-    tarefa.concluido = not tarefa.concluido
-    session.commit()
-    session.refresh(tarefa)
+    tarefa = await crud.alternar_conclusao_tarefa(session, tarefa_id, user.id)
+    await event_hub.publish(user.id, {
+        "tipo": "tarefa_atualizada",
+        "versao": tarefa.versao,
+        "tarefa": tarefa.model_dump(mode="json"),
+    })
     return tarefa
 
 @app.delete("/tarefas/{tarefa_id}", tags=["Tarefas"])
-def deletar_tarefa(
+async def deletar_tarefa(
     tarefa_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: Usuario = Depends(get_current_user),
 ):
-    tarefa = session.exec(
-        select(Tarefa).where(
-            Tarefa.id == tarefa_id,
-            Tarefa.usuario_id == user.id,
-        )
-    ).first()
-    if not tarefa:
-        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    versao = await crud.deletar_tarefa(session, tarefa_id, user.id)
+    await event_hub.publish(user.id, {
+        "tipo": "tarefa_removida",
+        "versao": versao,
+        "id": tarefa_id,
+    })
+    # A versão deixa o cliente ignorar cópias da tarefa anteriores à remoção
+    return {"detail": "Tarefa removida com sucesso", "versao": versao}
 
-    session.delete(tarefa)
-    session.commit()
-    return {"detail": "Tarefa removida com sucesso"}
\ No newline at end of file
+# =========================
+# ADMINISTRAÇÃO (perfis das requisições lentas)
+# =========================
+
+@app.get("/admin/profiles", tags=["Admin"])
+async def listar_profiles(admin: Usuario = Depends(get_current_admin)):
+    return await asyncio.to_thread(profile_store.listar)
+
+@app.get("/admin/profiles/{nome}", tags=["Admin"])
+async def obter_profile(
+    nome: str,
+    formato: Literal["texto", "pstats"] = Query("texto"),
+    admin: Usuario = Depends(get_current_admin),
+):
+    # "texto": top das funções por tempo acumulado; "pstats": arquivo para snakeviz/pstats
+    if formato == "pstats":
+        caminho = profile_store.caminho(nome)
+        if caminho is not None:
+            return FileResponse(caminho, media_type="application/octet-stream", filename=nome)
+    else:
+        resumo = await asyncio.to_thread(profile_store.resumo, nome)
+        if resumo is not None:
+            return PlainTextResponse(resumo)
+    raise HTTPException(status_code=404, detail="Perfil não encontrado")
@@ -1,5 +1,7 @@
 from sqlmodel import SQLModel, Field, Relationship
-from typing import List, Optional
+from sqlalchemy import Index
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
 
 class Usuario(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -7,25 +9,162 @@ class Usuario(SQLModel, table=True):
     email: str = Field(unique=True)
     password_hash: str
     is_active: bool = Field(default=True)
-    tarefas: List["Tarefa"] = Relationship(back_populates="usuario")
+    is_admin: bool = Field(default=False)
+    # lazy="raise": nenhuma consulta carrega as tarefas sem pedir
+    # (selectinload); o cascade cobre a exclusão pelo ORM
+    tarefas: List["Tarefa"] = Relationship(
+        back_populates="usuario",
+        sa_relationship_kwargs={"cascade": "all, delete-orphan", "lazy": "raise"},
+    )
 
 class Tarefa(SQLModel, table=True):
+    # Índices compostos para a listagem paginada por cursor (keyset):
+    # o filtro por usuário (+ status/prioridade) já sai ordenado por id.
+    __table_args__ = (
+        Index("ix_tarefa_usuario_id_id", "usuario_id", "id"),
+        Index(
+            "ix_tarefa_usuario_concluido_prioridade_id",
+            "usuario_id", "concluido", "prioridade", "id",
+        ),
+        # Sincronização incremental (/tarefas/changes)
+        Index("ix_tarefa_usuario_versao", "usuario_id", "versao"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     titulo: str
     prioridade: str = Field(default="Média")
     concluido: bool = Field(default=False)
+    usuario_id: int = Field(foreign_key="usuario.id", ondelete="CASCADE")
+    # Versão do usuário (VersaoTarefas) na última escrita desta tarefa
+    versao: int = Field(default=0)
+    atualizado_em: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    usuario: Optional["Usuario"] = Relationship(
+        back_populates="tarefas", sa_relationship_kwargs={"lazy": "raise"}
+    )
+
+class VersaoTarefas(SQLModel, table=True):
+    # Versão por usuário, incrementada a cada escrita em Tarefa.
+    # Permite responder 304 (ETag) sem consultar a tabela tarefa.
+    __tablename__ = "versao_tarefas"
+
+    usuario_id: int = Field(foreign_key="usuario.id", primary_key=True)
+    versao: int = Field(default=0)
+    atualizado_em: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Tombstones até esta versão já foram compactados (apagados)
+    versao_compactada: int = Field(default=0)
+
+class VersaoToken(SQLModel, table=True):
+    # Versão dos tokens do usuário (claim "tv"): incrementá-la revoga todos
+    # os tokens já emitidos. Sem FK: a linha sobrevive à exclusão do
+    # usuário e continua invalidando os tokens dele.
+    __tablename__ = "versao_token"
+
+    usuario_id: int = Field(primary_key=True)
+    versao: int = Field(default=0)
+    atualizado_em: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class RefreshToken(SQLModel, table=True):
+    # Refresh token opaco: só o SHA-256 fica no banco. Cada uso gera um
+    # novo token da mesma família; reapresentar um já usado revoga a família.
+    __tablename__ = "refresh_token"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    token_hash: str = Field(unique=True, index=True)
+    familia: str = Field(index=True)
+    usuario_id: int = Field(index=True)
+    criado_em: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    expira_em: datetime
+    usado_em: Optional[datetime] = None
+    revogado: bool = Field(default=False)
+
+class RateLimitBucket(SQLModel, table=True):
+    # Balde do rate limiter compartilhado (core.ratelimit.BancoBackend)
+    __tablename__ = "rate_limit_bucket"
+
+    chave: str = Field(primary_key=True)
+    fichas: float
+    atualizado_em: float = Field(index=True)  # epoch, em segundos
+
+class EventoTarefa(SQLModel, table=True):
+    # Evento do broker compartilhado (core.events.BancoBroker): cada worker
+    # lê os ids acima do último que já entregou
+    __tablename__ = "evento_tarefa"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    usuario_id: int
+    dados: str  # o evento, em JSON
+    criado_em: float = Field(index=True)  # epoch, em segundos
+
+class TarefaRemovida(SQLModel, table=True):
+    # Tombstone: registra a remoção para a sincronização incremental
+    __tablename__ = "tarefa_removida"
+    __table_args__ = (
+        Index("ix_tarefa_removida_usuario_versao", "usuario_id", "versao"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    tarefa_id: int
     usuario_id: int = Field(foreign_key="usuario.id")
-    usuario: Optional["Usuario"] = Relationship(back_populates="tarefas")
+    versao: int
+    removido_em: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
 
 class UsuarioCreate(SQLModel):
     username: str
     email: str
     password: str
 
+class Principal(SQLModel):
+    # Usuário autenticado só pelas claims do JWT (sem ler a tabela usuario)
+    id: int
+    username: str
+
 class TarefaCreate(SQLModel):
     titulo: str
     prioridade: Optional[str] = "Média"
 
+class TarefaImportada(TarefaCreate):
+    concluido: bool = False
+
+class TarefaIds(SQLModel):
+    ids: List[int]
+
+class ResultadoLoteItem(SQLModel):
+    id: Optional[int] = None
+    status: str
+
+class ResultadoLote(SQLModel):
+    resultados: List[ResultadoLoteItem]
+    tarefas: List[Tarefa] = []
+    versao: Optional[int] = None
+
+class MudancasTarefas(SQLModel):
+    versao: int
+    reset: bool = False
+    alteradas: List[Tarefa] = []
+    removidas: List[int] = []
+
+class EstatisticasTarefas(SQLModel):
+    total: int = 0
+    concluidas: int = 0
+    pendentes: int = 0
+    por_prioridade: Dict[str, int] = {}
+    versao: int = 0
+
+class ErroImportacao(SQLModel):
+    linha: int
+    detalhe: str
+
+class ResultadoImportacao(SQLModel):
+    importadas: int = 0
+    com_erro: int = 0
+    erros: List[ErroImportacao] = []
+    versao: Optional[int] = None
+
 class Token(SQLModel):
     access_token: str
-    token_type: str
\ No newline at end of file
+    token_type: str
+    expires_in: Optional[int] = None
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(SQLModel):
+    refresh_token: str
\ No newline at end of file
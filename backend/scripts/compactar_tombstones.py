@@ -0,0 +1,21 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core import crud
+from core.config import settings
+from database.connection import async_engine
+
+
+async def compactar(retencao_dias: int = settings.TOMBSTONE_RETENCAO_DIAS) -> int:
+    limite = datetime.now(timezone.utc) - timedelta(days=retencao_dias)
+    async with AsyncSession(async_engine) as session:
+        apagados = await crud.compactar_tombstones(session, limite)
+    await async_engine.dispose()
+    return apagados
+
+
+if __name__ == "__main__":
+    apagados = asyncio.run(compactar())
+    print(f"🧹 {apagados} tombstone(s) com mais de {settings.TOMBSTONE_RETENCAO_DIAS} dias removido(s).")
@@ -1,29 +1,36 @@
 from sqlmodel import Session, select
-from database import engine, create_db_and_tabelas 
-from models import Usuario
-from security import pwd_context
+from database.connection import engine
+from database.migracoes import migrar
+from schemas.models import Usuario
+from core.hashing import pwd_context
 
 def criar_admin_oficial():
-    # Garante que o arquivo .db e as tabelas existam
-    create_db_and_tabelas()
-    
+    # Garante que o arquivo .db e as tabelas existam (migrações pendentes)
+    migrar(engine)
+
     with Session(engine) as session:
         # Busca se já existe o admin
         statement = select(Usuario).where(Usuario.username == "admin")
         existente = session.exec(statement).first()
-        
+
         if existente:
+            if not existente.is_admin:
+                # Promove o usuário criado antes da flag existir 🛡️
+                existente.is_admin = True
+                session.add(existente)
+                session.commit()
             print("ℹ️ O usuário 'admin' já existe no banco.")
         else:
             senha_hash = pwd_context.hash("123456")
             novo_usuario = Usuario(
                 username="admin",
                 email="admin@exemplo.com",  # Adicionamos o e-mail aqui 📧
-                password_hash=senha_hash
+                password_hash=senha_hash,
+                is_admin=True,  # Acesso às rotas /admin 🛡️
             )
             session.add(novo_usuario)
             session.commit()
             print("✅ Sucesso! Usuário 'admin' criado com o e-mail 'admin@exemplo.com'")
 
 if __name__ == "__main__":
-    criar_admin_oficial()
\ No newline at end of file
+    criar_admin_oficial()
@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+import sys
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core import crud, transferencia
+from core.config import settings
+from database.connection import async_engine
+
+
+async def exportar(username: str, formato: str, saida) -> None:
+    async with AsyncSession(async_engine) as session:
+        usuario_id = await crud.buscar_id_por_username(session, username)
+        if usuario_id is None:
+            raise SystemExit(f"❌ Usuário '{username}' não encontrado.")
+
+        async for parte in transferencia.exportar_tarefas(
+            session, usuario_id, formato, settings.EXPORT_YIELD_PER
+        ):
+            saida.write(parte)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta as tarefas de um usuário em NDJSON ou CSV.")
+    parser.add_argument("--usuario", required=True, help="username dono das tarefas")
+    parser.add_argument("--formato", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--saida", help="arquivo de destino (padrão: saída padrão)")
+    args = parser.parse_args()
+
+    if args.saida:
+        with open(args.saida, "wb") as arquivo:
+            asyncio.run(exportar(args.usuario, args.formato, arquivo))
+        print(f"📦 Tarefas de '{args.usuario}' exportadas para {args.saida}", file=sys.stderr)
+    else:
+        asyncio.run(exportar(args.usuario, args.formato, sys.stdout.buffer))
@@ -0,0 +1,46 @@
+import argparse
+import asyncio
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core import crud, transferencia
+from core.config import settings
+from database.connection import async_engine
+from schemas.models import ResultadoImportacao
+
+
+async def importar(username: str, caminho: str, formato: str, tamanho_lote: int) -> ResultadoImportacao:
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        usuario_id = await crud.buscar_id_por_username(session, username)
+        if usuario_id is None:
+            raise SystemExit(f"❌ Usuário '{username}' não encontrado.")
+
+        with open(caminho, "rb") as arquivo:
+            resultado = await transferencia.importar_tarefas(
+                session,
+                usuario_id,
+                arquivo,
+                formato,
+                tamanho_lote=tamanho_lote,
+                max_erros=settings.IMPORT_MAX_ERROS,
+            )
+    await async_engine.dispose()
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa tarefas de um arquivo NDJSON ou CSV.")
+    parser.add_argument("arquivo", help="arquivo gerado por scripts.exportar_tarefas (ou no mesmo formato)")
+    parser.add_argument("--usuario", required=True, help="username que receberá as tarefas")
+    parser.add_argument("--formato", choices=["ndjson", "csv"], help="padrão: pela extensão do arquivo")
+    parser.add_argument("--lote", type=int, default=settings.IMPORT_BATCH_SIZE, help="tarefas por INSERT")
+    args = parser.parse_args()
+
+    formato = args.formato or ("csv" if args.arquivo.lower().endswith(".csv") else "ndjson")
+    resultado = asyncio.run(importar(args.usuario, args.arquivo, formato, args.lote))
+
+    print(f"✅ {resultado.importadas} tarefa(s) importada(s) para '{args.usuario}'.")
+    if resultado.com_erro:
+        print(f"⚠️ {resultado.com_erro} registro(s) ignorado(s):")
+        for erro in resultado.erros:
+            print(f"  - linha {erro.linha}: {erro.detalhe}")
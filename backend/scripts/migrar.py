@@ -0,0 +1,28 @@
+import argparse
+
+from database.connection import engine
+from database.migracoes import MIGRACOES, migrar, versao_atual
+
+
+def mostrar_status() -> None:
+    with engine.connect() as conn:
+        atual = versao_atual(conn)
+    for m in MIGRACOES:
+        marca = "✅" if m.versao <= atual else "⏳"
+        print(f"{marca} {m.versao:03d} {m.descricao}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aplica as migrações pendentes do banco")
+    parser.add_argument("--status", action="store_true", help="só lista as migrações e o que falta aplicar")
+    parser.add_argument("--ate", type=int, help="para nesta versão")
+    args = parser.parse_args()
+
+    if args.status:
+        mostrar_status()
+    else:
+        aplicadas = migrar(engine, ate=args.ate)
+        for m in aplicadas:
+            print(f"🛠️ {m.versao:03d} {m.descricao}")
+        with engine.connect() as conn:
+            print(f"✅ Banco na versão {versao_atual(conn)} ({len(aplicadas)} migração(ões) aplicada(s)).")
@@ -0,0 +1,164 @@
+"""
+Servidor de produção: vários workers uvicorn (ou gunicorn com
+UvicornWorker), dimensionados pelo nº de CPUs e configurados pelas
+variáveis SERVER_* do core/config.py.
+
+    python -m servidor                       (a partir da pasta backend)
+    SERVER_BACKEND=gunicorn python -m servidor
+
+Com mais de um worker, SIGHUP no processo principal recria os workers um
+a um sem fechar o socket (reload gracioso). O HTTP/2 e o TLS ficam no
+proxy reverso à frente; o keep-alive daqui deve ser maior que o timeout
+ocioso dele, para o proxy reaproveitar as conexões.
+
+gunicorn e uvloop estão no requirements.txt só fora do Windows; httptools
+vale para todos. Sem eles, SERVER_LOOP/SERVER_HTTP=auto caem para asyncio/h11.
+"""
+import importlib.util
+import logging
+import os
+
+from core.config import settings
+
+# Os workers importam "main:app" a partir daqui
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger("servidor")
+
+
+def numero_de_workers() -> int:
+    return settings.SERVER_WORKERS or os.cpu_count() or 1
+
+
+def _dividir_pool_de_hashing(workers: int) -> None:
+    # Cada worker sobe o seu pool de bcrypt (nº de CPUs por padrão): sem
+    # dividir, seriam workers × CPUs processos disputando os mesmos núcleos.
+    # Os workers leem a configuração do ambiente ao importar o app.
+    if workers > 1 and settings.PASSWORD_HASH_WORKERS is None:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(max(1, (os.cpu_count() or 1) // workers))
+
+
+# Alternativa compartilhada entre workers para cada estado em memória
+_COMPARTILHADOS = {
+    "EVENTS_BROKER": "core.events:BancoBroker",
+    "RATE_LIMIT_BACKEND": "core.ratelimit:BancoBackend",
+}
+
+
+def _avisar_estado_por_processo(workers: int) -> None:
+    if workers == 1:
+        return
+    for nome, compartilhado in _COMPARTILHADOS.items():
+        valor = getattr(settings, nome)
+        if "Memoria" in valor or "InMemory" in valor:
+            logger.warning(
+                "%s=%s guarda estado em memória, separado em cada um dos %d workers; "
+                "use %s=%s",
+                nome, valor, workers, nome, compartilhado,
+            )
+
+
+def _conferir_dependencias() -> None:
+    # Falha logo, com uma mensagem clara, em vez de um ImportError no meio
+    # da subida (ou em cada worker)
+    exigidos = {
+        "gunicorn": settings.SERVER_BACKEND == "gunicorn",
+        "uvloop": settings.SERVER_LOOP == "uvloop",
+        "httptools": settings.SERVER_HTTP == "httptools",
+    }
+    faltando = [
+        modulo for modulo, exigido in exigidos.items()
+        if exigido and importlib.util.find_spec(modulo) is None
+    ]
+    if faltando:
+        raise SystemExit(
+            f"Pacote(s) não instalado(s): {', '.join(faltando)}. Instale com "
+            f"pip install -r requirements.txt (gunicorn e uvloop só existem "
+            f"fora do Windows) ou ajuste SERVER_BACKEND/SERVER_LOOP/SERVER_HTTP."
+        )
+
+
+def _migrar() -> None:
+    # Uma vez, no processo principal, antes de subir os workers: eles só
+    # conferem a versão do banco no startup
+    from database.connection import engine
+    from database.migracoes import migrar
+
+    for m in migrar(engine):
+        logger.info("migração %03d aplicada: %s", m.versao, m.descricao)
+    engine.dispose()
+
+
+def rodar_uvicorn(workers: int) -> None:
+    import uvicorn
+
+    uvicorn.run(
+        "main:app",
+        app_dir=BACKEND_DIR,
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=workers,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+        limit_concurrency=settings.SERVER_LIMIT_CONCURRENCY,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.SERVER_FORWARDED_ALLOW_IPS,
+        access_log=settings.SERVER_ACCESS_LOG,
+    )
+
+
+def rodar_gunicorn(workers: int) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    opcoes = {
+        "bind": f"{settings.SERVER_HOST}:{settings.SERVER_PORT}",
+        "workers": workers,
+        # O UvicornWorker usa uvloop/httptools quando instalados
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "keepalive": settings.SERVER_KEEPALIVE_SECONDS,
+        "graceful_timeout": settings.SERVER_GRACEFUL_TIMEOUT,
+        "backlog": settings.SERVER_BACKLOG,
+        "max_requests": settings.SERVER_MAX_REQUESTS,
+        # Espalha as reciclagens para os workers não reiniciarem juntos
+        "max_requests_jitter": settings.SERVER_MAX_REQUESTS // 10,
+        "forwarded_allow_ips": settings.SERVER_FORWARDED_ALLOW_IPS,
+        "accesslog": "-" if settings.SERVER_ACCESS_LOG else None,
+    }
+
+    class Aplicacao(BaseApplication):
+        def load_config(self):
+            for chave, valor in opcoes.items():
+                self.cfg.set(chave, valor)
+
+        def load(self):
+            # Importado em cada worker (sem preload): nada é herdado do fork
+            from main import app
+            return app
+
+    Aplicacao().run()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    _conferir_dependencias()
+    workers = numero_de_workers()
+    _dividir_pool_de_hashing(workers)
+    _avisar_estado_por_processo(workers)
+    if settings.SERVER_MIGRAR:
+        _migrar()
+
+    logger.info(
+        "%s com %d worker(s) em %s:%d",
+        settings.SERVER_BACKEND, workers, settings.SERVER_HOST, settings.SERVER_PORT,
+    )
+    if settings.SERVER_BACKEND == "gunicorn":
+        rodar_gunicorn(workers)
+    else:
+        rodar_uvicorn(workers)
+
+
+if __name__ == "__main__":
+    main()
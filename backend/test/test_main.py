@@ -1,11 +1,42 @@
+import argparse
+import asyncio
+from contextlib import contextmanager
+
 import pytest
-from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import DateTime, event, inspect, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import SQLModel, create_engine, Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 
 from main import app
-from database.connection import get_session
-from database.models import Usuario, Tarefa
-from core.security import get_current_user
+from database import migracoes
+from database.migracoes import VERSAO_MAIS_RECENTE, migrar, schema_versao, versao_atual
+from database.connection import (
+    PoolMetrics,
+    _aplicar_pragmas_sqlite,
+    get_async_session,
+)
+from schemas.models import RefreshToken, Usuario, Tarefa, TarefaCreate
+from core import crud
+from core.config import settings
+from core.events import BancoBroker, EventHub, InMemoryBroker
+from core.hashing import password_hasher, pwd_context
+from core.metrics import antes_de_executar, depois_de_executar
+from core.profiler import ProfilerMiddleware, ProfileStore
+from core.ratelimit import BancoBackend, MemoriaBackend, rate_limiter
+from core.crud import invalidar_usuario_cache, principal_cache, versao_token_cache
+from core.security import (
+    claims_do_usuario,
+    create_access_token,
+    get_current_principal,
+    get_current_user,
+)
 
 # -------------------------------------------------
 # BANCO DE TESTE
@@ -16,16 +47,39 @@ engine_test = create_engine(
     connect_args={"check_same_thread": False},
 )
 
+# NullPool: o TestClient pode usar um event loop diferente a cada requisição
+engine_test_async = create_async_engine(
+    "sqlite+aiosqlite:///./banco_teste.db",
+    poolclass=NullPool,
+)
+
 client = TestClient(app)
 
 # -------------------------------------------------
 # FIXTURES
 # -------------------------------------------------
 
+@contextmanager
+def contar_queries():
+    """Conta os statements SQL enviados ao banco de teste pelas rotas."""
+    statements = []
+
+    def registrar(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    alvo = engine_test_async.sync_engine
+    event.listen(alvo, "before_cursor_execute", registrar)
+    try:
+        yield statements
+    finally:
+        event.remove(alvo, "before_cursor_execute", registrar)
+
+
 @pytest.fixture(autouse=True)
 def limpar_banco():
     SQLModel.metadata.drop_all(engine_test)
     SQLModel.metadata.create_all(engine_test)
+    rate_limiter.backend = MemoriaBackend()
     yield
 
 
@@ -48,8 +102,8 @@ usuario_teste = Usuario(
     is_admin=False,
 )
 
-def fake_get_session():
-    with Session(engine_test) as session:
+async def fake_get_session():
+    async with AsyncSession(engine_test_async, expire_on_commit=False) as session:
         yield session
 
 
@@ -57,8 +111,9 @@ def fake_get_current_user():
     return usuario_teste
 
 
-app.dependency_overrides[get_session] = fake_get_session
+app.dependency_overrides[get_async_session] = fake_get_session
 app.dependency_overrides[get_current_user] = fake_get_current_user
+app.dependency_overrides[get_current_principal] = fake_get_current_user
 
 # -------------------------------------------------
 # TESTES
@@ -92,6 +147,925 @@ def test_usuario_nao_pode_deletar_tarefa_de_outro():
     assert response.status_code == 404
 
 
+def test_listar_tarefas_paginado_por_cursor():
+    with Session(engine_test) as session:
+        for i in range(5):
+            session.add(Tarefa(
+                titulo=f"Tarefa {i}",
+                prioridade="Alta" if i % 2 else "Baixa",
+                concluido=i >= 3,
+                usuario_id=usuario_teste.id,
+            ))
+        session.add(Tarefa(titulo="Alheia", prioridade="Alta", usuario_id=999))
+        session.commit()
+
+    primeira = client.get("/tarefas", params={"limit": 2})
+    assert primeira.status_code == 200
+    assert [t["titulo"] for t in primeira.json()] == ["Tarefa 0", "Tarefa 1"]
+    cursor = primeira.headers["X-Next-Cursor"]
+
+    segunda = client.get("/tarefas", params={"limit": 2, "after": cursor})
+    assert [t["titulo"] for t in segunda.json()] == ["Tarefa 2", "Tarefa 3"]
+
+    ultima = client.get(
+        "/tarefas",
+        params={"limit": 2, "after": segunda.headers["X-Next-Cursor"]},
+    )
+    assert [t["titulo"] for t in ultima.json()] == ["Tarefa 4"]
+    assert "X-Next-Cursor" not in ultima.headers
+
+    filtradas = client.get(
+        "/tarefas",
+        params={"concluido": False, "prioridade": "Alta", "ordem": "desc"},
+    )
+    assert [t["titulo"] for t in filtradas.json()] == ["Tarefa 1"]
+
+
+def test_listar_tarefas_em_streaming_mantem_o_formato(monkeypatch):
+    for titulo in ("A", "B", "C", "D", "E"):
+        client.post("/tarefas", json={"titulo": titulo, "prioridade": "Alta"})
+    normal = client.get("/tarefas").json()
+
+    # Páginas acima do limite saem do banco em blocos de 2 linhas
+    monkeypatch.setattr(settings, "TAREFAS_STREAM_MIN", 2)
+    monkeypatch.setattr(settings, "TAREFAS_STREAM_YIELD_PER", 2)
+    blocos = []
+    original = crud.stream_linhas_tarefas_usuario
+
+    async def espiar(*args, **kwargs):
+        async for bloco in original(*args, **kwargs):
+            blocos.append(len(bloco))
+            yield bloco
+
+    monkeypatch.setattr(crud, "stream_linhas_tarefas_usuario", espiar)
+
+    resposta = client.get("/tarefas", params={"limit": 3})
+    assert resposta.status_code == 200
+    assert "content-length" not in resposta.headers
+    assert resposta.json() == normal[:3]
+    assert resposta.headers["x-next-cursor"] == str(normal[2]["id"])
+    assert blocos == [2, 1]
+
+    # Última página: sem cursor, e os filtros valem também no streaming
+    ultima = client.get("/tarefas", params={"limit": 3, "after": normal[2]["id"]})
+    assert ultima.json() == normal[3:]
+    assert "x-next-cursor" not in ultima.headers
+    desc = client.get("/tarefas", params={"limit": 4, "ordem": "desc"})
+    assert desc.json() == normal[::-1][:4]
+    assert desc.headers["x-next-cursor"] == str(normal[1]["id"])
+    assert set(normal[0]) == {"id", "titulo", "prioridade", "concluido", "usuario_id", "versao", "atualizado_em"}
+    assert normal[0]["atualizado_em"].endswith("Z")
+
+
+def test_exportar_e_importar_tarefas(monkeypatch):
+    client.post("/tarefas", json={"titulo": "Comprar pão, leite", "prioridade": "Alta"})
+    feita = client.post("/tarefas", json={"titulo": "Linha\nquebrada"}).json()
+    client.patch(f"/tarefas/{feita['id']}/concluir")
+
+    ndjson = client.get("/tarefas/export")
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    linhas = ndjson.text.splitlines()
+    assert len(linhas) == 2
+
+    csv_export = client.get("/tarefas/export", params={"formato": "csv"})
+    assert csv_export.text.startswith("id,titulo,prioridade,concluido")
+
+    # Lote de 1 para exercitar vários INSERTs; linha inválida é relatada
+    monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 1)
+    conteudo = ndjson.text + '{"prioridade": "Alta"}\nnão é json\n'
+    resposta = client.post(
+        "/tarefas/import",
+        files={"arquivo": ("tarefas.ndjson", conteudo.encode("utf-8"), "application/x-ndjson")},
+    )
+    assert resposta.status_code == 200
+    resultado = resposta.json()
+    assert resultado["importadas"] == 2
+    assert [e["linha"] for e in resultado["erros"]] == [3, 4]
+
+    importada = client.post(
+        "/tarefas/import",
+        files={"arquivo": ("tarefas.csv", csv_export.content, "text/csv")},
+    ).json()
+    assert importada["importadas"] == 2 and importada["com_erro"] == 0
+
+    tarefas = client.get("/tarefas").json()
+    assert len(tarefas) == 6
+    assert [t["titulo"] for t in tarefas[-2:]] == ["Comprar pão, leite", "Linha\nquebrada"]
+    assert [t["concluido"] for t in tarefas[-2:]] == [False, True]
+
+
+def test_busca_textual_por_prefixo_sem_acentos(session: Session):
+    for titulo in ("Reunião com a equipe", "Comprar café", "Café da manhã", "Pagar boleto"):
+        client.post("/tarefas", json={"titulo": titulo})
+    # Tarefa de outro usuário não aparece na busca
+    session.add(Tarefa(titulo="Café do vizinho", usuario_id=2))
+    session.commit()
+
+    titulos = lambda r: [t["titulo"] for t in r.json()]
+    assert titulos(client.get("/tarefas/search", params={"q": "reuniao"})) == ["Reunião com a equipe"]
+    assert sorted(titulos(client.get("/tarefas/search", params={"q": "caf"}))) == ["Café da manhã", "Comprar café"]
+    assert titulos(client.get("/tarefas/search", params={"q": "CAFE manh"})) == ["Café da manhã"]
+    # Sintaxe FTS vinda do usuário é tratada como texto
+    assert client.get("/tarefas/search", params={"q": '"boleto" OR *'}).status_code == 200
+
+    pagina = client.get("/tarefas/search", params={"q": "caf", "limit": 1})
+    assert len(pagina.json()) == 1 and pagina.headers["X-Next-Offset"] == "1"
+    resto = client.get("/tarefas/search", params={"q": "caf", "limit": 1, "offset": 1})
+    assert len(resto.json()) == 1 and "X-Next-Offset" not in resto.headers
+
+    # Índice acompanha edições e remoções (triggers)
+    cafe = next(t for t in client.get("/tarefas").json() if t["titulo"] == "Comprar café")
+    client.delete(f"/tarefas/{cafe['id']}")
+    assert titulos(client.get("/tarefas/search", params={"q": "cafe"})) == ["Café da manhã"]
+
+
+def test_estatisticas_por_count_agrupado(session: Session):
+    vazia = client.get("/tarefas/stats").json()
+    assert vazia == {"total": 0, "concluidas": 0, "pendentes": 0, "por_prioridade": {}, "versao": 0}
+
+    ids = [
+        client.post("/tarefas", json={"titulo": f"T{i}", "prioridade": prioridade}).json()["id"]
+        for i, prioridade in enumerate(["Alta", "Alta", "Baixa", "Média"])
+    ]
+    client.patch(f"/tarefas/{ids[0]}/concluir")
+    client.delete(f"/tarefas/{ids[3]}")
+    session.add(Tarefa(titulo="De outro usuário", usuario_id=2, concluido=True))
+    session.commit()
+
+    with contar_queries() as queries:
+        resposta = client.get("/tarefas/stats")
+    assert len(queries) == 2  # versão + COUNT agrupado
+    assert "GROUP BY" in queries[1]
+    stats = resposta.json()
+    assert (stats["total"], stats["concluidas"], stats["pendentes"]) == (3, 1, 2)
+    assert stats["por_prioridade"] == {"Alta": 2, "Baixa": 1}
+
+    repetida = client.get("/tarefas/stats", headers={"If-None-Match": resposta.headers["ETag"]})
+    assert repetida.status_code == 304
+
+
+def test_get_current_user_usa_cache_de_principal(session: Session):
+    usuario = Usuario(
+        username="cacheado",
+        email="cache@teste.com",
+        password_hash="123",
+    )
+    session.add(usuario)
+    session.commit()
+
+    principal_cache.clear()
+    token = create_access_token({"sub": "cacheado"})
+    misses = principal_cache.misses
+
+    async def autenticar_duas_vezes():
+        async for async_session in fake_get_session():
+            primeiro = await get_current_user(token=token, session=async_session)
+            segundo = await get_current_user(token=token, session=async_session)
+            return primeiro, segundo
+
+    primeiro, segundo = asyncio.run(autenticar_duas_vezes())
+
+    assert primeiro.username == segundo.username == "cacheado"
+    assert principal_cache.misses == misses + 1
+    assert principal_cache.stats()["hits"] >= 1
+
+    invalidar_usuario_cache("cacheado")
+    assert principal_cache.stats()["size"] == 0
+
+
+def test_principal_pelas_claims_e_revogacao_por_versao(session: Session):
+    usuario = Usuario(username="claims", email="claims@teste.com", password_hash="x")
+    session.add(usuario)
+    session.commit()
+    session.refresh(usuario)
+    versao_token_cache.clear()
+    token = create_access_token(claims_do_usuario(usuario, 0))
+
+    async def cenario():
+        async for async_session in fake_get_session():
+            principal = await get_current_principal(token=token, session=async_session)
+            assert (principal.id, principal.username) == (usuario.id, "claims")
+
+            # Versão em cache: só a verificação do HMAC, nenhuma query
+            with contar_queries() as queries:
+                await get_current_principal(token=token, session=async_session)
+            assert queries == []
+
+            await crud.revogar_tokens_usuario(async_session, principal)
+            with pytest.raises(HTTPException) as erro:
+                await get_current_principal(token=token, session=async_session)
+            assert erro.value.status_code == 401
+            with pytest.raises(HTTPException):
+                await get_current_user(token=token, session=async_session)
+
+            novo = create_access_token(claims_do_usuario(usuario, 1))
+            assert (await get_current_principal(token=novo, session=async_session)).id == usuario.id
+
+    asyncio.run(cenario())
+
+
+def test_login_verifica_senha_no_pool_de_hashing(session: Session):
+    session.add(Usuario(
+        username="login",
+        email="login@teste.com",
+        password_hash=pwd_context.hash("segredo", rounds=4),
+    ))
+    session.commit()
+
+    ok = client.post("/token", data={"username": "login", "password": "segredo"})
+    assert ok.status_code == 200
+    assert ok.json()["token_type"] == "bearer"
+
+    errada = client.post("/token", data={"username": "login", "password": "x"})
+    assert errada.status_code == 401
+
+
+def test_bcrypt_roda_sem_segurar_conexao_do_pool(session: Session, monkeypatch):
+    session.add(Usuario(
+        username="pool",
+        email="pool@teste.com",
+        password_hash=pwd_context.hash("segredo", rounds=4),
+    ))
+    session.commit()
+
+    emprestadas = []
+    durante_o_hash = []
+
+    def checkout(*args):
+        emprestadas.append(1)
+
+    def checkin(*args):
+        emprestadas.pop()
+
+    async def verificar(senha, senha_hash):
+        durante_o_hash.append(len(emprestadas))
+        return True
+
+    async def gerar_hash(senha):
+        durante_o_hash.append(len(emprestadas))
+        return pwd_context.hash(senha, rounds=4)
+
+    monkeypatch.setattr(password_hasher, "verify", verificar)
+    monkeypatch.setattr(password_hasher, "hash", gerar_hash)
+    alvo = engine_test_async.sync_engine
+    event.listen(alvo, "checkout", checkout)
+    event.listen(alvo, "checkin", checkin)
+    try:
+        assert client.post("/token", data={"username": "pool", "password": "x"}).status_code == 200
+        assert client.post(
+            "/usuarios", json={"username": "novo", "email": "novo@teste.com", "password": "x"}
+        ).status_code == 201
+    finally:
+        event.remove(alvo, "checkout", checkout)
+        event.remove(alvo, "checkin", checkin)
+
+    # Login e cadastro devolvem a conexão antes de esperar pelo bcrypt
+    assert durante_o_hash == [0, 0]
+
+
+def test_login_de_usuario_inexistente_custa_um_bcrypt_desde_o_primeiro(monkeypatch):
+    from core import security
+
+    monkeypatch.setattr(security, "_HASH_FICTICIO", None)
+    operacoes = []
+
+    async def gerar_hash(senha):
+        operacoes.append("hash")
+        return pwd_context.hash(senha, rounds=4)
+
+    async def verificar(senha, senha_hash):
+        operacoes.append("verify")
+        return False
+
+    monkeypatch.setattr(password_hasher, "hash", gerar_hash)
+    monkeypatch.setattr(password_hasher, "verify", verificar)
+
+    # O lifespan prepara o hash antes de servir a primeira requisição
+    asyncio.run(security.preparar_hash_ficticio())
+    operacoes.clear()
+
+    for _ in range(2):
+        assert client.post("/token", data={"username": "fantasma", "password": "x"}).status_code == 401
+    assert operacoes == ["verify", "verify"]
+
+
+def test_pool_de_hashing_usa_spawn():
+    from core.hashing import PasswordHasher
+
+    hasher = PasswordHasher(workers=1, max_pending=1, retry_after=1)
+    try:
+        # Sem fork: os processos não herdam as threads (e locks) do servidor
+        assert hasher._get_executor()._mp_context.get_start_method() == "spawn"
+        assert asyncio.run(hasher.verify("x", pwd_context.hash("x", rounds=4)))
+    finally:
+        hasher.shutdown()
+
+
+def test_servidor_recusa_backend_sem_pacote_instalado(monkeypatch):
+    import servidor
+
+    monkeypatch.setattr(settings, "SERVER_BACKEND", "gunicorn")
+    monkeypatch.setattr(servidor.importlib.util, "find_spec", lambda nome: None)
+    with pytest.raises(SystemExit, match="gunicorn"):
+        servidor._conferir_dependencias()
+
+    # auto escolhe uvloop/httptools só se instalados: nada a exigir
+    monkeypatch.setattr(settings, "SERVER_BACKEND", "uvicorn")
+    servidor._conferir_dependencias()
+
+
+def test_refresh_token_rotaciona_e_detecta_reuso(session: Session):
+    session.add(Usuario(
+        username="refresh",
+        email="refresh@teste.com",
+        password_hash=pwd_context.hash("segredo", rounds=4),
+    ))
+    session.commit()
+    versao_token_cache.clear()
+
+    login = client.post("/token", data={"username": "refresh", "password": "segredo"}).json()
+    assert login["expires_in"] == settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    primeiro = login["refresh_token"]
+
+    renovado = client.post("/token/refresh", json={"refresh_token": primeiro})
+    assert renovado.status_code == 200
+    segundo = renovado.json()["refresh_token"]
+    assert segundo != primeiro and renovado.json()["access_token"]
+
+    # Só o hash fica no banco
+    assert session.exec(select(RefreshToken).where(RefreshToken.token_hash == primeiro)).first() is None
+
+    # Reusar o token já consumido revoga a família inteira
+    assert client.post("/token/refresh", json={"refresh_token": primeiro}).status_code == 401
+    assert client.post("/token/refresh", json={"refresh_token": segundo}).status_code == 401
+    assert client.post("/token/refresh", json={"refresh_token": "inexistente"}).status_code == 401
+
+
+def test_respostas_grandes_saem_comprimidas():
+    client.post("/tarefas/batch", json=[{"titulo": f"Tarefa comprimida {i}"} for i in range(100)])
+
+    grande = client.get("/tarefas", headers={"Accept-Encoding": "gzip"})
+    assert grande.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in grande.headers["Vary"]
+    assert int(grande.headers["Content-Length"]) < len(grande.content) / 3
+    assert len(grande.json()) == 100
+
+    # Abaixo do mínimo, ou sem Accept-Encoding, sai como está
+    pequena = client.get("/tarefas/stats", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in pequena.headers
+    crua = client.get("/tarefas", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in crua.headers and len(crua.json()) == 100
+
+
+def test_streaming_nao_comprimivel_envia_o_inicio_uma_vez():
+    from core.compressao import CompressaoMiddleware
+
+    async def eventos(scope, receive, send):
+        await send({
+            "type": "http.response.start", "status": 200,
+            "headers": [(b"content-type", b"text/event-stream")],
+        })
+        for parte in (b"retry: 3000\n\n", b"data: 1\n\n", b""):
+            await send({"type": "http.response.body", "body": parte, "more_body": bool(parte)})
+
+    enviadas = []
+
+    async def send(message):
+        enviadas.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressaoMiddleware(eventos)(scope, None, send))
+    # SSE passa direto, sem repetir o http.response.start a cada parte
+    assert [m["type"] for m in enviadas].count("http.response.start") == 1
+    assert [m.get("body") for m in enviadas[1:]] == [b"retry: 3000\n\n", b"data: 1\n\n", b""]
+
+
+def test_rate_limit_do_login_barra_antes_do_bcrypt(session: Session, monkeypatch):
+    session.add(Usuario(
+        username="alvo",
+        email="alvo@teste.com",
+        password_hash=pwd_context.hash("segredo", rounds=4),
+    ))
+    session.commit()
+    monkeypatch.setattr(settings, "RATE_LIMIT_LOGIN_USUARIO", "2/60")
+
+    verificacoes = []
+    verify_original = password_hasher.verify
+
+    async def verify_contado(senha, hash_):
+        verificacoes.append(senha)
+        return await verify_original(senha, hash_)
+
+    monkeypatch.setattr(password_hasher, "verify", verify_contado)
+
+    for _ in range(2):
+        assert client.post("/token", data={"username": "alvo", "password": "x"}).status_code == 401
+    barrada = client.post("/token", data={"username": "ALVO", "password": "segredo"})
+    assert barrada.status_code == 429
+    assert int(barrada.headers["Retry-After"]) >= 1
+    assert len(verificacoes) == 2
+
+    # Usuário inexistente paga o mesmo bcrypt (sem oráculo de tempo)
+    assert client.post("/token", data={"username": "fantasma", "password": "x"}).status_code == 401
+    assert len(verificacoes) == 3
+
+
+def test_rate_limit_no_banco_compartilha_os_baldes():
+    agora = [1000.0]
+    backend = BancoBackend(engine_test_async, relogio=lambda: agora[0])
+
+    async def cenario():
+        assert (await backend.consumir("k", 2, 1.0))[0]
+        assert (await backend.consumir("k", 2, 1.0))[0]
+        permitido, espera = await backend.consumir("k", 2, 1.0)
+        assert not permitido and espera > 0
+        agora[0] += 1.5
+        assert (await backend.consumir("k", 2, 1.0))[0]
+        await backend.limpar(agora[0] + 1)
+
+    asyncio.run(cenario())
+
+
+def test_carga_em_processo_nao_esbarra_no_rate_limit(session: Session, monkeypatch):
+    import httpx
+
+    from benchmarks import carga
+    from benchmarks.seed import SENHA
+
+    # O monkeypatch devolve o rate limit ligado para os outros testes
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    senha_hash = pwd_context.hash(SENHA, rounds=4)
+    session.add_all([
+        Usuario(username=f"bench_{i}", email=f"bench_{i}@teste.com", password_hash=senha_hash)
+        for i in range(2)
+    ])
+    session.commit()
+
+    # Mais usuários virtuais que o limite de login por IP e por usuário
+    args = argparse.Namespace(
+        concorrencia=30, duracao=0.2, usuarios=2, mix=carga.parse_mix("listar=1,token=1")
+    )
+
+    async def rodar():
+        transporte = httpx.ASGITransport(app=carga.app_em_processo())
+        async with httpx.AsyncClient(transport=transporte, base_url="http://carga") as cliente:
+            return await carga.executar_carga(cliente, args)
+
+    resultados = asyncio.run(rodar())
+    assert resultados["total"]["erros"] == 0
+    assert resultados["token"]["n"] > 0
+
+
+def test_login_recusa_com_503_quando_fila_de_hashing_esta_cheia(monkeypatch):
+    monkeypatch.setattr(password_hasher, "max_pending", 0)
+
+    response = client.post(
+        "/usuarios",
+        json={"username": "novo", "email": "novo@teste.com", "password": "123"},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(password_hasher.retry_after)
+
+
+def test_conexao_sqlite_aplica_pragmas_e_conta_checkouts(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pragmas.db'}")
+    event.listen(engine, "connect", _aplicar_pragmas_sqlite)
+    metricas = PoolMetrics(engine)
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() > 0
+        assert metricas.stats()["checked_out"] == 1
+
+    stats = metricas.stats()
+    assert stats["checkouts"] == stats["checkins"] == 1
+    assert stats["peak_checked_out"] == 1
+    engine.dispose()
+
+
+def test_operacoes_em_lote_respeitam_o_usuario():
+    criadas = client.post(
+        "/tarefas/batch",
+        json=[{"titulo": f"Lote {i}", "prioridade": "Baixa"} for i in range(3)],
+    )
+    assert criadas.status_code == 200
+    ids = [t["id"] for t in criadas.json()["tarefas"]]
+    assert [t["titulo"] for t in criadas.json()["tarefas"]] == ["Lote 0", "Lote 1", "Lote 2"]
+
+    with Session(engine_test) as session:
+        alheia = Tarefa(titulo="Alheia", prioridade="Alta", usuario_id=999)
+        session.add(alheia)
+        session.commit()
+        session.refresh(alheia)
+
+    concluidas = client.patch(
+        "/tarefas/batch/concluir",
+        json={"ids": ids[:2] + [alheia.id]},
+    )
+    assert concluidas.status_code == 200
+    assert [r["status"] for r in concluidas.json()["resultados"]] == [
+        "concluida", "concluida", "nao_encontrada",
+    ]
+    assert all(t["concluido"] for t in concluidas.json()["tarefas"])
+
+    removidas = client.request(
+        "DELETE", "/tarefas/batch", json={"ids": ids + [alheia.id]},
+    )
+    assert removidas.status_code == 200
+    assert [r["status"] for r in removidas.json()["resultados"]] == [
+        "removida", "removida", "removida", "nao_encontrada",
+    ]
+
+    with Session(engine_test) as session:
+        assert session.get(Tarefa, alheia.id) is not None
+
+
+def test_escritas_de_tarefa_usam_um_statement_cada():
+    # Orçamento de queries por endpoint: um INSERT/UPDATE/DELETE ... RETURNING
+    # (+ o UPSERT da versão usada no ETag)
+    with contar_queries() as queries:
+        criada = client.post("/tarefas", json={"titulo": "Contada"})
+    assert criada.status_code == 200
+    assert len(queries) == 2
+
+    tarefa_id = criada.json()["id"]
+    with contar_queries() as queries:
+        concluida = client.patch(f"/tarefas/{tarefa_id}/concluir")
+    assert concluida.json()["concluido"] is True
+    assert len(queries) == 2
+
+    with contar_queries() as queries:
+        reaberta = client.patch(f"/tarefas/{tarefa_id}/concluir")
+    assert reaberta.json()["concluido"] is False
+    assert len(queries) == 2
+
+    # (+ o tombstone usado pela sincronização incremental)
+    with contar_queries() as queries:
+        removida = client.delete(f"/tarefas/{tarefa_id}")
+    assert removida.status_code == 200
+    assert removida.json()["versao"] == reaberta.json()["versao"] + 1
+    assert len(queries) == 3
+
+    assert client.patch(f"/tarefas/{tarefa_id}/concluir").status_code == 404
+
+
+def test_cadastro_de_usuario_usa_uma_consulta_e_um_insert():
+    # A verificação do username roda uma vez, na rota, antes do bcrypt
+    with contar_queries() as queries:
+        criado = client.post(
+            "/usuarios", json={"username": "contado", "email": "contado@teste.com", "password": "x"}
+        )
+    assert criado.status_code == 201
+    assert len(queries) == 2
+
+    # Username repetido: só a consulta, nem bcrypt nem INSERT
+    with contar_queries() as queries:
+        repetido = client.post(
+            "/usuarios", json={"username": "contado", "email": "outro@teste.com", "password": "x"}
+        )
+    assert repetido.status_code == 400
+    assert len(queries) == 1
+
+
+def test_listar_tarefas_responde_304_pela_versao():
+    client.post("/tarefas", json={"titulo": "Versionada"})
+
+    primeira = client.get("/tarefas")
+    etag = primeira.headers["ETag"]
+    assert primeira.status_code == 200
+    assert "Last-Modified" in primeira.headers
+
+    with contar_queries() as queries:
+        repetida = client.get("/tarefas", headers={"If-None-Match": etag})
+    assert repetida.status_code == 304
+    assert len(queries) == 1
+    assert "tarefa " not in queries[0].replace("versao_tarefas", "")
+
+    filtrada = client.get("/tarefas?concluido=true", headers={"If-None-Match": etag})
+    assert filtrada.status_code == 200
+
+    client.post("/tarefas", json={"titulo": "Nova"})
+    depois = client.get("/tarefas", headers={"If-None-Match": etag})
+    assert depois.status_code == 200
+    assert depois.headers["ETag"] != etag
+    assert len(depois.json()) == 2
+
+
+def test_sincronizacao_incremental_com_tombstones():
+    # since=0 é sempre uma cópia completa pelo GET /tarefas
+    inicial = client.get("/tarefas/changes").json()
+    assert inicial == {"versao": 0, "reset": True, "alteradas": [], "removidas": []}
+
+    a = client.post("/tarefas", json={"titulo": "A"}).json()
+    b = client.post("/tarefas", json={"titulo": "B"}).json()
+    primeira = client.get("/tarefas/changes", params={"since": 0}).json()
+    assert primeira["reset"] is True and primeira["alteradas"] == []
+    since = primeira["versao"]
+    assert [t["titulo"] for t in client.get("/tarefas").json()] == ["A", "B"]
+
+    client.patch(f"/tarefas/{a['id']}/concluir")
+    client.delete(f"/tarefas/{b['id']}")
+    delta = client.get("/tarefas/changes", params={"since": since}).json()
+    assert [t["id"] for t in delta["alteradas"]] == [a["id"]]
+    assert delta["alteradas"][0]["concluido"] is True
+    assert delta["removidas"] == [b["id"]]
+
+    vazio = client.get("/tarefas/changes", params={"since": delta["versao"]}).json()
+    assert vazio["alteradas"] == [] and vazio["removidas"] == []
+
+    # Após a compactação, quem está antes dela precisa refazer a lista
+    async def compactar():
+        async for async_session in fake_get_session():
+            return await crud.compactar_tombstones(
+                async_session, datetime.now(timezone.utc) + timedelta(days=1)
+            )
+
+    assert asyncio.run(compactar()) == 1
+    assert client.get("/tarefas/changes", params={"since": since}).json()["reset"] is True
+    assert client.get("/tarefas/changes", params={"since": delta["versao"]}).json()["reset"] is False
+
+
+def test_event_hub_entrega_por_usuario_e_descarta_consumidor_lento():
+    async def cenario():
+        hub = EventHub(InMemoryBroker(), queue_size=1)
+        await hub.start()
+        rapido = hub.subscribe(1)
+        outro_usuario = hub.subscribe(2)
+
+        await hub.publish(1, {"tipo": "tarefa_criada", "versao": 1})
+        assert rapido.queue.get_nowait()["versao"] == 1
+        assert outro_usuario.queue.empty()
+
+        # Fila cheia: o consumidor é desconectado em vez de bloquear o hub
+        await hub.publish(1, {"tipo": "tarefa_criada", "versao": 2})
+        await hub.publish(1, {"tipo": "tarefa_criada", "versao": 3})
+        assert rapido.evicted
+        assert hub.stats() == {"subscriptions": 1, "evictions": 1}
+        await hub.stop()
+
+    asyncio.run(cenario())
+
+
+def test_banco_broker_entrega_eventos_entre_workers():
+    # Dois hubs com brokers no mesmo banco fazem o papel de dois workers
+    async def cenario():
+        agora = [1000.0]
+        brokers = [
+            BancoBroker(engine_test_async, intervalo=0.01, retencao=60, relogio=lambda: agora[0])
+            for _ in range(2)
+        ]
+        hubs = [EventHub(broker, queue_size=10) for broker in brokers]
+        for hub in hubs:
+            await hub.start()
+        inscricoes = [hub.subscribe(1) for hub in hubs]
+
+        await hubs[0].publish(1, {"tipo": "tarefa_criada", "versao": 1})
+        recebidos = [
+            await asyncio.wait_for(inscricao.queue.get(), timeout=2) for inscricao in inscricoes
+        ]
+        assert [r["versao"] for r in recebidos] == [1, 1]
+
+        # Cada worker entrega cada evento uma vez só
+        assert await brokers[1].ler(hubs[1]._entregar) == 0
+        for hub in hubs:
+            await hub.stop()
+
+        # Eventos velhos saem da tabela
+        await brokers[0].limpar(agora[0] + 1)
+        async for async_session in fake_get_session():
+            restantes = (await async_session.exec(text("SELECT count(*) FROM evento_tarefa"))).scalar()
+        assert restantes == 0
+
+    asyncio.run(cenario())
+
+
+def test_stream_entrega_eventos_com_token_de_stream(monkeypatch):
+    import httpx
+
+    from core.events import event_hub
+
+    monkeypatch.setattr(settings, "EVENTS_HEARTBEAT_SECONDS", 0.05)
+    versao_token_cache.clear()
+    emitido = client.post("/tarefas/stream/token")
+    assert emitido.status_code == 200
+    assert emitido.json()["expires_in"] == settings.STREAM_TOKEN_EXPIRE_SECONDS
+    token_stream = emitido.json()["access_token"]
+
+    async def cenario():
+        await event_hub.start()
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as cliente:
+            leitura = asyncio.create_task(
+                cliente.get("/tarefas/stream", params={"token": token_stream})
+            )
+            while not event_hub.stats()["subscriptions"]:
+                await asyncio.sleep(0.01)
+            criada = await cliente.post("/tarefas", json={"titulo": "Ao vivo"})
+            # Encerra as inscrições: o stream termina depois de entregar o evento
+            await event_hub.stop()
+            return criada.json(), await leitura
+
+    criada, resposta = asyncio.run(cenario())
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"].startswith("text/event-stream")
+    assert f"id: {criada['versao']}\nevent: tarefa_criada\n" in resposta.text
+    assert '"titulo": "Ao vivo"' in resposta.text
+
+
+def test_stream_recusa_tokens_fora_do_escopo():
+    versao_token_cache.clear()
+    token_stream = client.post("/tarefas/stream/token").json()["access_token"]
+    access_token = create_access_token(claims_do_usuario(usuario_teste, 0))
+
+    # Sem token, token inválido ou access token na URL (que vai para logs)
+    assert client.get("/tarefas/stream").status_code == 401
+    assert client.get("/tarefas/stream", params={"token": "invalido"}).status_code == 401
+    assert client.get("/tarefas/stream", params={"token": access_token}).status_code == 401
+
+    # E o token de stream não autoriza as outras rotas
+    async def cenario():
+        async for async_session in fake_get_session():
+            with pytest.raises(HTTPException) as erro:
+                await get_current_principal(token=token_stream, session=async_session)
+            assert erro.value.status_code == 401
+
+    asyncio.run(cenario())
+
+
+def test_metricas_por_rota_e_server_timing(monkeypatch):
+    alvo = engine_test_async.sync_engine
+    event.listen(alvo, "before_cursor_execute", antes_de_executar)
+    event.listen(alvo, "after_cursor_execute", depois_de_executar)
+    try:
+        client.post("/tarefas", json={"titulo": "Medida"})
+        resposta = client.get("/tarefas")
+    finally:
+        event.remove(alvo, "before_cursor_execute", antes_de_executar)
+        event.remove(alvo, "after_cursor_execute", depois_de_executar)
+
+    timing = resposta.headers["Server-Timing"]
+    assert timing.startswith("app;dur=")
+    assert 'db;dur=' in timing and 'queries"' in timing
+
+    # Restrito a administradores, como /admin/profiles
+    assert client.get("/metrics").status_code == 403
+    monkeypatch.setattr(usuario_teste, "is_admin", True)
+    metricas = client.get("/metrics")
+    assert metricas.status_code == 200
+    assert metricas.headers["content-type"].startswith("text/plain")
+    corpo = metricas.text
+    # Rótulo pela rota (template), não pela URL concreta
+    assert 'http_request_duration_seconds_count{method="GET",route="/tarefas"}' in corpo
+    assert 'http_requests_total{method="POST",route="/tarefas",status="200"}' in corpo
+    assert 'db_queries_per_request_bucket{route="/tarefas",le="+Inf"}' in corpo
+    assert "principal_cache_hits" in corpo
+    assert "db_pool_checkouts" in corpo
+
+
+def test_profiler_guarda_requisicoes_lentas_em_buffer_circular(tmp_path):
+    async def app_lento(scope, receive, send):
+        await asyncio.sleep(0.01)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def enviar(message):
+        pass
+
+    store = ProfileStore(str(tmp_path), max_arquivos=2)
+    profiler = ProfilerMiddleware(app_lento, store, limite_ms=5, taxa_amostragem=1.0)
+
+    async def cenario():
+        for _ in range(3):
+            await profiler({"type": "http", "method": "GET", "path": "/tarefas"}, None, enviar)
+            await asyncio.sleep(0.002)  # nomes com timestamps distintos
+
+    asyncio.run(cenario())
+    perfis = store.listar()
+    assert len(perfis) == 2
+    assert perfis[0]["rota"] == "tarefas" and perfis[0]["duracao_ms"] >= 5
+    assert "cumulative" in store.resumo(perfis[0]["nome"])
+    assert store.caminho("../banco_teste.db") is None
+
+    # Rotas de administração exigem is_admin
+    assert client.get("/admin/profiles").status_code == 403
+
+
+def test_migracoes_criam_o_esquema_dos_modelos_e_adotam_banco_antigo(tmp_path):
+    def esquema(engine):
+        inspetor = inspect(engine)
+        return {
+            tabela: (
+                {c["name"] for c in inspetor.get_columns(tabela)},
+                {i["name"] for i in inspetor.get_indexes(tabela)},
+            )
+            for tabela in inspetor.get_table_names()
+            if tabela != "schema_versao" and not tabela.startswith("tarefa_fts")
+        }
+
+    # Banco vazio: as migrações chegam ao mesmo esquema do create_all
+    novo = create_engine(f"sqlite:///{tmp_path / 'novo.db'}")
+    assert [m.versao for m in migrar(novo)] == list(range(1, VERSAO_MAIS_RECENTE + 1))
+    assert migrar(novo) == []
+    assert esquema(novo) == esquema(engine_test)
+
+    # Banco criado pelo create_all da versão original: ganha o que falta
+    antigo = create_engine(f"sqlite:///{tmp_path / 'antigo.db'}")
+    with antigo.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE usuario (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, "
+            "email VARCHAR NOT NULL UNIQUE, password_hash VARCHAR NOT NULL, is_active BOOLEAN NOT NULL)"
+        )
+        conn.exec_driver_sql(
+            "CREATE TABLE tarefa (id INTEGER PRIMARY KEY, titulo VARCHAR NOT NULL, prioridade VARCHAR NOT NULL, "
+            "concluido BOOLEAN NOT NULL, usuario_id INTEGER NOT NULL REFERENCES usuario (id))"
+        )
+        conn.exec_driver_sql("INSERT INTO usuario VALUES (1, 'velho', 'v@v.com', 'x', 1)")
+        conn.exec_driver_sql("INSERT INTO tarefa VALUES (1, 'Café antigo', 'Alta', 0, 1)")
+
+    migrar(antigo)
+    with antigo.connect() as conn:
+        assert versao_atual(conn) == VERSAO_MAIS_RECENTE
+        assert conn.execute(text("SELECT is_admin FROM usuario")).scalar() == 0
+        # Tarefa anterior à migração entra na versão do dono
+        assert conn.execute(text("SELECT versao FROM tarefa")).scalar() == 1
+        assert conn.execute(text(
+            "SELECT usuario_id, versao FROM versao_tarefas"
+        )).all() == [(1, 1)]
+        # O índice de busca foi populado com as tarefas que já existiam
+        assert conn.execute(text(
+            "SELECT rowid FROM tarefa_fts WHERE tarefa_fts MATCH 'cafe'"
+        )).scalar() == 1
+
+
+def test_colunas_de_data_tem_fuso_nos_modelos_e_nas_migracoes(tmp_path, monkeypatch):
+    # Os modelos gravam datetimes com tzinfo; no PostgreSQL o asyncpg os
+    # recusa em colunas "timestamp without time zone"
+    dialeto = postgresql.dialect()
+    tipos_modelos = [
+        coluna.type for tabela in SQLModel.metadata.sorted_tables
+        for coluna in tabela.columns
+        if isinstance(getattr(coluna.type, "impl", coluna.type), DateTime)
+    ]
+    assert tipos_modelos
+    for tipo in tipos_modelos:
+        assert tipo.compile(dialect=dialeto) == "TIMESTAMP WITH TIME ZONE"
+        agora = tipo.process_bind_param(datetime.now(timezone.utc), dialeto)
+        assert agora.tzinfo is not None
+
+    # As migrações criam as mesmas colunas com fuso
+    colunas = list(schema_versao.columns)
+    criar_tabela, adicionar_coluna = migracoes._criar_tabela, migracoes._adicionar_coluna
+
+    def registrar_tabela(conn, tabela):
+        colunas.extend(tabela.columns)
+        criar_tabela(conn, tabela)
+
+    def registrar_coluna(conn, coluna):
+        colunas.append(coluna)
+        return adicionar_coluna(conn, coluna)
+
+    monkeypatch.setattr(migracoes, "_criar_tabela", registrar_tabela)
+    monkeypatch.setattr(migracoes, "_adicionar_coluna", registrar_coluna)
+    migrar(create_engine(f"sqlite:///{tmp_path / 'fuso.db'}"))
+
+    datas = [c for c in colunas if isinstance(c.type, DateTime)]
+    assert {c.name for c in datas} >= {"atualizado_em", "removido_em", "expira_em", "aplicada_em"}
+    assert all(c.type.timezone for c in datas)
+
+
+def test_repositorio_exclui_usuario_em_massa_e_reusa_consultas(session: Session):
+    usuario = Usuario(username="repo", email="repo@teste.com", password_hash="x")
+    session.add(usuario)
+    session.commit()
+    session.refresh(usuario)
+
+    async def cenario():
+        async for async_session in fake_get_session():
+            await crud.criar_tarefa(async_session, TarefaCreate(titulo="a"), usuario.id)
+            await crud.deletar_tarefa(
+                async_session,
+                (await crud.criar_tarefa(async_session, TarefaCreate(titulo="b"), usuario.id)).id,
+                usuario.id,
+            )
+
+            # Mesmo filtro, valores diferentes: o mesmo SELECT pré-compilado
+            consulta, _ = crud._parametros_listagem("linhas", usuario.id, 10, 5, None, None, "asc")
+            outra, params = crud._parametros_listagem("linhas", usuario.id, 20, 9, None, None, "asc")
+            assert consulta is outra
+            assert params == {"usuario_id": usuario.id, "limite": 21, "after": 9}
+
+            assert await crud.buscar_id_por_username(async_session, "repo") == usuario.id
+            await crud.deletar_usuario(async_session, usuario.id)
+            assert await crud.buscar_usuario_por_username(async_session, "repo") is None
+
+    asyncio.run(cenario())
+
+    # Tarefas, tombstones e versão saem junto; a versão dos tokens fica
+    for tabela in ("tarefa", "tarefa_removida", "versao_tarefas"):
+        assert session.connection().execute(text(f"SELECT count(*) FROM {tabela}")).scalar() == 0
+    assert session.connection().execute(text("SELECT versao FROM versao_token")).scalar() == 1
+
+
 def test_delete_usuario_nao_deixa_tarefa_orfa(session: Session):
     usuario = Usuario(
         username="teste",
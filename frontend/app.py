@@ -1,15 +1,25 @@
 import streamlit as st
 import requests
-import time
 import random
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
 
 # =====================
 # CONFIG
 # =====================
 load_dotenv()
 API_URL = "http://127.0.0.1:8000"
+# Intervalo mínimo entre revalidações da cópia local: cliques em widgets
+# também disparam reruns e não devem gerar chamadas à API a cada vez
+REVALIDACAO_INTERVALO_S = 15
 
 st.set_page_config(
     page_title="Pro Task Manager",
@@ -33,6 +43,44 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# =====================
+# CLIENTE HTTP
+# =====================
+@st.cache_resource
+def cliente_http():
+    # Uma sessão por processo do Streamlit, compartilhada entre reruns e
+    # usuários: as conexões com a API ficam abertas (keep-alive) no pool.
+    # Erros de conexão e 502/503/504 são repetidos com backoff exponencial,
+    # só em métodos idempotentes (um POST nunca é reenviado).
+    retry = Retry(
+        total=3,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    sessao = requests.Session()
+    sessao.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=retry))
+    sessao.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=retry))
+    # gzip/deflate, e br/zstd quando os decodificadores estão instalados
+    sessao.headers.update(make_headers(accept_encoding=True))
+    # Sessão compartilhada entre usuários: nenhum cookie é guardado
+    sessao.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return sessao
+
+
+@st.cache_resource
+def executor_http():
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="api")
+
+
+# Renovações concorrentes (chamadas em paralelo que recebem 401 juntas)
+# fariam reuso do refresh token e a API revogaria a sessão inteira. O
+# script roda de novo a cada rerun: o lock fica no session_state para que
+# revalidações em segundo plano de reruns anteriores usem o mesmo.
+if "lock_renovacao" not in st.session_state:
+    st.session_state.lock_renovacao = threading.Lock()
+
 # =====================
 # SERVICE LAYER
 # =====================
@@ -40,38 +88,254 @@ class TaskService:
     @staticmethod
     def login(username, password):
         try:
-            res = requests.post(f"{API_URL}/token", data={"username": username, "password": password}, timeout=10)
+            res = cliente_http().post(f"{API_URL}/token", data={"username": username, "password": password}, timeout=10)
             return res.json() if res.status_code == 200 else None
         except: return None
 
     @staticmethod
-    def listar(token):
+    def cadastrar(username, email, password):
         try:
-            res = requests.get(f"{API_URL}/tarefas", headers={"Authorization": f"Bearer {token}"}, timeout=10)
-            return res.json() if res.status_code == 200 else []
-        except: return []
+            res = cliente_http().post(f"{API_URL}/usuarios", json={"username": username, "email": email, "password": password}, timeout=10)
+            return res.status_code == 201
+        except: return False
+
+    @staticmethod
+    def renovar(token_recusado=None):
+        # Troca o refresh token por um novo par de tokens, sem reenviar a senha
+        with st.session_state.lock_renovacao:
+            # Outra chamada já renovou enquanto esta esperava: o refresh token
+            # que ela girou é o único válido, e o par novo já está na sessão
+            if token_recusado and st.session_state.get("access_token") not in (None, token_recusado):
+                return True
+            # Lido só dentro do lock, para nunca reapresentar um token já girado
+            refresh = st.session_state.get("refresh_token")
+            if not refresh: return False
+            try:
+                res = cliente_http().post(f"{API_URL}/token/refresh", json={"refresh_token": refresh}, timeout=10)
+            except: return False
+            if res.status_code != 200:
+                # Sessão expirada ou revogada: volta para a tela de login
+                st.session_state.access_token = None
+                st.session_state.refresh_token = None
+                return False
+            dados = res.json()
+            st.session_state.access_token = dados["access_token"]
+            st.session_state.refresh_token = dados["refresh_token"]
+            return True
+
+    @staticmethod
+    def _req(metodo, caminho, token, **kwargs):
+        # Access token vencido (401): renova uma vez e repete a requisição
+        token = st.session_state.get("access_token") or token
+        headers = {**kwargs.pop("headers", {}), "Authorization": f"Bearer {token}"}
+        res = cliente_http().request(metodo, f"{API_URL}{caminho}", headers=headers, timeout=10, **kwargs)
+        if res.status_code == 401 and TaskService.renovar(token):
+            headers["Authorization"] = f"Bearer {st.session_state.access_token}"
+            res = cliente_http().request(metodo, f"{API_URL}{caminho}", headers=headers, timeout=10, **kwargs)
+        return res
+
+    @staticmethod
+    def em_segundo_plano(chamada):
+        # Roda a chamada numa conexão do pool sem bloquear o rerun; a thread
+        # recebe o contexto do rerun atual para poder usar o st.session_state
+        contexto = get_script_run_ctx()
+
+        def executar():
+            add_script_run_ctx(threading.current_thread(), contexto)
+            return chamada()
+
+        return executor_http().submit(executar)
+
+    @staticmethod
+    def em_paralelo(*chamadas):
+        # Dispara chamadas independentes ao mesmo tempo e devolve os
+        # resultados na mesma ordem
+        futuros = [TaskService.em_segundo_plano(chamada) for chamada in chamadas]
+        return [futuro.result() for futuro in futuros]
+
+    @staticmethod
+    def listar(token):
+        # A API pagina por cursor: segue o header X-Next-Cursor até a última página
+        tarefas, cursor = [], None
+        while True:
+            params = {"after": cursor} if cursor else {}
+            res = TaskService._req("GET", "/tarefas", token, params=params)
+            res.raise_for_status()
+            tarefas.extend(res.json())
+            cursor = res.headers.get("X-Next-Cursor")
+            if not cursor: return tarefas
+
+    @staticmethod
+    def estatisticas(token, etag=None):
+        # Totais calculados pela API (COUNT agrupado). Devolve (stats, etag);
+        # 304 devolve stats None e o chamador mantém os que já tem
+        headers = {"If-None-Match": etag} if etag else {}
+        res = TaskService._req("GET", "/tarefas/stats", token, headers=headers)
+        if res.status_code == 304: return None, etag
+        res.raise_for_status()
+        return res.json(), res.headers.get("ETag")
+
+    @staticmethod
+    def mudancas(desde, token):
+        # Só o que mudou desde a versão `desde` (GET /tarefas/changes). Com
+        # reset (mudanças demais ou histórico compactado) baixa a lista inteira.
+        res = TaskService._req("GET", "/tarefas/changes", token, params={"since": desde})
+        res.raise_for_status()
+        mudancas = res.json()
+        if mudancas["reset"]:
+            mudancas["tarefas"] = TaskService.listar(token)
+        return mudancas
 
     @staticmethod
     def criar(titulo, prioridade, token):
+        # As mutações devolvem a resposta da API (ou None), aplicada no TaskStore
         try:
             payload = {"titulo": titulo, "descricao": "", "prioridade": prioridade, "concluida": False}
-            res = requests.post(f"{API_URL}/tarefas", json=payload, headers={"Authorization": f"Bearer {token}"}, timeout=10)
-            return res.status_code in (200, 201)
-        except: return False
+            res = TaskService._req("POST", "/tarefas", token, json=payload)
+            return res.json() if res.status_code in (200, 201) else None
+        except: return None
 
     @staticmethod
     def concluir(tarefa_id, token):
         try:
-            res = requests.patch(f"{API_URL}/tarefas/{tarefa_id}/concluir", headers={"Authorization": f"Bearer {token}"}, timeout=10)
-            return res.status_code == 200
-        except: return False
+            res = TaskService._req("PATCH", f"/tarefas/{tarefa_id}/concluir", token)
+            return res.json() if res.status_code == 200 else None
+        except: return None
 
     @staticmethod
     def deletar(tarefa_id, token):
         try:
-            res = requests.delete(f"{API_URL}/tarefas/{tarefa_id}", headers={"Authorization": f"Bearer {token}"}, timeout=10)
-            return res.status_code == 200
-        except: return False
+            res = TaskService._req("DELETE", f"/tarefas/{tarefa_id}", token)
+            return res.json() if res.status_code == 200 else None
+        except: return None
+
+    @staticmethod
+    def sair(token):
+        # Revoga access e refresh tokens no servidor
+        try: TaskService._req("POST", "/token/revoke", token)
+        except: pass
+
+# =====================
+# STORE LOCAL DE TAREFAS
+# =====================
+class TaskStore:
+    """
+    Cópia das tarefas do usuário guardada na sessão. Cada mutação aplica a
+    resposta da API direto na cópia, sem baixar a lista de novo; a
+    revalidação (só o delta, via GET /tarefas/changes) roda em segundo plano,
+    no máximo a cada REVALIDACAO_INTERVALO_S, e é aplicada no rerun seguinte.
+    Os totais do progresso vêm de GET /tarefas/stats e só são revalidados
+    (com If-None-Match) depois que a cópia mudou.
+    """
+
+    def __init__(self):
+        self.tarefas = {}
+        self.stats = None       # últimos totais da API
+        self.stats_etag = None  # ETag desses totais
+        self.stats_sujas = True # a cópia mudou depois dos últimos totais
+        self.versao = None      # última versão sincronizada (o `since`)
+        self.removidas = {}     # id -> versão das remoções feitas aqui
+        self.revalidacao = None # Future da revalidação em andamento
+        self.revalidado_em = 0.0 # time.monotonic() da última revalidação
+
+    def lista(self):
+        return [self.tarefas[i] for i in sorted(self.tarefas)]
+
+    def estatisticas(self, token):
+        # Sem mudanças na cópia, os totais guardados continuam valendo. Com
+        # mudanças, revalidação condicional: 304 sem corpo se já estão em dia
+        if self.stats is not None and not self.stats_sujas:
+            return self.stats
+        try:
+            stats, self.stats_etag = TaskService.estatisticas(token, self.stats_etag)
+            if stats is not None: self.stats = stats
+            self.stats_sujas = False
+        except: pass
+        return self.stats
+
+    def salvar(self, tarefa):
+        # Ignora cópias mais velhas que a local (revalidação que saiu antes
+        # da mutação) e tarefas já removidas por aqui
+        atual = self.tarefas.get(tarefa["id"])
+        if atual and atual["versao"] > tarefa["versao"]: return
+        if tarefa["versao"] <= self.removidas.get(tarefa["id"], -1): return
+        self.tarefas[tarefa["id"]] = tarefa
+        self.stats_sujas = True
+
+    def remover(self, tarefa_id, versao=None):
+        if self.tarefas.pop(tarefa_id, None) is not None: self.stats_sujas = True
+        if versao is not None: self.removidas[tarefa_id] = versao
+
+    def aplicar(self, mudancas):
+        if mudancas["reset"] or self.versao is None:
+            self.tarefas = {}
+            self.stats_sujas = True
+        for tarefa in mudancas.get("tarefas", []) + mudancas["alteradas"]:
+            self.salvar(tarefa)
+        for tarefa_id in mudancas["removidas"]:
+            self.remover(tarefa_id)
+        self.versao = mudancas["versao"]
+        # Remoções locais que a sincronização já cobriu
+        self.removidas = {i: v for i, v in self.removidas.items() if v > self.versao}
+
+    def revalidar(self, token):
+        # Aplica a revalidação que terminou e dispara a próxima, sem esperar,
+        # se o intervalo mínimo já passou
+        if self.revalidacao and self.revalidacao.done():
+            try: self.aplicar(self.revalidacao.result())
+            except: pass
+            self.revalidacao = None
+        if self.revalidacao is None and time.monotonic() - self.revalidado_em >= REVALIDACAO_INTERVALO_S:
+            desde = self.versao
+            self.revalidado_em = time.monotonic()
+            self.revalidacao = TaskService.em_segundo_plano(lambda: TaskService.mudancas(desde, token))
+
+    def atualizar(self, token):
+        # Atualização pedida pelo usuário: sincroniza agora, fora do intervalo.
+        # Uma revalidação em andamento é descartada (pode ser mais velha).
+        self.revalidacao = None
+        self.revalidado_em = time.monotonic()
+        try: self.aplicar(TaskService.mudancas(self.versao or 0, token))
+        except: pass
+        self.stats_sujas = True
+
+
+def store():
+    if "tarefas_store" not in st.session_state:
+        st.session_state.tarefas_store = TaskStore()
+    return st.session_state.tarefas_store
+
+
+def ao_atualizar():
+    store().atualizar(st.session_state.access_token)
+
+
+def ao_criar():
+    titulo = st.session_state.nova_titulo
+    if not titulo: return
+    tarefa = TaskService.criar(titulo, st.session_state.nova_prioridade, st.session_state.access_token)
+    if tarefa:
+        store().salvar(tarefa)
+        st.session_state['ultima_acao'] = 'adicionar'
+        st.toast("Tarefa criada! ✨")
+    else:
+        st.toast("Não foi possível criar a tarefa.")
+
+
+def ao_concluir(tarefa_id):
+    tarefa = TaskService.concluir(tarefa_id, st.session_state.access_token)
+    if tarefa:
+        store().salvar(tarefa)
+        st.session_state['ultima_acao'] = 'concluir'
+        # Feedback visual com confetes no canto da tela
+        st.toast("🎊 Parabéns!")
+
+
+def ao_deletar(tarefa_id):
+    res = TaskService.deletar(tarefa_id, st.session_state.access_token)
+    if res:
+        store().remover(tarefa_id, res.get("versao"))
+        st.session_state['ultima_acao'] = 'deletar'
 
 # =====================
 # LÓGICA DE SESSÃO
@@ -96,6 +360,8 @@ if st.session_state.access_token is None:
                 res = TaskService.login(username, password)
                 if res:
                     st.session_state.access_token = res["access_token"]
+                    st.session_state.refresh_token = res.get("refresh_token")
+                    st.session_state.pop("tarefas_store", None)
                     st.session_state.username = username
                     st.rerun()
                 else:
@@ -113,8 +379,7 @@ if st.session_state.access_token is None:
             ans = st.number_input("Resposta", step=1)
             if st.form_submit_button("Criar Conta"):
                 if ans == n1 + n2:
-                    res = requests.post(f"{API_URL}/usuarios", json={"username": new_user, "email": email, "password": new_pwd})
-                    if res.status_code == 201:
+                    if TaskService.cadastrar(new_user, email, new_pwd):
                         st.success("Conta criada!")
                         st.session_state.captcha = (random.randint(1, 9), random.randint(1, 9))
                 else: st.error("Erro no cálculo.")
@@ -124,7 +389,24 @@ if st.session_state.access_token is None:
 # =====================
 else:
     token = st.session_state.access_token
-    tarefas = TaskService.listar(token)
+    tarefas_store = store()
+    if tarefas_store.versao is None:
+        # Primeira carga junto com os totais: since=0 responde reset, então a
+        # cópia vem das páginas do GET /tarefas e a versão lida antes delas
+        # vira o `since` dos deltas seguintes
+        try:
+            mudancas, stats = TaskService.em_paralelo(
+                lambda: TaskService.mudancas(0, token),
+                lambda: tarefas_store.estatisticas(token),
+            )
+            tarefas_store.aplicar(mudancas)
+            # Totais e cópia vieram juntos: nada a revalidar neste rerun
+            tarefas_store.stats_sujas = stats is None
+            tarefas_store.revalidado_em = time.monotonic()
+        except: pass
+    tarefas_store.revalidar(token)
+    stats = tarefas_store.estatisticas(token)
+    tarefas = tarefas_store.lista()
 
     # Inicializa a variável de controle no estado da sessão
     if 'ultima_acao' not in st.session_state:
@@ -132,17 +414,19 @@ else:
 
     with st.sidebar:
         st.header(f"👤 {st.session_state.username}")
+        st.button("🔄 Atualizar", on_click=ao_atualizar)
         if st.sidebar.button("🚪 Sair"):
+            TaskService.sair(token)
             st.session_state.clear()
             st.rerun()
 
     st.title("📝 Minhas Tarefas")
 
     # 1. BARRA DE PROGRESSO E LÓGICA DE CELEBRAÇÃO
-    if tarefas:
-        total = len(tarefas)
-        concluidas = sum(1 for t in tarefas if t.get("concluida") or t.get("concluido"))
-        
+    if stats and stats["total"]:
+        total = stats["total"]
+        concluidas = stats["concluidas"]
+
         progresso = concluidas / total
         st.progress(progresso)
         st.caption(f"🚀 {concluidas} de {total} tarefas concluídas ({int(progresso*100)}%)")
@@ -157,14 +441,9 @@ else:
     # 2. ADICIONAR NOVA TAREFA
     with st.expander("➕ Nova Tarefa"):
         with st.form("nova_tarefa", clear_on_submit=True):
-            titulo = st.text_input("Título")
-            prioridade = st.select_slider("Prioridade", ["Baixa", "Média", "Alta"], value="Média")
-            if st.form_submit_button("Adicionar"):
-                if titulo and TaskService.criar(titulo, prioridade, token):
-                    st.session_state['ultima_acao'] = 'adicionar'
-                    st.toast("Tarefa criada! ✨")
-                    time.sleep(0.5)
-                    st.rerun()
+            st.text_input("Título", key="nova_titulo")
+            st.select_slider("Prioridade", ["Baixa", "Média", "Alta"], value="Média", key="nova_prioridade")
+            st.form_submit_button("Adicionar", on_click=ao_criar)
 
     st.divider()
 
@@ -191,17 +470,7 @@ else:
 
                 with c2:
                     if not is_done:
-                        if st.button("✔", key=f"done_{t['id']}"):
-                            if TaskService.concluir(t["id"], token):
-                                st.session_state['ultima_acao'] = 'concluir'
-                                # Feedback visual com confetes no canto da tela
-                                st.toast("🎊 Parabéns!") 
-                                time.sleep(0.8) 
-                                st.rerun()
+                        st.button("✔", key=f"done_{t['id']}", on_click=ao_concluir, args=(t["id"],))
 
                 with c3:
-                    if st.button("🗑️", key=f"del_{t['id']}"):
-                        if TaskService.deletar(t["id"], token):
-                            st.session_state['ultima_acao'] = 'deletar'
-                            time.sleep(0.3)
-                            st.rerun()
\ No newline at end of file
+                    st.button("🗑️", key=f"del_{t['id']}", on_click=ao_deletar, args=(t["id"],))
\ No newline at end of file